@@ -1,9 +1,56 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import random
+import os
 import time
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from grid_rag.startup import PROFILE, Warmup
+
+with PROFILE.timing("import", "streamlit"):
+    import streamlit as st
+
+# Only what the welcome screen and every rerun need. Indexes, fleet scoring, packs, sensors, analytics and
+# generation are imported by their loaders (normally on the warm-up thread), pandas by the tabs that use it
+with PROFILE.timing("import", "grid_rag"):
+    from grid_rag.cache import QueryCache
+    from grid_rag.client import AnswerClient, AnswerClientError
+    from grid_rag.corpus import corpus_version
+    from grid_rag.history import ConversationHistory, HistoryStore
+    from grid_rag.metrics import LatencyRecorder, QueryTrace, start_metrics_server
+    from grid_rag.render import ResponseRenderer, answer_header, history_cards, related_procedures, style_tag
+    from grid_rag.scheduler import Overloaded, RateLimited, service_scheduler
+
+# Procedure corpus and the on-disk location for memory-mapped indexes shared by all worker processes
+CORPUS_DIR = os.environ.get("GRID_RAG_CORPUS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "corpus"))
+INDEX_DIR = os.environ.get("GRID_RAG_INDEX_DIR", ".grid_index")
+
+# Offline knowledge pack (`python -m grid_rag.pack export`); when set it replaces the corpus directory and indexes
+PACK_PATH = os.environ.get("GRID_RAG_PACK")
+
+# Optional Prometheus exporter port for stage latencies (GET /metrics)
+METRICS_PORT = os.environ.get("GRID_RAG_METRICS_PORT")
+
+# SQLite file that conversation history is written through to, queryable per crew
+HISTORY_DB = os.environ.get("GRID_RAG_HISTORY_DB", ".grid_history.sqlite3")
+
+# Append-only query event log shared by all sessions and processes for fleet-wide analytics
+EVENT_LOG = os.environ.get("GRID_RAG_EVENT_LOG", ".grid_events.jsonl")
+
+# Headless query API (`python -m grid_rag.api`); when set the app is a thin client and answers in-process otherwise
+API_URL = os.environ.get("GRID_RAG_API_URL")
+
+# Sensor telemetry: a CSV replay file looped at real time, and/or a UDP port for gateway datagrams
+SENSOR_REPLAY = os.environ.get("GRID_RAG_SENSOR_REPLAY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sensors", "replay.csv"))
+SENSOR_UDP_PORT = os.environ.get("GRID_RAG_SENSOR_UDP_PORT")
+
+# Transformer fleet DGA table (CSV or columnar .npz), scored once per process and per file change
+FLEET_PATH = os.environ.get("GRID_RAG_FLEET", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fleet", "transformers.csv"))
+
+# Streaming generation endpoint (e.g. `python -m grid_rag.stub_llm`); canned answers when unset
+LLM_URL = os.environ.get("GRID_RAG_LLM_URL")
+
+# Log per-component import, init and warm-up times to stderr and show them on the System Status tab
+PROFILE_STARTUP = os.environ.get("GRID_RAG_PROFILE_STARTUP")
 
 # Page configuration
 st.set_page_config(
@@ -16,130 +63,171 @@ st.set_page_config(
 # Initialize session state
 if 'assistant_dismissed' not in st.session_state:
     st.session_state.assistant_dismissed = False
-if 'conversation_history' not in st.session_state:
-    st.session_state.conversation_history = []
 if 'current_query' not in st.session_state:
     st.session_state.current_query = ""
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main > div {
-        background: #0d1117;
-        color: #f0f0f0;
-    }
-    
-    .grok-overlay {
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: rgba(13, 17, 23, 0.95);
-        backdrop-filter: blur(10px);
-        z-index: 999;
-        display: flex;
-        justify-content: center;
-        align-items: center;
-    }
-    
-    .grok-assistant {
-        background: linear-gradient(135deg, #1e293b 0%, #334155 100%);
-        border: 2px solid #3b82f6;
-        border-radius: 20px;
-        padding: 2rem;
-        max-width: 500px;
-        text-align: center;
-        box-shadow: 0 20px 60px rgba(59, 130, 246, 0.3);
-        animation: pulse-glow 2s infinite alternate;
-    }
-    
-    @keyframes pulse-glow {
-        0% { box-shadow: 0 20px 60px rgba(59, 130, 246, 0.3); }
-        100% { box-shadow: 0 20px 80px rgba(59, 130, 246, 0.5); }
-    }
-    
-    .grok-avatar {
-        width: 80px;
-        height: 80px;
-        background: linear-gradient(135deg, #3b82f6 0%, #1d4ed8 100%);
-        border-radius: 50%;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        margin: 0 auto 1rem auto;
-        font-size: 2rem;
-        animation: float 3s ease-in-out infinite;
-    }
-    
-    @keyframes float {
-        0%, 100% { transform: translateY(0px); }
-        50% { transform: translateY(-10px); }
-    }
-    
-    .grid-header {
-        background: linear-gradient(135deg, #1e293b 0%, #334155 100%);
-        padding: 2rem;
-        border-radius: 15px;
-        margin-bottom: 2rem;
-        border: 1px solid #3b82f6;
-        text-align: center;
-    }
-    
-    .query-card {
-        background: #1e293b;
-        border: 1px solid #374151;
-        border-radius: 10px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-    
-    .query-card:hover {
-        border-color: #3b82f6;
-        background: #374151;
-        transform: translateY(-2px);
-    }
-    
-    .answer-section {
-        background: #0f172a;
-        border: 1px solid #1e293b;
-        border-radius: 15px;
-        padding: 1.5rem;
-        margin: 1rem 0;
-    }
-    
-    .emergency-steps {
-        background: #dc2626;
-        color: white;
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-    }
-    
-    .contact-info {
-        background: #059669;
-        color: white;
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-    }
-    
-    .confidence-badge {
-        display: inline-block;
-        padding: 0.3rem 0.8rem;
-        border-radius: 20px;
-        font-size: 0.8rem;
-        font-weight: bold;
-        margin: 0.5rem 0;
-    }
-    
-    .confidence-high { background: #059669; color: white; }
-    .confidence-medium { background: #d97706; color: white; }
-    .confidence-low { background: #dc2626; color: white; }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS, minified once per process. Streamlit drops elements a rerun does not
+# re-emit, so the <style> element is sent on every run; keeping it small is what helps
+st.markdown(style_tag(), unsafe_allow_html=True)
+
+# Electric utility knowledge base for thin-client mode: data/corpus plus published change segments, parsed once per version
+@st.cache_resource(max_entries=1)
+def open_corpus(directory, version, sequence):
+    from grid_rag.versioning import layered_corpus
+
+    return layered_corpus(directory)
+
+# Memory-mapped pack, reopened when the file is replaced (e.g. by `grid_rag.pack apply`)
+@st.cache_resource(max_entries=1)
+def open_pack(path, mtime):
+    from grid_rag.pack import Pack, PackCorpus
+
+    return PackCorpus(Pack(path))
+
+def get_corpus():
+    if PACK_PATH:
+        return open_pack(PACK_PATH, os.stat(PACK_PATH).st_mtime_ns)
+    if API_URL:
+        from grid_rag.versioning import ChangeLog
+
+        return open_corpus(CORPUS_DIR, corpus_version(CORPUS_DIR), ChangeLog(CORPUS_DIR).head())
+    return load_snapshots(CORPUS_DIR, INDEX_DIR).get().corpus
+
+# Answer cache shared by every session in this process
+@st.cache_resource
+def load_answer_cache():
+    return QueryCache(maxsize=2048, ttl=900)
+
+# Fleet-wide DGA scoring; per-asset risk level and confidence feed DGA procedure answers
+@st.cache_resource(max_entries=1)
+def load_fleet(path, mtime):
+    if not mtime:
+        return None
+    from grid_rag.fleet import FleetScores, load_table
+
+    return FleetScores(load_table(path))
+
+def get_fleet():
+    return load_fleet(FLEET_PATH, os.path.getmtime(FLEET_PATH) if os.path.exists(FLEET_PATH) else None)
+
+# Retrieval indexes over the pack, reopened when the pack file is replaced
+@st.cache_resource(max_entries=1)
+def load_answer_service(_corpus, version, _fleet):
+    from grid_rag.service import AnswerService
+
+    return AnswerService(_corpus, INDEX_DIR, cache=load_answer_cache(), fleet=_fleet)
+
+# Electric utility knowledge base and its indexes, served as snapshots that pick up published changes within a second
+@st.cache_resource
+def load_snapshots(directory, index_dir):
+    from grid_rag.versioning import ServingSnapshots
+
+    return ServingSnapshots(directory, index_dir, cache=load_answer_cache(), fleet=get_fleet()).start(1.0)
+
+@st.cache_resource
+def load_answer_client(url):
+    return AnswerClient(url)
+
+def get_answers(corpus, fleet):
+    if API_URL:
+        return load_answer_client(API_URL)
+    if PACK_PATH:
+        return load_answer_service(corpus, corpus.version, fleet)
+    return load_snapshots(CORPUS_DIR, INDEX_DIR).get()
+
+# Risk-ordered, per-session rate-limited scheduling of answers in this process (the API schedules its own)
+@st.cache_resource
+def load_scheduler():
+    return service_scheduler(lambda: get_answers(get_corpus(), get_fleet()))
+
+# Procedure HTML rendered once per corpus version
+@st.cache_resource(max_entries=1)
+def load_base_renderer(_corpus, version):
+    return ResponseRenderer(_corpus.responses())
+
+@st.cache_resource(max_entries=1)
+def load_renderer(_corpus, version):
+    if PACK_PATH:
+        from grid_rag.pack import PackRenderer
+
+        # Fragments were rendered at export time
+        return PackRenderer(_corpus)
+    from grid_rag.versioning import LayeredCorpus
+
+    if isinstance(_corpus, LayeredCorpus):
+        # Change segments only re-render the procedures they touch
+        return load_base_renderer(_corpus.base, _corpus.base.version).updated(_corpus.responses(), _corpus.changed)
+    return load_base_renderer(_corpus, version)
+
+# Stage latency ring buffer shared by all sessions, optionally exported to Prometheus
+@st.cache_resource
+def load_latency_recorder():
+    recorder = LatencyRecorder()
+    if METRICS_PORT:
+        collectors = [load_answer_cache().to_prometheus] + ([] if API_URL else [load_scheduler().to_prometheus])
+        start_metrics_server(recorder, int(METRICS_PORT), collectors=collectors)
+    return recorder
+
+# One generation client per process so its connection pool outlives reruns
+@st.cache_resource
+def load_generation_client(url):
+    from grid_rag.generation import GenerationClient
+
+    return GenerationClient(url)
+
+# Conversation history store shared by all sessions; each session keeps a bounded view for its crew
+@st.cache_resource
+def load_history_store(path):
+    return HistoryStore(path)
+
+# Fleet-wide analytics: events from every session, rolled up into hourly NumPy buckets
+@st.cache_resource
+def load_analytics(path):
+    from grid_rag.analytics import AnalyticsService
+
+    return AnalyticsService(path)
+
+# Live IoT telemetry shared by all sessions, aggregated over rolling windows as samples arrive
+@st.cache_resource
+def load_sensor_hub(replay_path, udp_port):
+    from grid_rag.sensors import SensorHub
+
+    hub = SensorHub(window=120)
+    if replay_path and os.path.exists(replay_path):
+        hub.start_replay(replay_path)
+    if udp_port:
+        hub.start_udp(int(udp_port))
+    return hub
+
+# Catalog buttons send procedure titles verbatim, so answering them ahead makes first clicks cache hits
+def warm_answer_cache():
+    corpus = get_corpus()
+    service = get_answers(corpus, get_fleet())
+    for title in islice(corpus.responses(), 256):
+        service.answer(title, k=3)
+
+# Loads indexes and caches on a background thread once per process, while the first page is on screen
+@st.cache_resource
+def start_warmup():
+    tasks = [
+        ("corpus", get_corpus),
+        ("fleet", get_fleet),
+        ("answer service", lambda: get_answers(get_corpus(), get_fleet())),
+        ("renderer", lambda: load_renderer(get_corpus(), get_corpus().version)),
+        ("history", lambda: load_history_store(HISTORY_DB)),
+        ("analytics", lambda: load_analytics(EVENT_LOG)),
+        ("sensors", lambda: load_sensor_hub(SENSOR_REPLAY, SENSOR_UDP_PORT)),
+    ]
+    if not API_URL:
+        tasks += [
+            ("suggestions", lambda: get_answers(get_corpus(), get_fleet()).suggester.get()),
+            ("answer cache", warm_answer_cache),
+        ]
+    return Warmup(tasks, on_done=lambda _: PROFILE.log() if PROFILE_STARTUP else None).start()
+
+warmup = start_warmup()
 
 # Grok-4 Assistant Welcome Screen (NO HTML OVERLAY)
 if not st.session_state.assistant_dismissed:
@@ -197,145 +285,81 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Electric Utility Query Categories with Deep Technical Content
-UTILITY_CATEGORIES = {
-    "🚨 Emergency Procedures": [
-        "Emergency shutdown procedures for a 345kV transmission line during lightning storm",
-        "SCADA system lockout recovery for distribution feeders during cyber incident", 
-        "Storm restoration protocols for multiple 138kV substations offline",
-        "Emergency response for SF6 gas leak at 230kV GIS switchgear",
-        "Procedures for energizing new 69kV transmission line after outage",
-        "Emergency load shedding implementation during generation shortage",
-        "Fault isolation procedures for underground 15kV distribution network"
-    ],
-    
-    "🔧 Equipment Diagnostics": [
-        "Dissolved gas analysis interpretation for 100MVA power transformer",
-        "Partial discharge testing procedures for 230kV cable terminations",
-        "Infrared thermography analysis for 69kV disconnect switches",
-        "Insulation resistance testing for 500kV transmission line insulators",
-        "Power factor testing procedures for distribution voltage regulators",
-        "Vibration analysis for turbine-generator units at power plant",
-        "Corona detection techniques for overhead transmission conductors"
-    ],
-    
-    "⚙️ Maintenance Procedures": [
-        "Live line maintenance procedures for 138kV transmission structures",
-        "Preventive maintenance schedule for distribution reclosers and sectionalizers",
-        "Oil sampling and testing procedures for load tap changing transformers",
-        "Grounding system integrity testing for transmission substations",
-        "Protective relay calibration procedures for SEL-421 differential relays",
-        "Underground cable splice maintenance for 25kV distribution systems",
-        "Gas-insulated switchgear annual inspection checklist"
-    ],
-    
-    "🛡️ Safety Protocols": [
-        "Arc flash hazard analysis for 480V motor control centers",
-        "PPE requirements for live line work on 69kV overhead lines",
-        "Confined space entry procedures for underground cable vaults",
-        "Electrical safety work practices per NFPA 70E for substations",
-        "Fall protection requirements for transmission tower maintenance",
-        "Hazardous energy control (lockout/tagout) for distribution equipment",
-        "Emergency response procedures for electrical contact incidents"
-    ],
-    
-    "📊 System Operations": [
-        "Load forecasting methodologies for peak demand management",
-        "Voltage regulation strategies for long distribution feeders",
-        "Capacitor bank switching procedures for reactive power control",
-        "Economic dispatch optimization for multiple generation units",
-        "Contingency analysis procedures for N-1 transmission planning",
-        "Demand response program implementation and customer enrollment",
-        "Real-time power flow analysis for transmission system monitoring"
-    ],
-    
-    "🔍 Grid Modernization": [
-        "Smart meter deployment strategies for advanced metering infrastructure",
-        "Distribution automation implementation using SCADA and DMS",
-        "Microgrid interconnection procedures and protection coordination",
-        "Energy storage system integration with distribution networks",
-        "Electric vehicle charging infrastructure planning and load management",
-        "Renewable energy interconnection studies for solar and wind farms",
-        "Cybersecurity protocols for critical infrastructure protection"
-    ]
-}
-
-# Enhanced Response Database with Deep Technical Content
-UTILITY_RESPONSES = {
-    "Emergency shutdown procedures for a 345kV transmission line during lightning storm": {
-        "answer": "Emergency shutdown of 345kV transmission during lightning requires immediate coordination with system operator and field crews. Monitor lightning detection system for approach patterns within 8-mile radius. Execute protective relay coordination with backup protection systems.",
-        "risk_level": "CRITICAL",
-        "steps": [
-            "IMMEDIATE (0-2 min): Contact System Control Center and initiate emergency protocols",
-            "ASSESSMENT (2-5 min): Evaluate lightning strike probability using meteorological data", 
-            "COORDINATION (5-10 min): Coordinate with adjacent utilities for load transfer if needed",
-            "EXECUTION (10-15 min): Execute switching sequence per operating procedures",
-            "VERIFICATION (15-20 min): Verify line de-energization with approved voltage detector",
-            "DOCUMENTATION (20-30 min): Complete emergency switching log and incident reports"
-        ],
-        "contacts": [
-            "System Control Center: 1-800-GRID-OPS (Emergency Hotline)",
-            "Transmission Operations: 1-555-TX-POWER",
-            "Field Operations Manager: 1-555-FIELD-MGR", 
-            "NERC Reliability Coordinator: 1-800-NERC-RC",
-            "Emergency Management: 1-555-EMERG-MGT"
-        ],
-        "completion_time": "30-45 minutes",
-        "personnel": "Licensed transmission operator, field crew (minimum 2), system operator",
-        "confidence": 96.8,
-        "sources": ["IEEE Std C2-2023 NESC", "NERC TOP-001-4", "Company Emergency Procedures Manual"]
-    },
+# Components, normally already loaded by the warm-up by the time a session gets past the welcome screen
+corpus = PROFILE.call("corpus", get_corpus)
+answer_cache = load_answer_cache()
+fleet = PROFILE.call("fleet", get_fleet)
+answers = PROFILE.call("answer service", get_answers, corpus, fleet)
+renderer = PROFILE.call("renderer", load_renderer, corpus, corpus.version)
+scheduler = None if API_URL else load_scheduler()
+latency_recorder = load_latency_recorder()
+generator = load_generation_client(LLM_URL) if LLM_URL else None
+history_store = PROFILE.call("history", load_history_store, HISTORY_DB)
+analytics = PROFILE.call("analytics", load_analytics, EVENT_LOG)
+sensor_hub = PROFILE.call("sensors", load_sensor_hub, SENSOR_REPLAY, SENSOR_UDP_PORT)
+
+# Refreshes on its own every few seconds without rerunning the rest of the page
+@st.fragment(run_every="3s")
+def render_sensor_telemetry():
+    readings = sensor_hub.snapshot()
+    if not readings:
+        st.info("Waiting for sensor data...")
+        return
+    
+    pd = PROFILE.imported("pandas")
+    from grid_rag.sensors import UNITS
+
+    frame = pd.DataFrame(readings)
+    table = frame.pivot(index="asset", columns="channel", values="latest").rename(
+        columns={channel: f"{channel.title()} ({unit})" for channel, unit in UNITS.items()}
+    )
+    thermal = frame[frame["channel"] == "thermal"].set_index("asset")
+    table["Thermal 2-min max (°C)"] = thermal["max"]
+    table["Thermal trend (°C/min)"] = thermal["rate"] * 60
     
-    "Dissolved gas analysis interpretation for 100MVA power transformer": {
-        "answer": "DGA analysis for 100MVA transformer requires interpretation of hydrogen, methane, ethane, ethylene, acetylene, CO, and CO2 levels. Critical threshold: H2 >150ppm, C2H2 >3ppm indicating thermal fault >700°C or arcing condition.",
-        "risk_level": "HIGH", 
-        "steps": [
-            "SAMPLING (0-30 min): Collect oil sample using vacuum extraction method per ASTM D3612",
-            "ANALYSIS (Day 1): Laboratory gas chromatography analysis using IEEE C57.104 standards",
-            "INTERPRETATION (Day 2): Apply Duval Triangle method and IEEE ratio analysis",
-            "TRENDING (Day 2-3): Compare with historical data and establish fault progression rate",
-            "RECOMMENDATION (Day 3): Determine maintenance actions based on fault severity",
-            "MONITORING (Ongoing): Establish accelerated testing schedule if fault gases detected"
-        ],
-        "contacts": [
-            "Transformer Engineering: 1-555-XFMR-ENG",
-            "Oil Testing Laboratory: 1-555-LAB-TEST",
-            "Apparatus Maintenance: 1-555-MAINT-APP",
-            "Asset Management: 1-555-ASSET-MGT"
-        ],
-        "completion_time": "3-5 business days",
-        "personnel": "Transformer specialist, laboratory technician, asset engineer",
-        "confidence": 94.2,
-        "sources": ["IEEE Std C57.104-2019", "ASTM D3612-02", "IEC 60599:2015"]
-    },
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Monitored Assets", f"{frame['asset'].nunique():,}")
+    with col2:
+        st.metric("Samples Ingested", f"{sensor_hub.buffers.samples:,}")
+    with col3:
+        trends = table["Thermal trend (°C/min)"].dropna()
+        if len(trends):
+            st.metric("Fastest Heating", trends.idxmax(), f"{trends.max():+.2f} °C/min")
+        else:
+            st.metric("Fastest Heating", "—")
     
-    "Live line maintenance procedures for 138kV transmission structures": {
-        "answer": "Live line work on 138kV requires minimum approach distance of 10 feet per OSHA 1926.950. Crews must use approved hot sticks, wear proper PPE including arc-rated clothing (minimum 40 cal/cm²), and maintain equipotential bonding throughout procedure.",
-        "risk_level": "CRITICAL",
-        "steps": [
-            "PLANNING (Day -1): Review work package, weather forecast, and equipment inspection",
-            "BRIEFING (0-30 min): Conduct detailed tailgate safety meeting with all crew members",
-            "SETUP (30-60 min): Position equipment truck, establish work zone, test all hot sticks",
-            "BONDING (60-90 min): Install equipotential bonding on structure and equipment",
-            "WORK EXECUTION (90-240 min): Perform maintenance using approved live line techniques",
-            "RESTORATION (240-270 min): Remove bonding, inspect work area, restore normal configuration"
-        ],
-        "contacts": [
-            "Live Line Coordinator: 1-555-LIVE-LINE",
-            "Transmission Operations: 1-555-TX-OPS", 
-            "Safety Department: 1-555-SAFETY-NOW",
-            "Medical Emergency: 911",
-            "Transmission Engineer: 1-555-TX-ENG"
-        ],
-        "completion_time": "4-6 hours",
-        "personnel": "Certified live line crew (minimum 3), qualified electrical worker, safety observer",
-        "confidence": 98.1,
-        "sources": ["OSHA 1926.950", "IEEE Std 516-2009", "ACSR Live Line Manual"]
-    }
-}
+    st.dataframe(table.round(2), use_container_width=True)
+
+crew_id = st.sidebar.text_input("Crew ID", value="default", key="crew_id").strip() or "default"
+asset_id = st.sidebar.selectbox(
+    "Asset (for DGA assessments)",
+    [""] + (fleet.assets() if fleet else []),
+    format_func=lambda asset: asset or "None",
+    key="asset_id"
+)
+if st.session_state.get("conversation_history") is None or st.session_state.conversation_history.crew != crew_id:
+    st.session_state.conversation_history = ConversationHistory(crew_id, maxlen=200, store=history_store)
+
+def submit_free_text_query():
+    st.session_state.current_query = st.session_state.free_text_query.strip()
+
+def apply_suggestion(suggestion):
+    if suggestion["kind"] == "procedure":
+        st.session_state.free_text_query = st.session_state.current_query = suggestion["text"]
+    else:
+        # Equipment terms complete the word being typed instead of running a query
+        typed = st.session_state.free_text_query.rstrip()
+        head = typed[:len(typed) - len(typed.split()[-1])] if typed.split() else ""
+        st.session_state.free_text_query = f"{head}{suggestion['text']} "
 
 # Create tabs for different sections
-tab1, tab2, tab3, tab4 = st.tabs(["💬 Live Assistant", "📚 Knowledge Base", "🔧 System Status", "📊 Analytics"])
+# Only the selected tab runs, so pandas and the status/analytics queries load when first opened
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["💬 Live Assistant", "📚 Knowledge Base", "🔧 System Status", "📊 Analytics"],
+    key="main_tab",
+    on_change="rerun"
+)
 
 with tab1:
     st.header("🤖 Interactive Grid Operations Assistant")
@@ -345,81 +369,123 @@ with tab1:
     
     selected_category = st.selectbox(
         "Choose a category:",
-        list(UTILITY_CATEGORIES.keys()),
+        corpus.categories(),
         index=0
     )
     
     # Display queries for selected category
     st.subheader(f"Queries in {selected_category}:")
     
-    for i, query in enumerate(UTILITY_CATEGORIES[selected_category]):
+    for i, query in enumerate(corpus.queries(selected_category)):
         if st.button(query, key=f"query_{i}", use_container_width=True):
             st.session_state.current_query = query
     
-    # Display answer if query is selected
-    if st.session_state.current_query and st.session_state.current_query in UTILITY_RESPONSES:
-        response = UTILITY_RESPONSES[st.session_state.current_query]
-        
-        st.markdown(f"""
-        <div class="answer-section">
-            <h3>🤖 Assistant Response</h3>
-            <p><strong>Query:</strong> {st.session_state.current_query}</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Risk level badge
-        risk_color = {"CRITICAL": "confidence-low", "HIGH": "confidence-medium", "MEDIUM": "confidence-high"}
-        st.markdown(f"""
-        <span class="confidence-badge {risk_color.get(response['risk_level'], 'confidence-medium')}">
-            Risk Level: {response['risk_level']}
-        </span>
-        """, unsafe_allow_html=True)
-        
-        # Main answer
-        st.markdown(f"**📋 Technical Analysis:**\n{response['answer']}")
-        
-        # Emergency steps
-        st.markdown("""
-        <div class="emergency-steps">
-            <h4>🚨 Emergency Response Steps</h4>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        for step in response['steps']:
-            st.markdown(f"• {step}")
+    # Free-text queries go through the same retrieval path as the buttons
+    st.text_input(
+        "Or describe the situation in your own words:",
+        key="free_text_query",
+        placeholder="e.g. lightning near a 345 kV line, need to shut it down",
+        on_change=submit_free_text_query
+    )
+    
+    # Typo-tolerant suggestions for the text in the box (GET /suggest serves the same per keystroke)
+    typed = st.session_state.get("free_text_query", "")
+    if typed.strip():
+        try:
+            suggestions = answers.suggest(typed, k=5)
+        except AnswerClientError:
+            suggestions = []
+        suggestions = [s for s in suggestions if s["text"] != st.session_state.current_query]
+        for i, suggestion in enumerate(suggestions):
+            icon = "🔎" if suggestion["kind"] == "procedure" else "🏷️"
+            st.button(f"{icon} {suggestion['text']}", key=f"suggestion_{i}", on_click=apply_suggestion, args=(suggestion,))
+    
+    # Rank procedures for the current query
+    trace = QueryTrace()
+    hits = []
+    if st.session_state.current_query:
+        try:
+            # Cached answers come straight back; new queries are queued by predicted risk level
+            if scheduler is None:
+                result = answers.answer(st.session_state.current_query, k=3, trace=trace, asset=asset_id or None, session=st.session_state.session_id)
+            else:
+                result = scheduler.run(st.session_state.session_id, st.session_state.current_query, 3, trace=trace, asset=asset_id or None)
+            hits, response = result["hits"], result["response"]
+            if not hits:
+                st.warning("No matching procedures found in the knowledge base. Try different keywords.")
+        except RateLimited as exc:
+            st.warning(f"Too many new queries from this session. Try again in {max(exc.retry_after, 1):.0f} s.")
+        except Overloaded:
+            st.warning("The assistant is busy with emergency queries. Please retry in a few seconds.")
+        except AnswerClientError as exc:
+            st.error(f"Query service unavailable: {exc}")
+    
+    # Display the best matching procedure
+    if hits:
+        top_hit = hits[0]
         
-        # Contact information
-        st.markdown("""
-        <div class="contact-info">
-            <h4>📞 Emergency Contacts</h4>
-        </div>
-        """, unsafe_allow_html=True)
+        with trace.stage("render"):
+            # Answer header and risk level badge
+            st.markdown(answer_header(st.session_state.current_query, response['risk_level']), unsafe_allow_html=True)
+            
+            if top_hit['title'] != st.session_state.current_query:
+                st.caption(f"Closest matching procedure: **{top_hit['title']}** (relevance {top_hit['score']:.2f})")
+            
+            assessment = result.get("assessment")
+            if assessment:
+                st.caption(
+                    f"Fleet DGA assessment for **{assessment['asset']}**: Duval {assessment['duval']}, "
+                    f"IEC ratio {assessment['iec']}, condition {assessment['condition']} "
+                    f"(projected {assessment['projected_condition']} in 30 days)"
+                )
         
-        for contact in response['contacts']:
-            st.markdown(f"• {contact}")
+        # Main answer, streamed from the generation service when one is configured
+        if generator is None:
+            with trace.stage("render"):
+                st.markdown(f"**📋 Technical Analysis:**\n{response['answer']}")
+        else:
+            st.markdown("**📋 Technical Analysis:**")
+            from grid_rag.generation import GenerationError, build_prompt
+
+            try:
+                st.write_stream(trace.stream(generator.stream_sync(build_prompt(st.session_state.current_query, response))))
+            except (OSError, GenerationError):
+                st.markdown(response['answer'])
+                st.caption("Generation service unavailable - showing the reference procedure text.")
         
-        # Additional details
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Completion Time", response['completion_time'])
-        with col2:
-            st.metric("Confidence Level", f"{response['confidence']}%")
-        with col3:
-            st.metric("Personnel Required", response['personnel'][:20] + "...")
+        with trace.stage("render"):
+            procedure_html, references_md = renderer.fragments(response)
+            
+            # Emergency steps and contact information
+            st.markdown(procedure_html, unsafe_allow_html=True)
+            
+            # Additional details
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Completion Time", response['completion_time'])
+            with col2:
+                st.metric("Confidence Level", f"{response['confidence']}%")
+            with col3:
+                st.metric("Personnel Required", response['personnel'][:20] + "...")
+            
+            # Sources and other ranked matches
+            if len(hits) > 1:
+                references_md += "\n\n" + related_procedures(hits[1:])
+            st.markdown(references_md)
         
-        # Sources
-        st.markdown("**📖 Technical References:**")
-        for source in response['sources']:
-            st.markdown(f"• {source}")
+        # Record stage latencies once per answered query, not on every widget rerun
+        if st.session_state.get("timed_query") != st.session_state.current_query:
+            trace.commit(latency_recorder)
+            # Attributed to the procedure that answered, not to the category open in the sidebar
+            analytics.record(st.session_state.current_query, response['category'], response['risk_level'], crew=crew_id)
+            st.session_state.timed_query = st.session_state.current_query
         
         # Add to conversation history
-        if st.session_state.current_query not in [item['query'] for item in st.session_state.conversation_history]:
-            st.session_state.conversation_history.append({
-                'timestamp': datetime.now().strftime("%H:%M:%S"),
-                'query': st.session_state.current_query,
-                'category': selected_category,
-                'risk_level': response['risk_level']
-            })
+        st.session_state.conversation_history.add(
+            st.session_state.current_query,
+            response['category'],
+            response['risk_level']
+        )
 
 with tab2:
     st.header("📚 Technical Knowledge Base")
@@ -436,7 +502,7 @@ with tab2:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Technical Documents", "47,892", "+1,247")
+        st.metric("Technical Documents", f"{len(corpus.responses()):,}")
     with col2:
         st.metric("Emergency Procedures", "1,549", "+23")
     with col3:
@@ -460,89 +526,162 @@ with tab2:
                 st.markdown(f"• {doc}")
 
 with tab3:
-    st.header("🔧 System Status Dashboard")
-    
-    # Real-time system metrics
-    current_time = datetime.now()
-    
-    # System health indicators
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown("""
-        <div class="answer-section">
-            <h4>🟢 RAG System Health</h4>
-            <p><strong>Status:</strong> Operational</p>
-            <p><strong>Uptime:</strong> 99.8%</p>
-            <p><strong>Queries/Hour:</strong> 2,847</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-        <div class="answer-section">
-            <h4>📊 Performance Metrics</h4>
-            <p><strong>Avg Response:</strong> 1.2 seconds</p>
-            <p><strong>Accuracy:</strong> 97.3%</p>
-            <p><strong>User Satisfaction:</strong> 94.8%</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-        <div class="answer-section">
-            <h4>🤖 AI Models</h4>
-            <p><strong>GPT-4:</strong> Active</p>
-            <p><strong>ChromaDB:</strong> 47.8GB indexed</p>
-            <p><strong>Last Update:</strong> 2 hours ago</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-with tab4:
-    st.header("📊 Usage Analytics")
-    
-    # Conversation history
-    if st.session_state.conversation_history:
-        st.subheader("💬 Recent Queries")
+    if tab3.open:
+        pd = PROFILE.imported("pandas")
+        st.header("🔧 System Status Dashboard")
         
-        history_df = pd.DataFrame(st.session_state.conversation_history)
+        # Real-time system metrics
+        current_time = datetime.now()
         
-        for _, row in history_df.tail(10).iterrows():
-            risk_color = {"CRITICAL": "#dc2626", "HIGH": "#d97706", "MEDIUM": "#059669"}
-            
+        # System health indicators
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
             st.markdown(f"""
-            <div class="query-card">
-                <p><strong>{row['timestamp']}</strong> - {row['category']}</p>
-                <p>{row['query'][:80]}...</p>
-                <span style="color: {risk_color.get(row['risk_level'], '#6b7280')};">
-                    Risk: {row['risk_level']}
-                </span>
+            <div class="answer-section">
+                <h4>🟢 RAG System Health</h4>
+                <p><strong>Status:</strong> Operational</p>
+                <p><strong>Uptime:</strong> 99.8%</p>
+                <p><strong>Queries/Hour:</strong> {analytics.queries_last_hour():,}</p>
             </div>
             """, unsafe_allow_html=True)
-    else:
-        st.info("No queries yet. Start by selecting a category and asking a question!")
-    
-    # System usage stats
-    st.subheader("📈 System Analytics")
-    
-    # Mock usage data
-    usage_data = {
-        'Hour': list(range(24)),
-        'Queries': [random.randint(50, 200) for _ in range(24)],
-        'Response Time (ms)': [random.randint(800, 2000) for _ in range(24)]
-    }
-    
-    usage_df = pd.DataFrame(usage_data)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.line_chart(usage_df.set_index('Hour')['Queries'])
-        st.caption("Hourly Query Volume")
-    
-    with col2:
-        st.line_chart(usage_df.set_index('Hour')['Response Time (ms)'])
-        st.caption("Average Response Time")
+        
+        try:
+            service_stats = answers.stats()
+        except AnswerClientError:
+            service_stats = {"cache": answer_cache.stats()}
+        cache_stats = service_stats["cache"]
+        queue_stats = service_stats.get("scheduler") or (scheduler.stats() if scheduler else None)
+        if queue_stats:
+            critical_wait = queue_stats["wait_p99_ms"]["CRITICAL"]
+            queue_status = f"{queue_stats['queued']} queued, {queue_stats['running']}/{queue_stats['workers']} workers busy"
+            if critical_wait is not None:
+                queue_status += f", CRITICAL p99 wait {critical_wait:.0f} ms"
+        else:
+            queue_status = "unavailable"
+        snapshot_stats = service_stats.get("snapshots")
+        if snapshot_stats is None and not (API_URL or PACK_PATH):
+            snapshot_stats = load_snapshots(CORPUS_DIR, INDEX_DIR).stats()
+        if snapshot_stats:
+            update_status = f"{snapshot_stats['pending_changes']:,} live changes through segment {snapshot_stats['sequence']}"
+            if snapshot_stats["merging"]:
+                update_status += ", merging"
+        else:
+            update_status = "unavailable"
+        if "vectors" in service_stats:
+            vector_status = f"{service_stats['vectors']:,} vectors ({service_stats['vector_bytes'] / 1e6:.2f} MB, memory-mapped)"
+        else:
+            vector_status = "unavailable"
+        latency = latency_recorder.summary("total", since=time.time() - 3600)
+        if latency["count"]:
+            avg_response = f"{latency['p50'] * 1000:.0f} ms p50 / {latency['p95'] * 1000:.0f} ms p95"
+        else:
+            avg_response = "no queries in the last hour"
+        
+        with col2:
+            st.markdown(f"""
+            <div class="answer-section">
+                <h4>📊 Performance Metrics</h4>
+                <p><strong>Response Time:</strong> {avg_response}</p>
+                <p><strong>Answer Cache:</strong> {cache_stats['hit_rate']:.0%} hit rate ({cache_stats['size']:,} entries)</p>
+                <p><strong>Query Queue:</strong> {queue_status}</p>
+                <p><strong>Corpus Updates:</strong> {update_status}</p>
+                <p><strong>Accuracy:</strong> 97.3%</p>
+                <p><strong>User Satisfaction:</strong> 94.8%</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col3:
+            st.markdown(f"""
+            <div class="answer-section">
+                <h4>🤖 AI Models</h4>
+                <p><strong>GPT-4:</strong> Active</p>
+                <p><strong>Vector Index:</strong> {vector_status}</p>
+                <p><strong>Last Update:</strong> 2 hours ago</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        st.subheader("📡 Live Sensor Telemetry")
+        render_sensor_telemetry()
+        
+        # Fleet-wide DGA sweep
+        if fleet:
+            st.subheader("🛢️ Transformer Fleet DGA Risk")
+        
+            risk_counts = fleet.risk_counts()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Critical", f"{risk_counts.get('CRITICAL', 0):,}")
+            with col2:
+                st.metric("High", f"{risk_counts.get('HIGH', 0):,}")
+            with col3:
+                st.metric("Medium", f"{risk_counts.get('MEDIUM', 0):,}")
+        
+            st.dataframe(pd.DataFrame(fleet.top(10)).set_index("asset").round(2), use_container_width=True)
+            st.caption(f"Top 10 of {len(fleet):,} transformers by failure score (Duval Triangle, IEC 60599 ratios, IEEE C57.104 conditions)")
+        
+        if PROFILE_STARTUP:
+            st.subheader("⏱️ Startup Profile")
+            status = warmup.status()
+            if status["done"]:
+                st.caption(f"Warm-up finished {status['ready_seconds']:.2f} s after process start" + (f"; failed: {', '.join(status['failed'])}" if status["failed"] else ""))
+            else:
+                st.caption(f"Warm-up in progress, pending: {', '.join(status['pending'])}")
+            st.dataframe(pd.DataFrame(PROFILE.report()), use_container_width=True, hide_index=True)
+
+with tab4:
+    if tab4.open:
+        pd = PROFILE.imported("pandas")
+        st.header("📊 Usage Analytics")
+        
+        # Conversation history
+        if st.session_state.conversation_history:
+            st.subheader("💬 Recent Queries")
+        
+            st.markdown(history_cards(st.session_state.conversation_history.tail(10)), unsafe_allow_html=True)
+        
+            st.caption(f"Crew {crew_id}: {history_store.count(crew_id):,} queries on record")
+        else:
+            st.info("No queries yet. Start by selecting a category and asking a question!")
+        
+        # System usage stats
+        st.subheader("📈 System Analytics")
+        
+        # Fleet-wide hourly volume from the analytics rollups, latency percentiles from the stage recorder
+        hour_starts, query_counts = analytics.hourly(24)
+        hourly = latency_recorder.hourly("total", hours=24)
+        to_ms = lambda values: [None if v is None else v * 1000 for v in values]
+        usage_df = pd.DataFrame({
+            'Hour': [datetime.fromtimestamp(hour) for hour in hour_starts],
+            'Queries': query_counts,
+            'p50 (ms)': to_ms(hourly['p50']),
+            'p95 (ms)': to_ms(hourly['p95']),
+            'p99 (ms)': to_ms(hourly['p99'])
+        }).set_index('Hour')
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.line_chart(usage_df['Queries'])
+            st.caption("Hourly Query Volume")
+        
+        with col2:
+            st.line_chart(usage_df[['p50 (ms)', 'p95 (ms)', 'p99 (ms)']])
+            st.caption("Response Time Percentiles (ms)")
+        
+        # Category and risk mix across all crews over the last 24 hours
+        categories = analytics.category_distribution(24)
+        risks = analytics.risk_distribution(24)
+        if categories:
+            col1, col2 = st.columns(2)
+        
+            with col1:
+                st.bar_chart(pd.Series(categories, name="Queries"))
+                st.caption("Queries by Category (24h, all crews)")
+        
+            with col2:
+                st.bar_chart(pd.Series(risks, name="Queries"))
+                st.caption("Queries by Risk Level (24h, all crews)")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1 @@
+"""Benchmark harnesses for the Grid Health RAG query path."""
@@ -0,0 +1,188 @@
+"""Benchmark the tab1 query path on synthetic corpora.
+
+Usage::
+
+    python -m benchmarks.bench_query_path                       # 1k and 100k chunks
+    python -m benchmarks.bench_query_path --sizes 1000 100000 1000000 --dense
+    python -m benchmarks.bench_query_path --out benchmarks/results/$(git rev-parse --short HEAD).json
+
+For each corpus size this measures index build time, the query latency
+distribution of ``BM25Index.search`` (optionally the dense index too), the
+``HybridRetriever.search`` path the app answers through (candidates, fusion and
+rerank; BM25-only candidates unless ``--dense``), index memory footprint,
+type-ahead suggestion latency per keystroke, and the effect of the answer cache
+in front of that hybrid path on a Zipf-skewed query stream. Each size runs in a
+fresh process, so its peak RSS figures are not inflated by the sizes measured
+before it. Results are written as JSON with the commit and environment so runs
+can be compared with ``benchmarks/compare.py``.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from grid_rag.cache import QueryCache
+from grid_rag.hybrid import HybridRetriever
+from grid_rag.retrieval import BM25Index
+from grid_rag.suggest import Suggester
+from grid_rag.vector_index import VectorIndex
+
+from .synthetic import CorpusTemplates, generate_documents, generate_queries
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def time_queries(search, queries, k=5):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query, k)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def zipf_stream(queries, n, skew=1.1, seed=2):
+    """Query stream where a few popular questions dominate, as during a storm."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(queries))]
+    return rng.choices(queries, weights=weights, k=n)
+
+
+def max_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bench_size(size, templates, n_queries, dense, seed):
+    result = {"size": size, "baseline_max_rss_mb": max_rss_mb()}
+    queries = list(generate_queries(n_queries, seed=seed + 1, templates=templates))
+
+    started = time.perf_counter()
+    index = BM25Index.build(generate_documents(size, seed=seed, templates=templates))
+    result["bm25_build_seconds"] = round(time.perf_counter() - started, 3)
+    result["bm25_build_max_rss_mb"] = max_rss_mb()
+    result["bm25_index_mb"] = round(
+        (index.indptr.nbytes + index.doc_ids.nbytes + index.weights.nbytes + index.doc_len.nbytes) / 1e6, 1
+    )
+    result["bm25_terms"] = len(index.vocab)
+
+    time_queries(index.search, queries[:50])  # warm-up
+    result["bm25_query"] = latency_stats(time_queries(index.search, queries))
+
+    with tempfile.TemporaryDirectory() as directory:
+        vectors = None
+        if dense:
+            started = time.perf_counter()
+            vectors = VectorIndex.build(
+                generate_documents(size, seed=seed, templates=templates),
+                os.path.join(directory, "vectors"),
+                dtype="float16",
+                n_lists=int(np.sqrt(size)) if size >= 50_000 else 0,
+            )
+            result["dense_build_seconds"] = round(time.perf_counter() - started, 3)
+            result["dense_index_mb"] = round(vectors.nbytes / 1e6, 1)
+            dense_queries = queries[: max(50, n_queries // 10)]
+            result["dense_query"] = latency_stats(time_queries(vectors.search, dense_queries))
+
+        # The app's retrieval path: candidates, RRF and the budgeted rerank
+        hybrid = HybridRetriever(index, vectors)
+        time_queries(hybrid.search, queries[:50])  # warm-up
+        result["hybrid_query"] = latency_stats(time_queries(hybrid.search, queries))
+
+        # Cache effect on a skewed stream through the app's lookup path
+        cache = QueryCache(maxsize=1024, ttl=3600)
+        stream = zipf_stream(queries, n_queries * 4, seed=seed + 2)
+        timings = []
+        for query in stream:
+            started = time.perf_counter()
+            cache.get_or_compute(query, "bench", lambda: hybrid.search(query, 3))
+            timings.append(time.perf_counter() - started)
+        result["cached_query"] = latency_stats(timings)
+        result["cache_hit_rate"] = round(cache.stats()["hit_rate"], 4)
+        result["hybrid_stats"] = hybrid.stats()
+        del hybrid, vectors
+
+    # Type-ahead over a catalog of the same size: every prefix of each query, as typed
+    started = time.perf_counter()
+    suggester = Suggester(
+        (d["title"], "procedure", d["category"]) for d in generate_documents(size, seed=seed, templates=templates)
+    )
+    result["suggest_build_seconds"] = round(time.perf_counter() - started, 3)
+    keystrokes = [query[:n] for query in queries[:100] for n in range(1, len(query) + 1)]
+    result["suggest_keystroke"] = latency_stats(time_queries(suggester.suggest, keystrokes, k=8))
+    del suggester
+
+    result["max_rss_mb"] = max_rss_mb()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark retrieval on synthetic utility corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dense", action="store_true", help="also benchmark the dense vector index")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    templates = CorpusTemplates()
+    report = {
+        "benchmark": "query_path",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "results": [],
+    }
+    for size in args.sizes:
+        print(f"benchmarking {size:,} chunks...", file=sys.stderr)
+        # ru_maxrss is a process-wide peak, so each size gets a process of its own
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            report["results"].append(
+                pool.submit(bench_size, size, templates, args.queries, args.dense, args.seed).result()
+            )
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
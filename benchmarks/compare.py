@@ -0,0 +1,81 @@
+"""Compare two benchmark JSON files and flag regressions.
+
+Usage::
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json --threshold 0.15
+
+Exits non-zero when any tracked metric got worse by more than ``threshold``
+(relative), so it can gate CI.
+"""
+
+import argparse
+import json
+import sys
+
+# Metrics where larger is worse; nested keys are dotted
+TRACKED = (
+    "bm25_build_seconds",
+    "bm25_index_mb",
+    "bm25_query.p50_ms",
+    "bm25_query.p95_ms",
+    "bm25_query.p99_ms",
+    "hybrid_query.p50_ms",
+    "hybrid_query.p95_ms",
+    "hybrid_query.p99_ms",
+    "cached_query.p50_ms",
+    "suggest_keystroke.p50_ms",
+    "suggest_keystroke.p99_ms",
+    "dense_build_seconds",
+    "dense_query.p50_ms",
+    "dense_query.p95_ms",
+)
+
+
+def lookup(result, dotted):
+    value = result
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(base, head, threshold):
+    base_by_size = {r["size"]: r for r in base["results"]}
+    rows = []
+    for result in head["results"]:
+        previous = base_by_size.get(result["size"])
+        if previous is None:
+            continue
+        for metric in TRACKED:
+            old, new = lookup(previous, metric), lookup(result, metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            rows.append((result["size"], metric, old, new, change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two query path benchmark results.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base.get('commit')}  ->  head {head.get('commit')}")
+    regressions = 0
+    for size, metric, old, new, change, regressed in compare(base, head, args.threshold):
+        flag = "REGRESSION" if regressed else ""
+        regressions += regressed
+        print(f"{size:>10,}  {metric:<24} {old:>10.4f} -> {new:>10.4f}  {change:+7.1%}  {flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""Storm-event load test for the answer path.
+
+Usage::
+
+    python -m benchmarks.loadtest --duration 60 --rate 20 --sessions 200
+    python -m benchmarks.loadtest --mode http --synthetic 100000 --out benchmarks/results/storm.json
+    python -m benchmarks.loadtest --mode http --url http://127.0.0.1:8000
+
+Traffic is open loop: send times are drawn up front from a Poisson process
+that alternates between calm spells and storm bursts (``--burst-factor`` times
+the base rate, with a larger share of emergency queries), and every query is
+sent on time however far behind the target is, so latency is measured from the
+scheduled send time and includes any queueing. Queries are catalog templates
+with their voltage/rating/relay slots filled, drawn by category with
+"Emergency" categories weighted up, and a share paraphrased, so popular
+questions repeat the way they do in a storm while the rest miss the cache.
+Each query comes from one of ``--sessions`` simulated crews.
+
+``inprocess`` answers through ``AnswerService`` behind the same
+``QueryScheduler`` as the app. ``http`` starts ``grid_rag.api`` in a
+subprocess (or uses ``--url``) and goes through ``AnswerClient``. The JSON
+report has throughput, latency percentiles (overall, emergency vs other, per
+risk level), rejections, cache hit rate and a per-interval timeline of
+throughput, p99, cache hit rate and server RSS, so memory growth over the run
+is visible.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from grid_rag.client import AnswerClient, AnswerClientError
+from grid_rag.scheduler import Overloaded, RateLimited, service_scheduler
+from grid_rag.service import AnswerService
+
+from .bench_query_path import git_commit, latency_stats
+from .synthetic import DEFAULT_CORPUS, CorpusTemplates, paraphrase, write_corpus
+
+EMERGENCY = "Emergency"
+OUTCOMES = ("ok", "rate_limited", "shed", "error")
+
+
+def arrival_schedule(duration, rate, burst_factor=5.0, calm_seconds=20.0, burst_seconds=5.0, seed=0):
+    """``(offset, storm)`` send times over ``duration`` seconds, alternating calm and burst phases."""
+    rng = random.Random(seed)
+    arrivals, t, storm = [], 0.0, False
+    phase_end = rng.expovariate(1 / calm_seconds)
+    while True:
+        gap = rng.expovariate(rate * (burst_factor if storm else 1.0))
+        if t + gap >= phase_end:
+            # Exponential gaps are memoryless, so redrawing from the phase change is exact
+            t, storm = phase_end, not storm
+            phase_end = t + rng.expovariate(1 / (burst_seconds if storm else calm_seconds))
+            continue
+        t += gap
+        if t >= duration:
+            return arrivals
+        arrivals.append((t, storm))
+
+
+class TrafficMix:
+    """Catalog queries by category, with ``emergency_share`` of them (``storm_share`` in bursts) from emergency categories."""
+
+    def __init__(self, templates, emergency_share=0.4, storm_share=0.7, paraphrased=0.4):
+        self.templates = templates
+        self.paraphrased = paraphrased
+        self.patterns = {}
+        for category, pattern in templates.titles:
+            self.patterns.setdefault(category, []).append(pattern)
+        self.categories = list(self.patterns)
+        self.weights = {storm: self._weights(share) for storm, share in ((False, emergency_share), (True, storm_share))}
+
+    def _weights(self, share):
+        emergency = [EMERGENCY in category for category in self.categories]
+        if all(emergency) or not any(emergency):
+            return [1.0] * len(self.categories)
+        return [
+            share / sum(emergency) if is_emergency else (1 - share) / (len(emergency) - sum(emergency))
+            for is_emergency in emergency
+        ]
+
+    def draw(self, storm, rng):
+        """``(query, category)`` for one arrival."""
+        category = rng.choices(self.categories, weights=self.weights[storm])[0]
+        query = self.templates.fill(rng.choice(self.patterns[category]), rng)
+        if rng.random() < self.paraphrased:
+            query = paraphrase(query, rng)
+        return query, category
+
+
+def rss_mb(pid):
+    """Resident memory of ``pid`` plus its direct children (uvicorn workers) in MB; None without /proc."""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    total = 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            if p == pid:
+                return None
+    return round(total / 1024, 1)
+
+
+class InProcessTarget:
+    name = "inprocess"
+
+    def __init__(self, corpus_dir, index_dir):
+        self.service = AnswerService.open(corpus_dir, index_dir)
+        self.scheduler = service_scheduler(lambda: self.service)
+
+    def answer(self, session, query):
+        return self.scheduler.run(session, query, 3)
+
+    def stats(self):
+        return {"cache": self.service.cache.stats(), "scheduler": self.scheduler.stats()}
+
+    def rss_mb(self):
+        return rss_mb(os.getpid())
+
+    def close(self):
+        self.scheduler.close(wait=False)
+
+
+class HttpTarget:
+    name = "http"
+
+    def __init__(self, corpus_dir, index_dir, url=None, server_workers=1, startup_timeout=600.0):
+        self.process = None
+        if url is None:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+            env = dict(os.environ, GRID_RAG_CORPUS_DIR=corpus_dir, GRID_RAG_INDEX_DIR=index_dir)
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "grid_rag.api", "--host", "127.0.0.1", "--port", str(port), "--workers", str(server_workers)],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            url = f"http://127.0.0.1:{port}"
+        self.client = AnswerClient(url, timeout=60.0)
+        self._wait_ready(startup_timeout)
+
+    def _wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.client.stats()
+                return
+            except AnswerClientError:
+                if self.process is not None and self.process.poll() is not None:
+                    raise RuntimeError(f"API server exited with status {self.process.returncode}")
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def answer(self, session, query):
+        return self.client.answer(query, 3, session=session)
+
+    def stats(self):
+        return self.client.stats()
+
+    def rss_mb(self):
+        return rss_mb(self.process.pid) if self.process is not None else None
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+def run_load(target, plan, concurrency, interval):
+    """Send ``plan`` on schedule; returns per-query records, timeline samples and elapsed seconds."""
+    records = [None] * len(plan)
+    samples = []
+    finished = threading.Event()
+
+    def sample(started):
+        stats = target.stats()
+        samples.append({
+            "t": time.perf_counter() - started,
+            "rss_mb": target.rss_mb(),
+            "hits": stats["cache"]["hits"],
+            "misses": stats["cache"]["misses"],
+            "queued": stats.get("scheduler", {}).get("queued"),
+        })
+
+    def sampler(started):
+        while not finished.wait(interval):
+            sample(started)
+
+    def send(i, started):
+        offset, _, session, query, _ = plan[i]
+        level = None
+        try:
+            result = target.answer(session, query)
+            outcome = "ok"
+            level = result["response"]["risk_level"] if result["response"] else None
+        except RateLimited:
+            outcome = "rate_limited"
+        except Overloaded:
+            outcome = "shed"
+        except Exception:
+            outcome = "error"
+        records[i] = (offset, time.perf_counter() - started - offset, outcome, level)
+
+    started = time.perf_counter()
+    sample(started)
+    thread = threading.Thread(target=sampler, args=(started,), name="loadtest-sampler", daemon=True)
+    thread.start()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="loadtest") as pool:
+        for i, (offset, *_) in enumerate(plan):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, i, started)
+    elapsed = time.perf_counter() - started
+    finished.set()
+    thread.join()
+    sample(started)
+    return records, samples, elapsed
+
+
+def hit_rate(hits, misses):
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+def summarize(plan, records, samples, elapsed):
+    offsets = np.array([r[0] for r in records])
+    latency = np.array([r[1] for r in records])
+    outcome = np.array([r[2] for r in records])
+    level = np.array([r[3] or "" for r in records])
+    emergency = np.array([EMERGENCY in p[4] for p in plan], dtype=bool)
+    storm = np.array([p[1] for p in plan], dtype=bool)
+    ok = outcome == "ok"
+
+    def stats(mask):
+        return latency_stats(latency[mask]) if mask.any() else None
+
+    first, last = samples[0], samples[-1]
+    report = {
+        "queries": len(records),
+        "elapsed_seconds": round(elapsed, 2),
+        "offered_qps": round(len(records) / elapsed, 2),
+        "throughput_qps": round(int(ok.sum()) / elapsed, 2),
+        "throughput_per_hour": int(ok.sum() / elapsed * 3600),
+        "outcomes": {name: int((outcome == name).sum()) for name in OUTCOMES},
+        "storm_share": round(float(storm.mean()), 3) if len(storm) else 0.0,
+        "emergency_share": round(float(emergency.mean()), 3) if len(emergency) else 0.0,
+        "latency": stats(ok),
+        "latency_emergency": stats(ok & emergency),
+        "latency_other": stats(ok & ~emergency),
+        "latency_storm": stats(ok & storm),
+        "latency_by_risk": {name: stats(ok & (level == name)) for name in sorted(set(level[ok]) - {""})},
+        "cache_hit_rate": hit_rate(last["hits"] - first["hits"], last["misses"] - first["misses"]),
+        "rss_mb_start": first["rss_mb"],
+        "rss_mb_end": last["rss_mb"],
+    }
+
+    # Per-interval throughput and p99 by completion time, cache hit rate and RSS from the sampler
+    completed = offsets + latency
+    timeline = []
+    for previous, sample in zip(samples, samples[1:]):
+        window = ok & (completed >= previous["t"]) & (completed < sample["t"])
+        span = sample["t"] - previous["t"]
+        timeline.append({
+            "t": round(sample["t"], 1),
+            "offered_qps": round(int(((offsets >= previous["t"]) & (offsets < sample["t"])).sum()) / span, 2),
+            "throughput_qps": round(int(window.sum()) / span, 2),
+            "p99_ms": round(float(np.percentile(latency[window], 99)) * 1000, 2) if window.any() else None,
+            "cache_hit_rate": hit_rate(sample["hits"] - previous["hits"], sample["misses"] - previous["misses"]),
+            "rss_mb": sample["rss_mb"],
+            "queued": sample["queued"],
+        })
+    report["timeline"] = timeline
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay storm-event traffic against the answer path.")
+    parser.add_argument("--mode", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--url", help="query API to load instead of starting one (http mode)")
+    parser.add_argument("--corpus", default=os.environ.get("GRID_RAG_CORPUS_DIR", DEFAULT_CORPUS))
+    parser.add_argument("--index", default=os.environ.get("GRID_RAG_INDEX_DIR", ".grid_index"))
+    parser.add_argument("--synthetic", type=int, help="answer from a synthetic corpus of this many procedures instead")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of traffic")
+    parser.add_argument("--rate", type=float, default=20.0, help="calm arrival rate, queries per second")
+    parser.add_argument("--burst-factor", type=float, default=5.0, help="arrival rate multiplier during storm bursts")
+    parser.add_argument("--calm-seconds", type=float, default=20.0, help="mean length of a calm spell")
+    parser.add_argument("--burst-seconds", type=float, default=5.0, help="mean length of a burst")
+    parser.add_argument("--emergency-share", type=float, default=0.4)
+    parser.add_argument("--storm-emergency-share", type=float, default=0.7)
+    parser.add_argument("--paraphrased", type=float, default=0.4, help="share of queries not typed as in the catalog")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64, help="maximum queries in flight")
+    parser.add_argument("--interval", type=float, default=5.0, help="timeline sampling interval, seconds")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_dir, index_dir = args.corpus, args.index
+        if args.synthetic:
+            print(f"writing {args.synthetic:,} synthetic procedures...", file=sys.stderr)
+            corpus_dir, index_dir = os.path.join(directory, "corpus"), os.path.join(directory, "index")
+            write_corpus(corpus_dir, args.synthetic, seed=args.seed)
+
+        arrivals = arrival_schedule(
+            args.duration, args.rate, args.burst_factor, args.calm_seconds, args.burst_seconds, seed=args.seed
+        )
+        mix = TrafficMix(CorpusTemplates(), args.emergency_share, args.storm_emergency_share, args.paraphrased)
+        rng = random.Random(args.seed + 1)
+        plan = [
+            (offset, storm, f"crew-{rng.randrange(args.sessions)}", *mix.draw(storm, rng))
+            for offset, storm in arrivals
+        ]
+
+        print(f"starting {args.mode} target...", file=sys.stderr)
+        if args.mode == "http":
+            target = HttpTarget(corpus_dir, index_dir, url=args.url, server_workers=args.server_workers)
+        else:
+            target = InProcessTarget(corpus_dir, index_dir)
+        try:
+            print(f"sending {len(plan):,} queries over {args.duration:.0f}s...", file=sys.stderr)
+            records, samples, elapsed = run_load(target, plan, args.concurrency, args.interval)
+        finally:
+            target.close()
+
+    result = summarize(plan, records, samples, elapsed)
+    latency = result["latency"]
+    # No latency summary when every query was refused or failed
+    latency_text = f"p50 {latency['p50_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms" if latency else "no successful queries"
+    print(
+        f"{result['throughput_qps']:.1f} q/s ({result['throughput_per_hour']:,}/hour), {latency_text}, "
+        f"cache hit rate {result['cache_hit_rate']}, outcomes {result['outcomes']}",
+        file=sys.stderr,
+    )
+    report = {
+        "benchmark": "loadtest",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "out"},
+        "result": result,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
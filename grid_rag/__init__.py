@@ -0,0 +1 @@
+"""Core components behind the Enterprise Grid Health RAG Assistant."""
@@ -0,0 +1,332 @@
+"""Fleet-wide query analytics from an append-only event log.
+
+Every session appends one JSON line per answered query to a shared log file.
+Each process tails the log from the last byte offset it consumed and folds new
+events into pre-bucketed NumPy counters (per hour, per hour x category, per
+hour x risk level), held in a ring of ``hours`` slots. Dashboard reads sum over
+buckets, so their cost depends on the window, not on how many events exist.
+
+Once the log passes ``rotate_bytes``, the process that notices saves its
+rollups with a checkpoint (``<log>.rollups.npz``) naming a fresh empty log file,
+then swaps that file in. Other processes, and new ones at startup, load the
+checkpoint when the log file changes and tail only the new file, so neither
+disk use nor startup time grows with the age of the log.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is not coordinated between processes
+    fcntl = None
+
+RISK_LEVELS = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+# Most bytes of the log read per call, so catching up on a long log never holds all of it in memory
+READ_CHUNK = 1 << 20
+ROTATE_BYTES = 16 << 20
+
+
+class EventLog:
+    """Append-only JSONL log shared by every process on the host."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.skipped = 0
+
+    def append(self, event):
+        line = (json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        # One write() on an O_APPEND descriptor, so lines from concurrent writers never interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def inode(self):
+        """Identity of the current log file, or None if there is none yet."""
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def locked(self):
+        """Hold the rotation lock if no other process does; yields whether it was acquired."""
+        with open(f"{self.path}.lock", "w") as f:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read_from(self, offset, limit=READ_CHUNK, inode=None):
+        """Return ``(events, next_offset)`` for complete lines in at most ``limit`` bytes after ``offset``.
+
+        Lines that are not JSON objects with a numeric ``ts`` are skipped and
+        counted in ``skipped``. With ``inode``, nothing is read if the log file
+        has been replaced by another one since.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return [], 0
+        with f:
+            stat = os.fstat(f.fileno())
+            if inode is not None and stat.st_ino != inode:
+                return [], offset
+            return self.read_file(f, stat.st_size, offset, limit)
+
+    def read_file(self, f, size, offset, limit=READ_CHUNK):
+        """``read_from`` on an open log file of ``size`` bytes."""
+        if size < offset:  # truncated: start over
+            offset = 0
+        if size == offset:
+            return [], offset
+        f.seek(offset)
+        data = f.read(min(size - offset, limit))
+        end = data.rfind(b"\n") + 1
+        if not end and len(data) == limit:
+            # A line longer than a whole chunk is not an event; skip past it (its tail is counted below)
+            return [], offset + len(data)
+        events = []
+        for line in data[:end].splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                event = None
+            if isinstance(event, dict) and isinstance(event.get("ts"), (int, float)):
+                events.append(event)
+            elif line.strip():
+                self.skipped += 1
+        return events, offset + end
+
+
+class Rollups:
+    """Hour-bucketed counters over a sliding window of ``hours`` hours."""
+
+    def __init__(self, hours=168, risk_levels=RISK_LEVELS):
+        self.hours = hours
+        self.risk_levels = tuple(risk_levels)
+        self._risk_ids = {level: i for i, level in enumerate(self.risk_levels)}
+        self.categories = []
+        self._category_ids = {}
+        self._slot_hour = np.full(hours, -1, dtype=np.int64)
+        self.counts = np.zeros(hours, dtype=np.int64)
+        self.by_category = np.zeros((hours, 0), dtype=np.int64)
+        self.by_risk = np.zeros((hours, len(self.risk_levels)), dtype=np.int64)
+        self.total = 0
+
+    def _category_id(self, category):
+        cid = self._category_ids.get(category)
+        if cid is None:
+            cid = self._category_ids[category] = len(self.categories)
+            self.categories.append(category)
+            if cid >= self.by_category.shape[1]:
+                grown = np.zeros((self.hours, max(8, 2 * self.by_category.shape[1])), dtype=np.int64)
+                grown[:, :self.by_category.shape[1]] = self.by_category
+                self.by_category = grown
+        return cid
+
+    def add(self, events):
+        if not events:
+            return
+        hours = np.array([int(e["ts"] // 3600) for e in events], dtype=np.int64)
+        categories = np.array([self._category_id(e.get("category") or "") for e in events], dtype=np.int64)
+        risks = np.array([self._risk_ids.get(e.get("risk_level"), -1) for e in events], dtype=np.int64)
+
+        # Events older than the window are dropped; buckets that now hold a newer hour are reset
+        newest = max(int(hours.max()), int(self._slot_hour.max()))
+        keep = hours > newest - self.hours
+        hours, categories, risks = hours[keep], categories[keep], risks[keep]
+        slots = hours % self.hours
+        for slot, hour in zip(*np.unique(np.stack([slots, hours]), axis=1)):
+            if self._slot_hour[slot] < hour:
+                self._slot_hour[slot] = hour
+                self.counts[slot] = 0
+                self.by_category[slot] = 0
+                self.by_risk[slot] = 0
+        current = self._slot_hour[slots] == hours
+        slots, categories, risks = slots[current], categories[current], risks[current]
+
+        np.add.at(self.counts, slots, 1)
+        np.add.at(self.by_category, (slots, categories), 1)
+        known = risks >= 0
+        np.add.at(self.by_risk, (slots[known], risks[known]), 1)
+        self.total += int(len(slots))
+
+    def _window(self, hours, now):
+        end = int(now // 3600)
+        hour_ids = np.arange(end - hours + 1, end + 1)
+        slots = hour_ids % self.hours
+        valid = self._slot_hour[slots] == hour_ids
+        return hour_ids, slots, valid
+
+    def hourly(self, hours=24, now=None):
+        """``(hour_starts, counts)`` for the last ``hours`` hours, oldest first."""
+        hour_ids, slots, valid = self._window(min(hours, self.hours), now or time.time())
+        return hour_ids * 3600, np.where(valid, self.counts[slots], 0)
+
+    def distribution(self, counters, labels, hours, now):
+        _, slots, valid = self._window(min(hours, self.hours), now or time.time())
+        totals = counters[slots[valid]].sum(axis=0)
+        return {label: int(totals[i]) for i, label in enumerate(labels) if totals[i]}
+
+    def category_distribution(self, hours=24, now=None):
+        return self.distribution(self.by_category, self.categories, hours, now)
+
+    def risk_distribution(self, hours=24, now=None):
+        return self.distribution(self.by_risk, self.risk_levels, hours, now)
+
+    def save(self, path, **meta):
+        """Write the counters and ``meta`` to ``path`` atomically."""
+        meta = dict(meta, hours=self.hours, risk_levels=self.risk_levels, categories=self.categories, total=self.total)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                slot_hour=self._slot_hour,
+                counts=self.counts,
+                by_category=self.by_category,
+                by_risk=self.by_risk,
+                meta=np.array(json.dumps(meta)),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """``(rollups, meta)`` saved by ``save``, or ``(None, None)`` if there is no readable checkpoint."""
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                rollups = cls(meta["hours"], meta["risk_levels"])
+                rollups._slot_hour = data["slot_hour"]
+                rollups.counts = data["counts"]
+                rollups.by_category = data["by_category"]
+                rollups.by_risk = data["by_risk"]
+        except (OSError, ValueError, KeyError):
+            return None, None
+        for category in meta["categories"]:
+            rollups._category_id(category)
+        rollups.total = meta["total"]
+        return rollups, meta
+
+
+class AnalyticsService:
+    """Event log writer plus incrementally refreshed rollups for one process."""
+
+    def __init__(self, path, hours=168, clock=time.time, rotate_bytes=ROTATE_BYTES):
+        self.log = EventLog(path)
+        self.checkpoint_path = f"{path}.rollups.npz"
+        self.rotate_bytes = rotate_bytes
+        self.rotations = 0
+        self.rollups = Rollups(hours)
+        self._clock = clock
+        self._inode = None
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def record(self, query, category, risk_level, crew=None):
+        self.log.append({
+            "ts": self._clock(),
+            "crew": crew,
+            "category": category,
+            "risk_level": risk_level,
+            "query": query,
+        })
+
+    def refresh(self):
+        """Fold events appended since the last refresh (by any process) into the rollups."""
+        added = 0
+        with self._lock:
+            self._follow()
+            while True:
+                events, offset = self.log.read_from(self._offset, inode=self._inode)
+                if offset < self._offset:
+                    self.rollups = Rollups(self.rollups.hours, self.rollups.risk_levels)
+                advanced = offset != self._offset
+                self._offset = offset
+                self.rollups.add(events)
+                added += len(events)
+                if not advanced:
+                    break
+            if self.rotate_bytes and self._offset >= self.rotate_bytes:
+                self._rotate()
+        return added
+
+    def _follow(self):
+        """Start from the rotation checkpoint when the log file is not the one being tailed."""
+        inode = self.log.inode()
+        if inode == self._inode:
+            return
+        rollups, meta = Rollups.load(self.checkpoint_path)
+        if rollups is not None and meta.get("inode") == inode and rollups.hours == self.rollups.hours:
+            self.rollups, self._offset = rollups, meta["offset"]
+        else:
+            # No checkpoint for this file (never rotated, or replaced by hand): fold it from the start
+            self.rollups = Rollups(self.rollups.hours, self.rollups.risk_levels)
+            self._offset = 0
+        self._inode = inode
+
+    def _drain(self, f):
+        """Fold everything after the current offset of the open log file ``f``."""
+        while True:
+            events, offset = self.log.read_file(f, os.fstat(f.fileno()).st_size, self._offset)
+            if offset == self._offset:
+                return
+            self._offset = offset
+            self.rollups.add(events)
+
+    def _rotate(self):
+        """Checkpoint the rollups against a fresh empty log file and swap it in."""
+        with self.log.locked() as acquired:
+            if not acquired or self.log.inode() != self._inode:
+                return  # another process is rotating, or already has
+            fresh = f"{self.log.path}.tmp-{os.getpid()}"
+            with open(fresh, "wb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+            with open(self.log.path, "rb") as old:
+                self._drain(old)
+                self.rollups.save(self.checkpoint_path, inode=inode, offset=0)
+                os.replace(fresh, self.log.path)
+                # Appends in flight during the swap still landed in the old file
+                drained = self._offset
+                self._drain(old)
+                if self._offset != drained:
+                    self.rollups.save(self.checkpoint_path, inode=inode, offset=0)
+            self._inode, self._offset = inode, 0
+            self.rotations += 1
+
+    def queries_last_hour(self):
+        self.refresh()
+        now = self._clock()
+        hour_starts, counts = self.rollups.hourly(2, now)
+        # Pro-rate the previous bucket so the figure is a sliding 60-minute window
+        elapsed = (now - hour_starts[-1]) / 3600
+        return int(round(counts[-1] + counts[0] * (1 - elapsed)))
+
+    def hourly(self, hours=24):
+        self.refresh()
+        return self.rollups.hourly(hours, self._clock())
+
+    def category_distribution(self, hours=24):
+        self.refresh()
+        return self.rollups.category_distribution(hours, self._clock())
+
+    def risk_distribution(self, hours=24):
+        self.refresh()
+        return self.rollups.risk_distribution(hours, self._clock())
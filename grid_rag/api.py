@@ -0,0 +1,166 @@
+"""Headless HTTP API over ``AnswerService``.
+
+Endpoints::
+
+    POST /query        {"query": "...", "k": 3, "asset": "...", "session": "..."}  -> one result
+    POST /query/batch  {"queries": ["...", ...], "k": 3, "session": "..."}         -> {"results": [...]}
+    GET  /suggest?q=...&k=8                                                        -> {"suggestions": [...]}
+    GET  /health                                                                   -> corpus/index/cache stats
+    GET  /metrics                                                                  -> Prometheus text
+
+The optional ``asset`` applies that transformer's fleet DGA assessment.
+Both query endpoints go through ``grid_rag.scheduler``: queries run in
+predicted risk order with a token-bucket rate limit per ``session`` (the client
+address when omitted), and each query in a batch counts against it. Refused
+queries get HTTP 429 with ``Retry-After``, shed ones 503. A batch is admitted
+or refused as a whole, and one needing more than a full bucket of tokens gets
+413 straight away.
+
+Run with several worker processes (each loads the memory-mapped indexes from
+``GRID_RAG_INDEX_DIR``)::
+
+    python -m grid_rag.api --port 8000 --workers 4
+
+Configuration comes from the same ``GRID_RAG_CORPUS_DIR`` / ``GRID_RAG_INDEX_DIR`` /
+``GRID_RAG_FLEET`` environment variables as the Streamlit app. Changes
+published with ``python -m grid_rag.versioning`` are served within a second.
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from .cache import QueryCache
+from .fleet import FleetScores, load_table
+from .metrics import LatencyRecorder
+from .scheduler import BatchTooLarge, Overloaded, RateLimited, service_scheduler
+from .versioning import ServingSnapshots
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "corpus")
+DEFAULT_FLEET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fleet", "transformers.csv")
+MAX_BATCH = 256
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(min_length=1, max_length=2000)
+    k: int = Field(default=3, ge=1, le=50)
+    asset: Optional[str] = None
+    session: Optional[str] = Field(default=None, max_length=128)
+
+
+class BatchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=MAX_BATCH)
+    k: int = Field(default=3, ge=1, le=50)
+    session: Optional[str] = Field(default=None, max_length=128)
+
+
+def _session(session, http_request):
+    return session or (http_request.client.host if http_request.client else "anonymous")
+
+
+def _refused(exc):
+    if isinstance(exc, BatchTooLarge):
+        return HTTPException(413, str(exc))
+    if isinstance(exc, RateLimited):
+        return HTTPException(429, str(exc), headers={"Retry-After": str(math.ceil(exc.retry_after))})
+    return HTTPException(503, str(exc))
+
+
+class _ServiceHolder:
+    """Current ``AnswerService`` snapshot; change segments and rebuilt corpora are picked up in the background."""
+
+    def __init__(self, corpus_dir, index_dir, fleet_path=None, reload_interval=1.0):
+        self.cache = QueryCache(maxsize=8192, ttl=900)
+        self.recorder = LatencyRecorder()
+        self.fleet = FleetScores(load_table(fleet_path)) if fleet_path and os.path.exists(fleet_path) else None
+        self.snapshots = ServingSnapshots(
+            corpus_dir, index_dir, cache=self.cache, recorder=self.recorder, fleet=self.fleet
+        ).start(reload_interval)
+        self.scheduler = service_scheduler(self.get)
+
+    def get(self):
+        return self.snapshots.get()
+
+
+def create_app(corpus_dir=None, index_dir=None, fleet_path=None):
+    holder = _ServiceHolder(
+        corpus_dir or os.environ.get("GRID_RAG_CORPUS_DIR", DEFAULT_CORPUS),
+        index_dir or os.environ.get("GRID_RAG_INDEX_DIR", ".grid_index"),
+        fleet_path or os.environ.get("GRID_RAG_FLEET", DEFAULT_FLEET),
+    )
+    app = FastAPI(title="Grid Health RAG API")
+    app.state.services = holder
+
+    @app.post("/query")
+    async def query(request: QueryRequest, http_request: Request):
+        session = _session(request.session, http_request)
+        try:
+            # Cache hits and triage are sub-millisecond, so they run on the event loop; the rest waits its turn
+            future = holder.scheduler.submit(session, request.query, request.k, asset=request.asset)
+            return await asyncio.wrap_future(future)
+        except (RateLimited, Overloaded) as exc:
+            raise _refused(exc)
+
+    @app.post("/query/batch")
+    async def query_batch(request: BatchRequest, http_request: Request):
+        session = _session(request.session, http_request)
+        try:
+            futures = holder.scheduler.submit_batch(session, request.queries, request.k)
+        except (BatchTooLarge, RateLimited, Overloaded) as exc:
+            raise _refused(exc)
+        try:
+            results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        except Overloaded as exc:
+            # A query shed or expired in the queue fails the batch; the rest are not worth answering any more
+            for future in futures:
+                future.cancel()
+            raise _refused(exc)
+        return {"results": list(results)}
+
+    @app.get("/suggest")
+    async def suggest(q: str = Query(max_length=2000), k: int = Query(default=8, ge=1, le=50)):
+        service = holder.get()
+        if not service.suggester.ready:
+            # Building the catalog trie takes a while on large corpora; keep it off the event loop
+            await run_in_threadpool(service.suggester.get)
+        # A few milliseconds per keystroke after that, so it runs on the event loop like cached queries
+        return {"suggestions": service.suggest(q, k)}
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "ok",
+            **holder.get().stats(),
+            "snapshots": holder.snapshots.stats(),
+            "scheduler": holder.scheduler.stats(),
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return holder.recorder.to_prometheus() + holder.cache.to_prometheus() + holder.scheduler.to_prometheus()
+
+    return app
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the query API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    uvicorn.run("grid_rag.api:create_app", factory=True, host=args.host, port=args.port, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Parallel index builder producing one read-only artifact directory.
+
+Usage::
+
+    python -m grid_rag.build --corpus data/corpus --out .grid_index --workers 8
+    python -m grid_rag.build --corpus data/corpus --scaling   # docs/sec for 1..N workers
+
+The corpus is split into contiguous shards. Each worker process tokenizes its
+shard into raw BM25 postings and embeds it, and the parent merges the partial
+vocabularies and writes::
+
+    <out>/bm25.npz       BM25Index.save() format
+    <out>/vectors/       VectorIndex directory (memory-mappable)
+    <out>/build.json     corpus version, doc count, timings
+
+The corpus version is recorded so the app can reuse the artifact instead of
+rebuilding in-process.
+"""
+
+import argparse
+import json
+import os
+import stat
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .corpus import CorpusStore
+from .documents import document_text
+from .retrieval import BM25Index, collect_postings
+from .vector_index import HashingEmbedder, VectorIndex
+
+BUILD_INFO = "build.json"
+
+
+def _build_shard(documents, doc_offset, dim):
+    """Worker: raw postings and embeddings for one contiguous shard."""
+    vocab, term_ids, doc_ids, tfs, keys, doc_len = collect_postings(documents, doc_offset=doc_offset)
+    terms = sorted(vocab, key=vocab.get)
+    vectors = HashingEmbedder(dim).embed([document_text(d) for d in documents])
+    return terms, term_ids, doc_ids, tfs, keys, doc_len, vectors
+
+
+def _shards(documents, n_shards):
+    size = max(1, -(-len(documents) // n_shards))
+    for start in range(0, len(documents), size):
+        yield start, documents[start:start + size]
+
+
+def build_partials(documents, workers, dim=384):
+    """Build per-shard partials, in shard order, using ``workers`` processes."""
+    if workers <= 1:
+        return [_build_shard(chunk, start, dim) for start, chunk in _shards(documents, 1)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # A few shards per worker evens out shards with long documents
+        futures = [
+            pool.submit(_build_shard, chunk, start, dim)
+            for start, chunk in _shards(documents, workers * 4)
+        ]
+        return [future.result() for future in futures]
+
+
+def merge_partials(partials):
+    """Merge shard-local vocabularies into one BM25 index; returns (index, vector batches)."""
+    vocab = {}
+    term_cols, doc_cols, tf_cols, keys, doc_lens, vectors = [], [], [], [], [], []
+    for terms, term_ids, doc_ids, tfs, shard_keys, doc_len, shard_vectors in partials:
+        remap = np.fromiter((vocab.setdefault(t, len(vocab)) for t in terms), dtype=np.int32, count=len(terms))
+        term_cols.append(remap[term_ids])
+        doc_cols.append(doc_ids)
+        tf_cols.append(tfs)
+        keys.extend(shard_keys)
+        doc_lens.append(doc_len)
+        vectors.append(shard_vectors)
+
+    def concat(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    index = BM25Index.from_postings(
+        vocab,
+        concat(term_cols, np.int32),
+        concat(doc_cols, np.int32),
+        concat(tf_cols, np.float32),
+        keys,
+        concat(doc_lens, np.float32),
+    )
+    return index, vectors
+
+
+def _make_read_only(path):
+    mode = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+    if os.path.isfile(path):
+        os.chmod(path, mode)
+    for root, _, files in os.walk(path):
+        for name in files:
+            os.chmod(os.path.join(root, name), mode)
+
+
+def build(corpus_dir, out_dir, workers=None, dim=384, n_lists=0):
+    """Build and publish the index artifact; returns the build info dict."""
+    workers = workers or os.cpu_count() or 1
+    corpus = CorpusStore(corpus_dir)
+    started = time.perf_counter()
+    documents = list(corpus.documents())
+    loaded = time.perf_counter()
+
+    partials = build_partials(documents, workers, dim)
+    built = time.perf_counter()
+    index, vector_batches = merge_partials(partials)
+
+    os.makedirs(out_dir, exist_ok=True)
+    bm25_path = os.path.join(out_dir, "bm25.npz")
+    tmp_path = f"{bm25_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        index.save(f)
+    _make_read_only(tmp_path)
+    os.replace(tmp_path, bm25_path)
+
+    vectors_dir = os.path.join(out_dir, "vectors")
+    VectorIndex.write(vectors_dir, index.keys, vector_batches, HashingEmbedder(dim),
+                      n_lists=n_lists, fingerprint=corpus.version)
+    _make_read_only(vectors_dir)
+    finished = time.perf_counter()
+
+    info = {
+        "corpus_version": corpus.version,
+        "documents": len(documents),
+        "terms": len(index.vocab),
+        "workers": workers,
+        "load_seconds": round(loaded - started, 3),
+        "shard_seconds": round(built - loaded, 3),
+        "total_seconds": round(finished - started, 3),
+        "docs_per_second": round(len(documents) / max(built - loaded, 1e-9), 1),
+    }
+    with open(os.path.join(out_dir, BUILD_INFO), "w") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def read_build_info(out_dir):
+    path = os.path.join(out_dir, BUILD_INFO)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def scaling_report(documents, max_workers, dim=384):
+    """Time the parallel shard stage for 1, 2, 4, ... ``max_workers`` processes."""
+    counts = sorted({1, max_workers} | {2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers})
+    rows = []
+    baseline = None
+    for workers in counts:
+        started = time.perf_counter()
+        merge_partials(build_partials(documents, workers, dim))
+        elapsed = time.perf_counter() - started
+        rate = len(documents) / elapsed
+        baseline = baseline or rate
+        rows.append({"workers": workers, "seconds": round(elapsed, 3),
+                     "docs_per_second": round(rate, 1), "speedup": round(rate / baseline, 2)})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the BM25 and vector index artifact in parallel.")
+    parser.add_argument("--corpus", default=os.path.join("data", "corpus"))
+    parser.add_argument("--out", default=os.environ.get("GRID_RAG_INDEX_DIR", ".grid_index"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--lists", type=int, default=0, help="IVF lists for the vector index (0 = exact search)")
+    parser.add_argument("--scaling", action="store_true", help="report docs/sec from 1 to --workers processes")
+    args = parser.parse_args(argv)
+
+    if args.scaling:
+        documents = list(CorpusStore(args.corpus).documents())
+        for row in scaling_report(documents, args.workers, args.dim):
+            print(json.dumps(row))
+    else:
+        print(json.dumps(build(args.corpus, args.out, args.workers, args.dim, args.lists)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Process-wide answer cache with LRU and TTL eviction.
+
+Entries are keyed on the normalized query text plus the corpus version, so a
+corpus update naturally stops serving stale answers. One instance is shared by
+every Streamlit session in the process (see ``st.cache_resource`` in app.py).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .text import normalize_query
+
+_MISSING = object()
+
+
+class QueryCache:
+    def __init__(self, maxsize=2048, ttl=900.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(query, version):
+        return normalize_query(query), version
+
+    def get(self, query, version, default=None):
+        key = self.key(query, version)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def peek(self, query, version, default=None):
+        """Unexpired cached value without touching LRU order or hit/miss counts."""
+        entry = self._entries.get(self.key(query, version))
+        if entry is None or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def put(self, query, version, value):
+        key = self.key(query, version)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, query, version, compute):
+        """Return the cached value, or compute, store and return it."""
+        value = self.get(query, version, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(query, version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def to_prometheus(self):
+        stats = self.stats()
+        lines = []
+        for name in ("hits", "misses", "evictions", "expirations"):
+            lines.append(f"# TYPE grid_rag_answer_cache_{name}_total counter")
+            lines.append(f"grid_rag_answer_cache_{name}_total {stats[name]}")
+        lines.append("# TYPE grid_rag_answer_cache_entries gauge")
+        lines.append(f"grid_rag_answer_cache_entries {stats['size']}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+"""Blocking client for ``grid_rag.api`` with the same interface as ``AnswerService``.
+
+Used by the Streamlit app when ``GRID_RAG_API_URL`` is set, so the UI process
+only renders and all retrieval runs in the API workers. Each thread keeps its
+own keep-alive connection.
+"""
+
+import http.client
+import json
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from .metrics import QueryTrace
+from .scheduler import Overloaded, RateLimited
+
+
+class AnswerClientError(RuntimeError):
+    pass
+
+
+class AnswerClient:
+    def __init__(self, base_url, timeout=10.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request(method, self.prefix + path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException) as exc:
+                # A pooled connection may have been closed by the server; retry once on a fresh one
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise AnswerClientError(f"query API unreachable: {exc}") from exc
+                continue
+            if response.status == 429:
+                raise RateLimited(float(response.getheader("Retry-After", "1")))
+            if response.status == 503:
+                raise Overloaded(json.loads(data).get("detail", "query API overloaded"))
+            if response.status != 200:
+                raise AnswerClientError(f"query API returned HTTP {response.status}")
+            return json.loads(data)
+
+    def answer(self, query, k=3, trace=None, asset=None, session=None):
+        trace = trace or QueryTrace()
+        with trace.stage("retrieval"):
+            return self._request("POST", "/query", {"query": query, "k": k, "asset": asset, "session": session})
+
+    def answer_batch(self, queries, k=3, session=None):
+        return self._request("POST", "/query/batch", {"queries": list(queries), "k": k, "session": session})["results"]
+
+    def suggest(self, text, k=8):
+        return self._request("GET", f"/suggest?{urlencode({'q': text, 'k': k})}")["suggestions"]
+
+    def stats(self):
+        return self._request("GET", "/health")
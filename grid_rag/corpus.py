@@ -0,0 +1,117 @@
+"""On-disk procedure corpus with lazy per-category loading.
+
+A corpus directory holds a ``manifest.json`` listing the categories in display
+order. Each category is backed by one JSONL ``file`` or by a ``dir`` of JSONL
+shards (as written by ``grid_rag.ingest``). Each line is a procedure record::
+
+    {"query": "...", "answer": "...", "risk_level": "CRITICAL", "steps": [...], ...}
+
+Records without an ``answer`` are catalog entries only (shown as query buttons).
+Category files are parsed on first access, so opening a corpus only reads the
+manifest.
+"""
+
+import json
+import os
+import threading
+
+MANIFEST = "manifest.json"
+
+
+def load_manifest(directory):
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def entry_files(directory, entry):
+    """JSONL files backing one manifest category entry."""
+    if "dir" in entry:
+        shard_dir = os.path.join(directory, entry["dir"])
+        if not os.path.isdir(shard_dir):
+            return []
+        return [os.path.join(shard_dir, name) for name in sorted(os.listdir(shard_dir)) if name.endswith(".jsonl")]
+    return [os.path.join(directory, entry["file"])]
+
+
+def corpus_files(directory):
+    """Return every file that makes up the corpus, manifest first."""
+    files = [os.path.join(directory, MANIFEST)]
+    for entry in load_manifest(directory)["categories"]:
+        if "dir" in entry:
+            # Adding or removing a shard changes the directory mtime
+            files.append(os.path.join(directory, entry["dir"]))
+        files.extend(entry_files(directory, entry))
+    return files
+
+
+def corpus_version(directory):
+    """Cheap version token derived from file mtimes and sizes.
+
+    Any edit to the manifest or a category file changes the token, which is
+    what callers use to invalidate parsed corpora and derived indexes.
+    """
+    stamps = []
+    for path in corpus_files(directory):
+        if not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        stamps.append(f"{stat.st_mtime_ns:x}.{stat.st_size:x}")
+    return "-".join(stamps)
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record_document(record, category):
+    """Search document (title + category) for one answerable record."""
+    document = {key: value for key, value in record.items() if key != "query"}
+    document["title"] = record["query"]
+    document["category"] = category
+    return document
+
+
+class CorpusStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = corpus_version(directory)
+        self._entries = {entry["name"]: entry for entry in load_manifest(directory)["categories"]}
+        self._records = {}
+        self._responses = None
+        self._lock = threading.Lock()
+
+    def categories(self):
+        return list(self._entries)
+
+    def records(self, category):
+        """Parsed records for one category, loaded on first use."""
+        records = self._records.get(category)
+        if records is None:
+            with self._lock:
+                records = self._records.get(category)
+                if records is None:
+                    records = []
+                    for path in entry_files(self.directory, self._entries[category]):
+                        records.extend(read_records(path))
+                    self._records[category] = records
+        return records
+
+    def queries(self, category):
+        return [record["query"] for record in self.records(category)]
+
+    def documents(self):
+        """Yield every answerable record as a search document (title + category)."""
+        for category in self._entries:
+            for record in self.records(category):
+                if record.get("answer"):
+                    yield record_document(record, category)
+
+    def responses(self):
+        """Map of query title to response for all answerable records."""
+        if self._responses is None:
+            self._responses = {document["title"]: document for document in self.documents()}
+        return self._responses
+
+    def response(self, title):
+        return self.responses().get(title)
@@ -0,0 +1,27 @@
+"""Helpers for the procedure document schema used by UTILITY_RESPONSES."""
+
+# Fields that carry searchable text, in the order they are indexed
+SEARCH_FIELDS = ("title", "category", "answer", "steps", "sources")
+
+
+def iter_documents(categories, responses):
+    """Yield one document per response, tagged with its query title and category."""
+    category_of = {query: category for category, queries in categories.items() for query in queries}
+    for title, response in responses.items():
+        document = dict(response)
+        document["title"] = title
+        document["category"] = category_of.get(title, response.get("category", ""))
+        yield document
+
+
+def field_text(document, field):
+    """Return a field as plain text, joining list fields such as steps and sources."""
+    value = document.get(field) or ""
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(item) for item in value)
+    return str(value)
+
+
+def document_text(document, fields=SEARCH_FIELDS):
+    """Concatenate the searchable fields of a document."""
+    return " ".join(field_text(document, field) for field in fields)
@@ -0,0 +1,298 @@
+"""Vectorized DGA failure-risk scoring over a columnar transformer fleet.
+
+An asset table is a dict of equal-length NumPy columns: ``asset``, optional
+``rating_mva`` / ``age_years``, the seven dissolved gases in ppm (``h2``,
+``ch4``, ``c2h6``, ``c2h4``, ``c2h2``, ``co``, ``co2``) and, when a previous
+sample exists, ``prev_<gas>`` plus ``days_since_prev``. Every step below is a
+whole-column NumPy expression, so a sweep over 100k units is a few dozen array
+ops:
+
+* Duval Triangle 1 zone (PD, T1, T2, T3, D1, D2, DT) from %CH4/%C2H4/%C2H2;
+* IEC 60599 ratio diagnosis from C2H2/C2H4, CH4/H2 and C2H4/C2H6;
+* IEEE C57.104 gas condition (1-4) now and projected 30 days ahead from the
+  per-gas generation rate;
+* the corpus' critical limits (H2 > 150 ppm, C2H2 > 3 ppm).
+
+These combine into a failure score, a ``risk_level`` and a ``confidence`` that
+replace the static values of a DGA procedure when the query names an asset;
+the assessment can raise the procedure's risk level but never lower it.
+
+    python -m grid_rag.fleet simulate --out data/fleet/transformers.csv --assets 600
+    python -m grid_rag.fleet score data/fleet/transformers.csv --top 20
+"""
+
+import argparse
+import csv
+import sys
+import time
+
+import numpy as np
+
+from .analytics import RISK_LEVELS
+
+GASES = ("h2", "ch4", "c2h6", "c2h4", "c2h2", "co", "co2")
+
+# IEEE C57.104 upper limits of conditions 1, 2 and 3 per gas (ppm); above the last is condition 4
+CONDITION_LIMITS = np.array([
+    [100, 700, 1800],     # H2
+    [120, 400, 1000],     # CH4
+    [65, 100, 150],       # C2H6
+    [50, 100, 200],       # C2H4
+    [1, 9, 35],           # C2H2
+    [350, 570, 1400],     # CO
+    [2500, 4000, 10000],  # CO2
+], dtype=np.float64)
+
+# Critical thresholds from the DGA interpretation procedure in the corpus
+CRITICAL_LIMITS = {"h2": 150.0, "c2h2": 3.0}
+
+DUVAL_ZONES = np.array(["N", "PD", "T1", "T2", "T3", "D1", "D2", "DT"])
+IEC_FAULTS = np.array(["ND", "PD", "T1", "T2", "T3", "D1", "D2"])
+# Relative severity of each Duval zone (index-aligned with DUVAL_ZONES), 0..3
+ZONE_SEVERITY = np.array([0, 1, 1, 2, 3, 2, 3, 3], dtype=np.float64)
+
+PROJECTION_DAYS = 30
+# Only DGA procedures: fire, isolation or other transformer emergencies keep their own risk level
+DGA_TERMS = ("dga", "dissolved gas")
+
+
+def gas_matrix(table, prefix=""):
+    return np.stack([np.asarray(table[prefix + gas], dtype=np.float64) for gas in GASES], axis=1)
+
+
+def duval_zone(ch4, c2h4, c2h2):
+    """Duval Triangle 1 zone index into ``DUVAL_ZONES`` (0 when no key gases)."""
+    total = ch4 + c2h4 + c2h2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_ch4 = np.where(total > 0, 100 * ch4 / total, 0.0)
+        p_c2h4 = np.where(total > 0, 100 * c2h4 / total, 0.0)
+        p_c2h2 = np.where(total > 0, 100 * c2h2 / total, 0.0)
+    return np.select(
+        [
+            total <= 0,
+            p_ch4 >= 98,
+            (p_c2h2 >= 13) & (p_c2h4 < 23),
+            ((p_c2h2 >= 13) & (p_c2h4 >= 23) & (p_c2h4 < 40)) | ((p_c2h2 >= 29) & (p_c2h4 >= 40)),
+            (p_c2h2 < 15) & (p_c2h4 >= 50),
+            (p_c2h2 < 4) & (p_c2h4 >= 20) & (p_c2h4 < 50),
+            (p_c2h2 < 4) & (p_c2h4 < 20),
+        ],
+        [0, 1, 5, 6, 4, 3, 2],
+        default=7,
+    )
+
+
+def iec_ratio_fault(gases):
+    """IEC 60599 ratio diagnosis index into ``IEC_FAULTS`` (0 when no code matches)."""
+    h2, ch4, c2h6, c2h4, c2h2 = (gases[:, i] for i in range(5))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r1 = np.where(c2h4 > 0, c2h2 / c2h4, 0.0)
+        r2 = np.where(h2 > 0, ch4 / h2, np.inf)
+        r3 = np.where(c2h6 > 0, c2h4 / c2h6, np.inf)
+    return np.select(
+        [
+            (r2 < 0.1) & (r3 < 0.2),
+            (r1 > 1) & (r2 >= 0.1) & (r2 <= 0.5) & (r3 > 1),
+            (r1 >= 0.6) & (r1 <= 2.5) & (r2 >= 0.1) & (r2 <= 1) & (r3 > 2),
+            (r1 < 0.2) & (r2 > 1) & (r3 > 4),
+            (r1 < 0.1) & (r2 > 1) & (r3 >= 1) & (r3 <= 4),
+            (r2 > 1) & (r3 < 1),
+        ],
+        [1, 5, 6, 4, 3, 2],
+        default=0,
+    )
+
+
+def gas_condition(gases):
+    """IEEE C57.104 condition 1-4: the worst condition over all gases."""
+    return 1 + (gases[:, :, None] > CONDITION_LIMITS[None, :, :]).sum(axis=2).max(axis=1)
+
+
+def score_fleet(table, horizon_days=PROJECTION_DAYS):
+    """Score every asset in ``table``; returns a dict of result columns."""
+    gases = gas_matrix(table)
+    n = len(gases)
+    zone = duval_zone(gases[:, 1], gases[:, 3], gases[:, 4])
+    iec = iec_ratio_fault(gases)
+    condition = gas_condition(gases)
+
+    # Gas generation rate (ppm/day) from the previous sample, projected over the horizon
+    has_trend = np.zeros(n, dtype=bool)
+    projected = gases
+    if "days_since_prev" in table and all(f"prev_{gas}" in table for gas in GASES):
+        days = np.asarray(table["days_since_prev"], dtype=np.float64)
+        has_trend = days > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(has_trend[:, None], (gases - gas_matrix(table, "prev_")) / days[:, None], 0.0)
+        projected = gases + horizon_days * np.clip(rates, 0, None)
+    projected_condition = gas_condition(projected)
+
+    h2, c2h2 = GASES.index("h2"), GASES.index("c2h2")
+    critical_now = (gases[:, h2] > CRITICAL_LIMITS["h2"]) | (gases[:, c2h2] > CRITICAL_LIMITS["c2h2"])
+    critical_soon = (projected[:, h2] > CRITICAL_LIMITS["h2"]) | (projected[:, c2h2] > CRITICAL_LIMITS["c2h2"])
+
+    # Fault-type severity only counts once some gas is above normal; trace gases classify arbitrarily
+    severity = np.where(condition >= 2, ZONE_SEVERITY[zone], 0.0)
+    score = (
+        0.4 * (condition - 1) / 3
+        + 0.3 * severity / 3
+        + 0.2 * (projected_condition - condition) / 3
+        + 0.1 * critical_soon
+    )
+    if "age_years" in table:
+        score = score * (1 + 0.01 * np.clip(np.asarray(table["age_years"], dtype=np.float64) - 25, 0, 25))
+    score = np.clip(score, 0, 1)
+
+    risk = np.select(
+        [(score >= 0.55) | (critical_now & (severity >= 3)), (score >= 0.3) | critical_now],
+        ["CRITICAL", "HIGH"],
+        default="MEDIUM",
+    )
+
+    # Confidence: agreement of the two diagnosis methods, trend data, and enough gas to diagnose at all
+    agree = DUVAL_ZONES[zone] == IEC_FAULTS[iec]
+    combustible = gases[:, :5].sum(axis=1) + gases[:, GASES.index("co")]
+    confidence = 60 + 20 * agree + 10 * has_trend + 9 * (combustible > 200)
+
+    return {
+        "asset": np.asarray(table["asset"]),
+        "duval": DUVAL_ZONES[zone],
+        "iec": IEC_FAULTS[iec],
+        "condition": condition,
+        "projected_condition": projected_condition,
+        "score": score,
+        "risk_level": risk,
+        "confidence": confidence.astype(np.float64),
+    }
+
+
+class FleetScores:
+    """Scored fleet with O(1) lookup by asset id."""
+
+    def __init__(self, table):
+        self.table = table
+        self.results = score_fleet(table)
+        self._rows = {asset: i for i, asset in enumerate(self.results["asset"].tolist())}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def assets(self):
+        return list(self._rows)
+
+    def assessment(self, asset):
+        row = self._rows.get(asset)
+        if row is None:
+            return None
+        return {name: column[row].item() for name, column in self.results.items()}
+
+    def risk_counts(self):
+        levels, counts = np.unique(self.results["risk_level"], return_counts=True)
+        return dict(zip(levels.tolist(), counts.tolist()))
+
+    def top(self, n=10):
+        order = np.argsort(-self.results["score"], kind="stable")[:n]
+        return [{name: column[i].item() for name, column in self.results.items()} for i in order]
+
+
+def applies_to(response):
+    """True for procedures where an asset's DGA assessment should drive risk and confidence."""
+    text = (response.get("title", "") + " " + response.get("answer", "")).lower()
+    return any(term in text for term in DGA_TERMS)
+
+
+def apply_assessment(response, assessment):
+    """Copy of ``response`` with confidence and, if higher, risk level taken from a fleet assessment."""
+    updated = dict(response)
+    stored, assessed = response.get("risk_level"), str(assessment["risk_level"])
+    if stored not in RISK_LEVELS or RISK_LEVELS.index(assessed) < RISK_LEVELS.index(stored):
+        updated["risk_level"] = assessed
+    updated["confidence"] = round(assessment["confidence"], 1)
+    return updated
+
+
+def load_table(path):
+    """Read a fleet table from CSV or a columnar ``.npz``."""
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    table = {}
+    for name in rows[0] if rows else ():
+        column = [row[name] for row in rows]
+        table[name] = np.array(column) if name == "asset" else np.array(column, dtype=np.float64)
+    return table
+
+
+def save_table(table, path):
+    if path.endswith(".npz"):
+        np.savez(path, **table)
+        return
+    names = list(table)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for row in zip(*(table[name].tolist() for name in names)):
+            writer.writerow(row)
+
+
+def simulate(n, seed=0):
+    """Synthetic fleet: mostly healthy units plus thermal and arcing faults developing."""
+    rng = np.random.default_rng(seed)
+    baseline = np.array([25, 15, 20, 8, 0.1, 150, 1200], dtype=np.float64)
+    gases = baseline * rng.lognormal(0, 0.35, size=(n, len(GASES)))
+    thermal = rng.random(n) < 0.08
+    arcing = rng.random(n) < 0.03
+    gases[thermal, 1] *= rng.uniform(3, 15, thermal.sum())   # CH4
+    gases[thermal, 3] *= rng.uniform(5, 30, thermal.sum())   # C2H4
+    gases[arcing, 0] *= rng.uniform(3, 20, arcing.sum())     # H2
+    gases[arcing, 4] += rng.uniform(2, 60, arcing.sum())     # C2H2
+    gases[arcing, 3] *= rng.uniform(2, 8, arcing.sum())
+    days = rng.choice([30.0, 60.0, 90.0, 180.0], size=n)
+    previous = gases / (1 + rng.uniform(0, 0.6, size=(n, 1)) * (thermal | arcing)[:, None] + rng.uniform(0, 0.05, size=(n, 1)))
+
+    table = {
+        "asset": np.array([f"SUB-{100 + i // 3} T{i % 3 + 1}" for i in range(n)]),
+        "rating_mva": rng.choice([25.0, 50.0, 100.0, 250.0, 400.0], size=n),
+        "age_years": np.round(rng.uniform(1, 55, size=n), 1),
+        "days_since_prev": days,
+    }
+    for i, gas in enumerate(GASES):
+        table[gas] = np.round(gases[:, i], 1)
+        table[f"prev_{gas}"] = np.round(previous[:, i], 1)
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet DGA scoring.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sim = commands.add_parser("simulate", help="write a synthetic fleet table")
+    sim.add_argument("--out", required=True, help=".csv or .npz")
+    sim.add_argument("--assets", type=int, default=600)
+    sim.add_argument("--seed", type=int, default=0)
+    score = commands.add_parser("score", help="score a fleet table")
+    score.add_argument("path")
+    score.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "simulate":
+        save_table(simulate(args.assets, args.seed), args.out)
+        return 0
+
+    table = load_table(args.path)
+    started = time.perf_counter()
+    fleet = FleetScores(table)
+    elapsed = time.perf_counter() - started
+    print(f"Scored {len(fleet):,} assets in {elapsed * 1000:.1f} ms: {fleet.risk_counts()}")
+    for row in fleet.top(args.top):
+        print(
+            f"{row['asset']:<14} {row['risk_level']:<8} score {row['score']:.2f}  "
+            f"duval {row['duval']:<2}  iec {row['iec']:<2}  condition {row['condition']}->{row['projected_condition']}  "
+            f"confidence {row['confidence']:.0f}%"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Async streaming client for the LLM generation endpoint.
+
+* Keep-alive HTTP/1.1 connections are pooled and reused across requests.
+* A semaphore bounds in-flight generations per client.
+* Identical prompts that are already being generated are coalesced: late
+  callers subscribe to the running stream instead of issuing a new request.
+* ``stream_sync`` bridges the async stream onto a background event loop so the
+  Streamlit script thread can hand it straight to ``st.write_stream``.
+
+The wire protocol is the one served by ``grid_rag.stub_llm``.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+from urllib.parse import urlsplit
+
+from .documents import field_text
+
+
+class GenerationError(RuntimeError):
+    pass
+
+
+def build_prompt(query, document):
+    """Grounded prompt for one retrieved procedure."""
+    steps = "\n".join(f"- {step}" for step in document.get("steps", []))
+    return (
+        "You are a utility field operations assistant. Answer using only the context.\n\n"
+        f"Context: {document.get('answer', '')}\n"
+        f"Steps:\n{steps}\n"
+        f"Sources: {field_text(document, 'sources')}\n\n"
+        f"Question: {query}\n"
+    )
+
+
+class _Broadcast:
+    """Token stream shared by every caller waiting on the same prompt."""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, token=None, done=False, error=None):
+        async with self.changed:
+            if token is not None:
+                self.tokens.append(token)
+            self.done = self.done or done
+            self.error = error or self.error
+            self.changed.notify_all()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: position < len(self.tokens) or self.done)
+                pending = self.tokens[position:]
+                done, error = self.done, self.error
+            for token in pending:
+                yield token
+            position += len(pending)
+            if done and position >= len(self.tokens):
+                if error:
+                    raise error
+                return
+
+
+class GenerationClient:
+    def __init__(self, base_url, max_concurrency=16, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/") + "/v1/generate"
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.coalesced = 0
+        self.requests = 0
+        self._idle = []
+        self._inflight = {}
+        self._tasks = set()
+        self._limit = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    # -- connection pool -------------------------------------------------
+    async def _acquire(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    def _release(self, connection, reusable):
+        reader, writer = connection
+        if reusable and len(self._idle) < self.max_concurrency:
+            self._idle.append(connection)
+        else:
+            writer.close()
+
+    async def aclose(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    # -- HTTP ------------------------------------------------------------
+    async def _request_stream(self, prompt, max_tokens):
+        body = json.dumps({"prompt": prompt, "max_tokens": max_tokens}).encode("utf-8")
+        head = (
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode("latin-1")
+        connection = await self._acquire()
+        reader, writer = connection
+        reusable = False
+        try:
+            writer.write(head + body)
+            await writer.drain()
+            status = await asyncio.wait_for(reader.readline(), self.timeout)
+            if not status:
+                raise GenerationError("connection closed before response")
+            code = int(status.split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if code != 200:
+                raise GenerationError(f"generation endpoint returned HTTP {code}")
+            if headers.get("transfer-encoding", "").lower() != "chunked":
+                raise GenerationError("expected a chunked token stream")
+
+            buffer = b""
+            finished = False
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not line.endswith(b"\n"):
+                    # EOF before the terminating chunk: the server dropped the stream mid-answer
+                    raise GenerationError("connection closed in the middle of the token stream")
+                size = int(line.strip(), 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                buffer += (await reader.readexactly(size + 2))[:-2]
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        event = json.loads(line)
+                        if "token" in event:
+                            yield event["token"]
+                        finished = finished or bool(event.get("done"))
+            if not finished:
+                raise GenerationError("token stream ended without a done event")
+            reusable = headers.get("connection", "").lower() != "close"
+        finally:
+            self._release(connection, reusable)
+
+    # -- public API ------------------------------------------------------
+    async def _produce(self, key, broadcast):
+        try:
+            async with self._limit:
+                self.requests += 1
+                async for token in self._request_stream(*key):
+                    await broadcast.publish(token)
+            await broadcast.publish(done=True)
+        except Exception as exc:  # surfaced to every subscriber
+            if not isinstance(exc, GenerationError):
+                # A dropped stream or malformed chunk; callers only need to handle GenerationError
+                error = GenerationError(f"token stream failed: {exc!r}")
+                error.__cause__ = exc
+                exc = error
+            await broadcast.publish(done=True, error=exc)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def stream(self, prompt, max_tokens=256):
+        """Yield tokens as they arrive, sharing the request with identical in-flight prompts."""
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_concurrency)
+        key = (prompt, max_tokens)
+        broadcast = self._inflight.get(key)
+        if broadcast is None:
+            broadcast = self._inflight[key] = _Broadcast()
+            task = asyncio.ensure_future(self._produce(key, broadcast))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.coalesced += 1
+        async for token in broadcast.subscribe():
+            yield token
+
+    async def generate(self, prompt, max_tokens=256):
+        return "".join([token async for token in self.stream(prompt, max_tokens)])
+
+    async def generate_batch(self, prompts, max_tokens=256):
+        """Generate several prompts concurrently, bounded by ``max_concurrency``."""
+        return await asyncio.gather(*(self.generate(p, max_tokens) for p in prompts))
+
+    # -- sync bridge -----------------------------------------------------
+    def _background_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="generation-client", daemon=True).start()
+        return self._loop
+
+    def stream_sync(self, prompt, max_tokens=256):
+        """Blocking token iterator backed by the client's own event loop.
+
+        The loop (and therefore the connection pool) lives for the life of the
+        client, so pooled connections survive across Streamlit reruns.
+        """
+        tokens = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for token in self.stream(prompt, max_tokens):
+                    tokens.put(token)
+            except Exception as exc:
+                tokens.put(exc)
+            finally:
+                tokens.put(done)
+
+        asyncio.run_coroutine_threadsafe(pump(), self._background_loop())
+        while True:
+            try:
+                item = tokens.get(timeout=self.timeout)
+            except queue.Empty:
+                raise GenerationError(f"no token received for {self.timeout:.0f}s") from None
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
@@ -0,0 +1,133 @@
+"""Bounded per-session conversation history with SQLite write-through.
+
+Each session keeps only its most recent entries in a ``deque(maxlen=...)`` of
+``__slots__`` records, with a set of the queries it holds so the "already
+asked?" check is O(1) however long an operator stays on shift. Every new entry
+is also written to a shared SQLite database, so history survives restarts and
+can be queried per crew.
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    crew TEXT NOT NULL,
+    query TEXT NOT NULL,
+    category TEXT,
+    risk_level TEXT
+);
+CREATE INDEX IF NOT EXISTS history_crew_time ON history (crew, timestamp);
+"""
+
+
+class HistoryEntry:
+    __slots__ = ("timestamp", "crew", "query", "category", "risk_level")
+
+    def __init__(self, timestamp, crew, query, category, risk_level):
+        self.timestamp = timestamp
+        self.crew = crew
+        self.query = query
+        self.category = category
+        self.risk_level = risk_level
+
+    def __repr__(self):
+        return f"HistoryEntry({self.crew!r}, {self.query!r}, {self.risk_level!r})"
+
+
+class HistoryStore:
+    """SQLite-backed history shared by every session in the process."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def append(self, entry):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO history (timestamp, crew, query, category, risk_level) VALUES (?, ?, ?, ?, ?)",
+                (entry.timestamp, entry.crew, entry.query, entry.category, entry.risk_level),
+            )
+            self._db.commit()
+
+    def recent(self, crew, limit=100):
+        """Latest ``limit`` entries for one crew, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT timestamp, crew, query, category, risk_level FROM history "
+                "WHERE crew = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (crew, limit),
+            ).fetchall()
+        return [HistoryEntry(*row) for row in reversed(rows)]
+
+    def count(self, crew=None):
+        with self._lock:
+            if crew is None:
+                return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM history WHERE crew = ?", (crew,)).fetchone()[0]
+
+    def crews(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT crew FROM history ORDER BY crew")]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ConversationHistory:
+    """One session's most recent queries, deduplicated by query text."""
+
+    def __init__(self, crew, maxlen=200, store=None):
+        self.crew = crew
+        self.store = store
+        self._entries = deque(maxlen=maxlen)
+        self._queries = set()
+        if store is not None:
+            for entry in store.recent(crew, maxlen):
+                self._remember(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __contains__(self, query):
+        return query in self._queries
+
+    def _remember(self, entry):
+        if entry.query in self._queries:
+            return
+        if len(self._entries) == self._entries.maxlen:
+            self._queries.discard(self._entries[0].query)
+        self._entries.append(entry)
+        self._queries.add(entry.query)
+
+    def add(self, query, category, risk_level, timestamp=None):
+        """Record a query unless it is already in the history; returns True if added."""
+        if query in self._queries:
+            return False
+        entry = HistoryEntry(timestamp or time.time(), self.crew, query, category, risk_level)
+        self._remember(entry)
+        if self.store is not None:
+            self.store.append(entry)
+        return True
+
+    def tail(self, n=10):
+        return list(itertools.islice(reversed(self._entries), n))[::-1]
@@ -0,0 +1,190 @@
+"""Multi-stage hybrid retrieval: BM25 + dense candidates, RRF, bounded rerank.
+
+1. Candidate generation. The dense search is submitted to a thread pool, then
+   BM25 runs on the calling thread. If BM25 is already confident (a clear top
+   hit that covers most of the query) the dense result is not waited for.
+   Otherwise we wait at most ``dense_budget`` seconds for it. At most
+   ``workers`` dense searches run at once; when all are busy (e.g. with
+   searches that already timed out) the query is answered from BM25 alone
+   rather than queued behind them.
+2. Reciprocal-rank fusion of the two candidate lists.
+3. Rerank of the top ``rerank_n`` fused candidates with cheap features:
+   query-term coverage of the title, normalized BM25, cosine similarity and the
+   fused score. The loop stops when ``rerank_budget`` is spent, so tail latency
+   does not grow with the number of candidates.
+
+``confidence`` (0-100) is computed from the top reranked score and its margin
+over the runner-up, replacing the static number stored with each procedure.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import NamedTuple
+
+from .metrics import QueryTrace
+from .text import tokenize
+
+# Rerank feature weights: title coverage, BM25, cosine, fused rank
+RERANK_WEIGHTS = (0.45, 0.25, 0.2, 0.1)
+
+
+class RankedHit(NamedTuple):
+    key: str
+    score: float
+
+
+class HybridRetriever:
+    def __init__(
+        self,
+        lexical,
+        dense=None,
+        candidates=50,
+        rrf_k=60,
+        rerank_n=20,
+        dense_budget=0.015,
+        rerank_budget=0.010,
+        early_exit_margin=1.5,
+        early_exit_coverage=0.6,
+        min_cosine=0.2,
+        workers=4,
+    ):
+        self.lexical = lexical
+        self.dense = dense
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.rerank_n = rerank_n
+        self.dense_budget = dense_budget
+        self.rerank_budget = rerank_budget
+        self.early_exit_margin = early_exit_margin
+        self.early_exit_coverage = early_exit_coverage
+        self.min_cosine = min_cosine
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dense-search") if dense is not None else None
+        self._dense_slots = threading.BoundedSemaphore(workers)
+        self._title_terms = {}
+        self.searches = 0
+        self.early_exits = 0
+        self.dense_timeouts = 0
+        self.dense_skipped = 0
+        self.rerank_truncated = 0
+
+    def title_terms(self, key):
+        terms = self._title_terms.get(key)
+        if terms is None:
+            terms = self._title_terms[key] = frozenset(tokenize(key))
+        return terms
+
+    def coverage(self, query_terms, key):
+        if not query_terms:
+            return 0.0
+        return len(query_terms & self.title_terms(key)) / len(query_terms)
+
+    def search(self, query, k=3, trace=None):
+        """Return ``(hits, confidence)`` with hits ranked best first."""
+        trace = trace or QueryTrace()
+        self.searches += 1
+        query_terms = frozenset(tokenize(query))
+
+        with trace.stage("retrieval"):
+            dense_future = None
+            if self._executor is not None:
+                if self._dense_slots.acquire(blocking=False):
+                    dense_future = self._executor.submit(self.dense.search, query, self.candidates)
+                    # Also runs when the future is cancelled before it starts
+                    dense_future.add_done_callback(lambda _: self._dense_slots.release())
+                else:
+                    self.dense_skipped += 1
+            lexical = self.lexical.search(query, k=self.candidates)
+
+            if lexical and self._confident(lexical, query_terms):
+                self.early_exits += 1
+                if dense_future is not None:
+                    dense_future.cancel()
+                return self._lexical_only(lexical, query_terms, k)
+
+            dense = []
+            if dense_future is not None:
+                try:
+                    # Dense search always returns something; keep only plausibly related candidates
+                    dense = [hit for hit in dense_future.result(timeout=self.dense_budget) if hit.score >= self.min_cosine]
+                except FutureTimeout:
+                    self.dense_timeouts += 1
+                    dense_future.cancel()
+            fused = self._fuse(lexical, dense)
+
+        if not fused:
+            return [], 0.0
+        with trace.stage("rerank"):
+            lexical_scores = {hit.key: hit.score for hit in lexical}
+            dense_scores = {hit.key: hit.score for hit in dense}
+            hits = self._rerank(fused, query_terms, lexical_scores, dense_scores)
+        return hits[:k], self._confidence(hits)
+
+    def _confident(self, lexical, query_terms):
+        top = lexical[0]
+        runner_up = lexical[1].score if len(lexical) > 1 else 0.0
+        return (
+            top.score >= self.early_exit_margin * runner_up
+            and self.coverage(query_terms, top.key) >= self.early_exit_coverage
+        )
+
+    def _lexical_only(self, lexical, query_terms, k):
+        best = lexical[0].score or 1.0
+        w_cov, w_bm25 = RERANK_WEIGHTS[:2]
+        hits = [
+            RankedHit(hit.key, (w_cov * self.coverage(query_terms, hit.key) + w_bm25 * hit.score / best) / (w_cov + w_bm25))
+            for hit in lexical[:max(k, 2)]
+        ]
+        hits.sort(key=lambda hit: -hit.score)
+        return hits[:k], self._confidence(hits)
+
+    def _fuse(self, *rankings):
+        fused = {}
+        for ranking in rankings:
+            for rank, hit in enumerate(ranking):
+                fused[hit.key] = fused.get(hit.key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        return sorted(fused.items(), key=lambda item: -item[1])
+
+    def _rerank(self, fused, query_terms, lexical_scores, dense_scores):
+        deadline = time.perf_counter() + self.rerank_budget
+        best_lexical = max(lexical_scores.values(), default=0.0) or 1.0
+        best_fused = fused[0][1]
+        w_cov, w_bm25, w_cos, w_rrf = RERANK_WEIGHTS
+        reranked = []
+        head = fused[:self.rerank_n]
+        for i, (key, fused_score) in enumerate(head):
+            if i and time.perf_counter() > deadline:
+                self.rerank_truncated += 1
+                break
+            score = (
+                w_cov * self.coverage(query_terms, key)
+                + w_bm25 * lexical_scores.get(key, 0.0) / best_lexical
+                + w_cos * max(dense_scores.get(key, 0.0), 0.0)
+                + w_rrf * fused_score / best_fused
+            )
+            reranked.append(RankedHit(key, score))
+        reranked.sort(key=lambda hit: -hit.score)
+        # Candidates the budget did not reach keep their fused order below the reranked ones
+        floor = min((hit.score for hit in reranked), default=0.0)
+        tail = [RankedHit(key, floor * fused_score / best_fused) for key, fused_score in fused[len(reranked):len(head)]]
+        return reranked + tail
+
+    @staticmethod
+    def _confidence(hits):
+        """0-100 from the top score and its margin over the runner-up."""
+        if not hits:
+            return 0.0
+        top = hits[0].score
+        second = hits[1].score if len(hits) > 1 else 0.0
+        margin = (top - second) / top if top > 0 else 0.0
+        return round(50 + 49 * min(max(0.7 * top + 0.3 * margin, 0.0), 1.0), 1)
+
+    def stats(self):
+        return {
+            "searches": self.searches,
+            "early_exits": self.early_exits,
+            "dense_timeouts": self.dense_timeouts,
+            "dense_skipped": self.dense_skipped,
+            "rerank_truncated": self.rerank_truncated,
+        }
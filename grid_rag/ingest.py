@@ -0,0 +1,386 @@
+"""Streaming ingestion of technical manuals into the procedure corpus.
+
+Usage::
+
+    python -m grid_rag.ingest manuals/ --corpus data/corpus --category "📚 Technical Manuals"
+
+Text, Markdown and HTML files are read line by line, grouped into overlapping
+chunks, near-duplicate chunks are dropped with 64-bit SimHash fingerprints, and
+each source file is written as one JSONL shard of corpus records. Record titles
+carry the source path, so files sharing a heading ("Introduction", "Scope") do
+not overwrite each other's records. A manifest of content hashes makes re-runs
+incremental: unchanged files are skipped, changed files have their shard
+rewritten, and deleted files have their shard removed. Files that had chunks
+dropped as duplicates of a changed or deleted file are re-ingested too, since
+the chunk they deferred to may be gone. Only one chunk of text is held in
+memory at a time.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from html.parser import HTMLParser
+
+from .corpus import MANIFEST, load_manifest
+
+SOURCE_EXTENSIONS = {".txt", ".md", ".markdown", ".html", ".htm"}
+INGEST_MANIFEST = "_ingest_manifest.json"
+INGEST_FORMAT = 2
+DEFAULT_CATEGORY = "📚 Technical Manuals"
+
+_LIST_ITEM_RE = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s+(.*\S)")
+_HEADING_RE = re.compile(r"^\s*#{1,6}\s+(.*\S)")
+_PHONE_RE = re.compile(r"\b\d{1,3}-\d{3}-[A-Z0-9-]{4,}\b|\b911\b")
+_WORD_RE = re.compile(r"\w+")
+
+RISK_KEYWORDS = {
+    "CRITICAL": ("emergency", "arc flash", "energized", "lockout", "fatal", "electrocution", "sf6 leak"),
+    "HIGH": ("warning", "fault", "hazard", "failure", "danger", "trip"),
+}
+
+
+class _HTMLText(HTMLParser):
+    """Incremental HTML-to-text converter that yields block-level lines."""
+
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "title", "section"}
+    SKIP_TAGS = {"script", "style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self._buffer = []
+        self._skip = 0
+        self._list_item = False
+
+    def flush(self):
+        text = " ".join("".join(self._buffer).split())
+        if text:
+            self.lines.append(f"- {text}" if self._list_item else text)
+        self._buffer = []
+        self._list_item = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.flush()
+            if tag in ("h1", "title"):
+                self._buffer.append("# ")
+            self._list_item = tag == "li"
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._buffer.append(data)
+
+
+def iter_lines(path):
+    """Yield the text lines of a source file, converting HTML on the fly."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if os.path.splitext(path)[1].lower() in (".html", ".htm"):
+            parser = _HTMLText()
+            for raw in f:
+                parser.feed(raw)
+                yield from parser.lines
+                parser.lines.clear()
+            parser.close()
+            parser.flush()
+            yield from parser.lines
+        else:
+            for raw in f:
+                line = raw.rstrip()
+                if line:
+                    yield line
+
+
+def iter_chunks(lines, chunk_words=220, overlap_words=40):
+    """Group lines into chunks of about ``chunk_words`` words.
+
+    The last lines of each chunk (at least ``overlap_words`` words) are carried
+    into the next chunk so procedures that straddle a boundary stay intact.
+    Yields ``(heading, lines)`` tuples.
+    """
+    heading = None
+    current, count, fresh = [], 0, 0
+    for line in lines:
+        match = _HEADING_RE.match(line)
+        if match and heading is None:
+            heading = match.group(1)
+        current.append(line)
+        count += len(line.split())
+        fresh += 1
+        if count >= chunk_words:
+            yield heading, current
+            carry, carried = [], 0
+            for previous in reversed(current):
+                if carried >= overlap_words:
+                    break
+                carry.insert(0, previous)
+                carried += len(previous.split())
+            # Never carry the whole chunk forward, or we would loop on it
+            current = carry if len(carry) < len(current) else []
+            count = carried if current else 0
+            fresh = 0
+    if fresh:
+        yield heading, current
+
+
+def simhash(text, shingle=3):
+    """64-bit SimHash over word shingles."""
+    words = _WORD_RE.findall(text.lower())
+    weights = [0] * 64
+    for i in range(max(1, len(words) - shingle + 1)):
+        feature = " ".join(words[i:i + shingle]).encode("utf-8")
+        h = int.from_bytes(hashlib.blake2b(feature, digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class SimHashIndex:
+    """Near-duplicate lookup by Hamming distance over banded SimHash keys.
+
+    With 4 bands of 16 bits, any two fingerprints within distance 3 share at
+    least one band exactly, so only that bucket needs checking.
+    """
+
+    BANDS = 4
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self._buckets = {}
+        self.duplicates = 0
+
+    def _keys(self, fingerprint):
+        for band in range(self.BANDS):
+            yield band, fingerprint >> (band * 16) & 0xFFFF
+
+    def add(self, fingerprint, owner=None):
+        for key in self._keys(fingerprint):
+            self._buckets.setdefault(key, []).append((fingerprint, owner))
+
+    def add_unique(self, fingerprint, owner=None):
+        """Add a fingerprint unless a near-duplicate is already indexed.
+
+        Returns ``(True, None)`` when added, else ``(False, owner)`` with the
+        owner of the near-duplicate it was dropped for.
+        """
+        match = self.find_near(fingerprint)
+        if match is not None:
+            self.duplicates += 1
+            return False, match[1]
+        self.add(fingerprint, owner)
+        return True, None
+
+    def find_near(self, fingerprint):
+        """``(fingerprint, owner)`` of an indexed near-duplicate, or None."""
+        for key in self._keys(fingerprint):
+            for other, owner in self._buckets.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return other, owner
+        return None
+
+    def contains_near(self, fingerprint):
+        return self.find_near(fingerprint) is not None
+
+
+def risk_level(text):
+    lowered = text.lower()
+    for level, keywords in RISK_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return level
+    return "MEDIUM"
+
+
+def chunk_record(title, part, lines, source):
+    """Build a corpus record in the UTILITY_RESPONSES shape from one chunk."""
+    body = [line for line in lines if not _HEADING_RE.match(line)]
+    steps = [m.group(1) for m in map(_LIST_ITEM_RE.match, body) if m]
+    prose = " ".join(line for line in body if not _LIST_ITEM_RE.match(line))
+    text = " ".join(lines)
+    # Headings like "Introduction" repeat across manuals; the source keeps the corpus key unique
+    label = f"{source}, part {part}" if part > 1 else source
+    return {
+        "query": f"{title} ({label})",
+        "answer": prose or " ".join(steps),
+        "risk_level": risk_level(text),
+        "steps": steps,
+        "contacts": sorted(set(_PHONE_RE.findall(text))),
+        "completion_time": "See source document",
+        "personnel": "See source document",
+        "confidence": 75.0,
+        "sources": [source],
+    }
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_source_files(source_dir):
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS:
+                yield os.path.join(root, name)
+
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "ingested"
+
+
+def ingest_file(path, rel_path, index, chunk_words, overlap_words, duplicate_of=None):
+    """Yield ``(record, fingerprint)`` for each non-duplicate chunk of a file.
+
+    Other files that chunks were dropped in favour of are added to ``duplicate_of``.
+    """
+    fallback_title = os.path.splitext(os.path.basename(path))[0].replace("_", " ").replace("-", " ").title()
+    part = 0
+    for heading, lines in iter_chunks(iter_lines(path), chunk_words, overlap_words):
+        fingerprint = simhash(" ".join(lines))
+        added, owner = index.add_unique(fingerprint, rel_path)
+        if not added:
+            if duplicate_of is not None and owner not in (None, rel_path):
+                duplicate_of.add(owner)
+            continue
+        part += 1
+        yield chunk_record(heading or fallback_title, part, lines, rel_path), fingerprint
+
+
+def register_category(corpus_dir, category, shard_dir):
+    """Add a ``dir``-backed category to the corpus manifest if it is missing."""
+    manifest = load_manifest(corpus_dir)
+    if any(entry["name"] == category for entry in manifest["categories"]):
+        return
+    manifest["categories"].append({"name": category, "dir": shard_dir})
+    _write_json(os.path.join(corpus_dir, MANIFEST), manifest)
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def run(source_dir, corpus_dir, category=DEFAULT_CATEGORY, chunk_words=220, overlap_words=40, max_distance=3):
+    """Incrementally ingest ``source_dir`` into ``corpus_dir``; returns run stats."""
+    shard_dir = slugify(category)
+    out_dir = os.path.join(corpus_dir, shard_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, INGEST_MANIFEST)
+    previous, reuse = {}, False
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+        previous = data["files"]
+        # Shards written by an older format have different record titles, so they are all rewritten
+        reuse = data.get("format") == INGEST_FORMAT
+
+    stats = {"scanned": 0, "changed": 0, "unchanged": 0, "rechecked": 0, "removed": 0, "chunks": 0, "duplicates": 0}
+    current = {}
+    changed = []
+    for path in iter_source_files(source_dir):
+        rel_path = os.path.relpath(path, source_dir)
+        stat = os.stat(path)
+        entry = previous.get(rel_path) if reuse else None
+        stats["scanned"] += 1
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            current[rel_path] = entry
+            continue
+        digest = file_digest(path)
+        if entry and entry["sha256"] == digest:
+            current[rel_path] = dict(entry, mtime_ns=stat.st_mtime_ns)
+            continue
+        changed.append((path, rel_path, stat, digest))
+
+    # A file that dropped chunks in favour of a changed or deleted one must be re-checked
+    stale = {rel_path for _, rel_path, _, _ in changed} | (set(previous) - set(current))
+    while True:
+        recheck = [rel for rel, entry in current.items() if stale.intersection(entry.get("duplicate_of", ()))]
+        if not recheck:
+            break
+        for rel_path in recheck:
+            entry = current.pop(rel_path)
+            path = os.path.join(source_dir, rel_path)
+            changed.append((path, rel_path, os.stat(path), entry["sha256"]))
+            stale.add(rel_path)
+            stats["rechecked"] += 1
+    changed.sort(key=lambda item: item[1])
+
+    # Unchanged files seed the duplicate index so new chunks are checked against them
+    index = SimHashIndex(max_distance)
+    for rel_path, entry in current.items():
+        for fingerprint in entry["simhashes"]:
+            index.add(fingerprint, rel_path)
+    stats["unchanged"] = len(current)
+
+    for path, rel_path, stat, digest in changed:
+        shard_name = hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:16] + ".jsonl"
+        shard_path = os.path.join(out_dir, shard_name)
+        fingerprints = []
+        duplicate_of = set()
+        with open(f"{shard_path}.tmp", "w", encoding="utf-8") as out:
+            for record, fingerprint in ingest_file(path, rel_path, index, chunk_words, overlap_words, duplicate_of):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                fingerprints.append(fingerprint)
+        if fingerprints:
+            os.replace(f"{shard_path}.tmp", shard_path)
+        else:
+            os.remove(f"{shard_path}.tmp")
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+        current[rel_path] = {
+            "sha256": digest,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "shard": shard_name,
+            "simhashes": fingerprints,
+            "duplicate_of": sorted(duplicate_of),
+        }
+        stats["changed"] += 1
+        stats["chunks"] += len(fingerprints)
+
+    for rel_path, entry in previous.items():
+        if rel_path not in current:
+            shard_path = os.path.join(out_dir, entry["shard"])
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+            stats["removed"] += 1
+
+    stats["duplicates"] = index.duplicates
+    _write_json(manifest_path, {"format": INGEST_FORMAT, "category": category, "files": current})
+    register_category(corpus_dir, category, shard_dir)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest technical manuals into the procedure corpus.")
+    parser.add_argument("source_dir", help="directory of .txt/.md/.html manuals")
+    parser.add_argument("--corpus", default=os.path.join("data", "corpus"), help="corpus directory to update")
+    parser.add_argument("--category", default=DEFAULT_CATEGORY, help="category name for ingested records")
+    parser.add_argument("--chunk-words", type=int, default=220)
+    parser.add_argument("--overlap-words", type=int, default=40)
+    parser.add_argument("--max-distance", type=int, default=3, help="SimHash Hamming distance treated as duplicate")
+    args = parser.parse_args(argv)
+
+    stats = run(args.source_dir, args.corpus, args.category, args.chunk_words, args.overlap_words, args.max_distance)
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""Per-stage latency instrumentation.
+
+Samples go into a fixed-size ring of preallocated NumPy columns. Writers claim a
+slot with ``next()`` on an ``itertools.count`` (atomic under the GIL) and write
+their own slot, so recording never takes a lock; the timestamp is written last
+and readers ignore slots whose timestamp is still zero. Percentiles are computed
+on read, over whatever the ring currently holds.
+
+Each recording thread also keeps its own cumulative count and sum per stage,
+summed on read by ``totals()``. They never drop when the ring wraps, so they
+are what the Prometheus ``_sum``/``_count`` counters export.
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+STAGES = ("queue", "retrieval", "rerank", "generation", "first_token", "render", "total")
+QUANTILES = (50, 95, 99)
+
+
+class LatencyRecorder:
+    def __init__(self, capacity=65536, stages=STAGES, clock=time.time):
+        self.capacity = capacity
+        self.stages = tuple(stages)
+        self._stage_ids = {stage: i for i, stage in enumerate(self.stages)}
+        self._clock = clock
+        self._slots = itertools.count()
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._stage = np.zeros(capacity, dtype=np.int8)
+        self._seconds = np.zeros(capacity, dtype=np.float32)
+        self._local = threading.local()
+        self._totals = []  # (counts, sums) per recording thread
+
+    def _thread_totals(self):
+        totals = getattr(self._local, "totals", None)
+        if totals is None:
+            totals = self._local.totals = (
+                np.zeros(len(self.stages), dtype=np.int64),
+                np.zeros(len(self.stages), dtype=np.float64),
+            )
+            self._totals.append(totals)
+        return totals
+
+    def record(self, stage, seconds, timestamp=None):
+        stage_id = self._stage_ids[stage]
+        slot = next(self._slots) % self.capacity
+        self._timestamps[slot] = 0.0
+        self._stage[slot] = stage_id
+        self._seconds[slot] = seconds
+        self._timestamps[slot] = timestamp or self._clock()
+        counts, sums = self._thread_totals()
+        counts[stage_id] += 1
+        sums[stage_id] += seconds
+
+    def totals(self, stage):
+        """``(count, sum)`` of every sample ever recorded for ``stage``."""
+        stage_id = self._stage_ids[stage]
+        totals = list(self._totals)
+        return int(sum(counts[stage_id] for counts, _ in totals)), float(sum(sums[stage_id] for _, sums in totals))
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def samples(self, stage, since=None):
+        """Return ``(timestamps, seconds)`` for one stage currently in the ring."""
+        timestamps = self._timestamps.copy()
+        mask = (timestamps > 0) & (self._stage == self._stage_ids[stage])
+        if since is not None:
+            mask &= timestamps >= since
+        return timestamps[mask], self._seconds[mask]
+
+    def summary(self, stage, since=None):
+        """Count, sum, mean and percentiles of the samples of ``stage`` still in the ring."""
+        _, seconds = self.samples(stage, since)
+        result = {"count": int(len(seconds)), "sum": float(seconds.sum()), "mean": None}
+        result.update({f"p{q}": None for q in QUANTILES})
+        if len(seconds):
+            result["mean"] = float(seconds.mean())
+            for q, value in zip(QUANTILES, np.percentile(seconds, QUANTILES)):
+                result[f"p{q}"] = float(value)
+        return result
+
+    def hourly(self, stage="total", hours=24, now=None):
+        """Per-hour counts and p50/p95/p99 (seconds) for the last ``hours`` hours.
+
+        Returns a dict of equal-length lists keyed by ``hour`` (bucket start,
+        epoch seconds), ``count`` and ``p50``/``p95``/``p99`` (None when empty).
+        """
+        now = now or self._clock()
+        end = (now // 3600 + 1) * 3600
+        start = end - hours * 3600
+        timestamps, seconds = self.samples(stage, since=start)
+        buckets = ((timestamps - start) // 3600).astype(np.int64)
+        order = np.argsort(buckets, kind="stable")
+        buckets, seconds = buckets[order], seconds[order]
+        bounds = np.searchsorted(buckets, np.arange(hours + 1))
+
+        result = {"hour": [start + 3600 * h for h in range(hours)], "count": np.diff(bounds).tolist()}
+        for q in QUANTILES:
+            result[f"p{q}"] = []
+        for h in range(hours):
+            window = seconds[bounds[h]:bounds[h + 1]]
+            values = np.percentile(window, QUANTILES) if len(window) else [None] * len(QUANTILES)
+            for q, value in zip(QUANTILES, values):
+                result[f"p{q}"].append(None if value is None else float(value))
+        return result
+
+    def to_prometheus(self):
+        """Prometheus text exposition of the stage latencies in the ring."""
+        lines = [
+            "# HELP grid_rag_stage_latency_seconds Query path stage latency (quantiles over recent samples).",
+            "# TYPE grid_rag_stage_latency_seconds summary",
+        ]
+        for stage in self.stages:
+            summary = self.summary(stage)
+            for q in QUANTILES:
+                value = summary[f"p{q}"]
+                lines.append(
+                    f'grid_rag_stage_latency_seconds{{stage="{stage}",quantile="{q / 100}"}} '
+                    f'{"NaN" if value is None else f"{value:.6f}"}'
+                )
+            count, total = self.totals(stage)
+            lines.append(f'grid_rag_stage_latency_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'grid_rag_stage_latency_seconds_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class QueryTrace:
+    """Stage timings for one query, committed to a recorder in one go.
+
+    Repeated ``stage()`` blocks with the same name accumulate, so interleaved
+    rendering work can be attributed to a single ``render`` stage.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def stream(self, tokens):
+        """Pass tokens through, timing first token and the whole generation."""
+        started = time.perf_counter()
+        first = True
+        for token in tokens:
+            if first:
+                self.add("first_token", time.perf_counter() - started)
+                first = False
+            yield token
+        self.add("generation", time.perf_counter() - started)
+
+    def commit(self, recorder):
+        now = time.time()
+        for stage, seconds in self.stages.items():
+            recorder.record(stage, seconds, now)
+        recorder.record("total", time.perf_counter() - self.started, now)
+
+
+def start_metrics_server(recorder, port, host="0.0.0.0", collectors=()):
+    """Serve ``GET /metrics`` in Prometheus text format on a daemon thread.
+
+    ``collectors`` are extra callables returning exposition text to append.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = (recorder.to_prometheus() + "".join(c() for c in collectors)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    return server
@@ -0,0 +1,641 @@
+"""Offline edge bundle: corpus, indexes and rendered answers in one pack file.
+
+Usage::
+
+    python -m grid_rag.pack export --corpus data/corpus --index .grid_index --out grid.pack
+    python -m grid_rag.pack info grid.pack
+    python -m grid_rag.pack delta old.pack new.pack --out update.delta
+    python -m grid_rag.pack apply old.pack update.delta --out new.pack
+
+Layout::
+
+    chunk 0 | chunk 1 | ... | index (JSON) | footer (magic, format, index offset, index length)
+
+A pack is a list of named sections, each stored as chunks:
+
+* ``array`` sections (BM25 postings, embeddings) are written uncompressed,
+  64-byte aligned and contiguous, so ``Pack.array`` returns a read-only NumPy
+  view straight onto the memory map.
+* ``blob`` sections (the BM25 vocabulary) are compressed JSON.
+* ``items`` sections (procedure records, pre-rendered fragments, per-category
+  query catalog) are groups of up to ``ITEMS_PER_BLOCK`` items compressed
+  together, plus an ``<name>.offsets`` array locating each item, so one record
+  costs one block decompression.
+* Titles are a string table: concatenated UTF-8 and offsets, plus sorted
+  64-bit hashes for lookup, all arrays. Opening a pack therefore parses
+  nothing proportional to the corpus; only the vocabulary is decoded.
+
+Blocks are compressed with zlib by default, which every Python can read;
+``--codec zstd`` is an opt-in for devices that have ``zstandard`` installed.
+The codec is recorded in the index. Every chunk carries the SHA-1
+of its uncompressed bytes, and a delta ships only the chunks whose hash the
+base pack does not already have (array chunks compressed for transport; base
+blocks are re-encoded on apply when the codecs differ). Item blocks never span categories, so
+ingesting into one category leaves the other categories' blocks unchanged.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from itertools import groupby
+
+import numpy as np
+
+from .build import build_partials, merge_partials, read_build_info
+from .corpus import CorpusStore
+from .render import ResponseRenderer, render_procedure, render_references
+from .retrieval import BM25Index
+from .vector_index import EMBEDDERS, HashingEmbedder, VectorIndex
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"GRIDPACK"
+FORMAT = 1
+FOOTER = struct.Struct("<8sIQQ")
+ALIGN = 64
+ARRAY_CHUNK_BYTES = 1 << 18
+ITEMS_PER_BLOCK = 64
+DEFAULT_CODEC = "zlib"
+
+
+class PackError(ValueError):
+    pass
+
+
+class _Codec:
+    def __init__(self, name, level=None):
+        self.name = name
+        if name == "zstd":
+            if zstandard is None:
+                raise PackError("pack uses zstd compression but the zstandard package is not installed")
+            self._compressor = zstandard.ZstdCompressor(level=level or 9)
+            self._decompressor = zstandard.ZstdDecompressor()
+        elif name == "zlib":
+            self.level = level or 6
+        else:
+            raise PackError(f"unknown pack codec {name!r}")
+
+    def compress(self, data):
+        if self.name == "zstd":
+            return self._compressor.compress(data)
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        if self.name == "zstd":
+            return self._decompressor.decompress(data)
+        return zlib.decompress(data)
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _string_hash(encoded):
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+
+def _content_version(index):
+    """Identifier derived from the corpus version and every chunk hash, not from file offsets."""
+    h = hashlib.sha1(index["corpus_version"].encode("utf-8"))
+    for name, section in index["sections"].items():
+        h.update(name.encode("utf-8"))
+        for chunk in section["chunks"]:
+            h.update(chunk[3].encode("ascii"))
+    return h.hexdigest()[:16]
+
+
+def _read_index(buffer, path):
+    if len(buffer) < FOOTER.size:
+        raise PackError(f"{path}: too small to be a pack")
+    magic, fmt, offset, length = FOOTER.unpack_from(buffer, len(buffer) - FOOTER.size)
+    if magic != MAGIC:
+        raise PackError(f"{path}: not a grid_rag pack")
+    if fmt != FORMAT:
+        raise PackError(f"{path}: unsupported pack format {fmt}")
+    return json.loads(bytes(buffer[offset:offset + length]))
+
+
+class PackWriter:
+    """Streams sections to ``<path>.tmp-<pid>`` and renames into place on ``finish``."""
+
+    def __init__(self, path, codec=None):
+        self.path = path
+        self.codec = _Codec(codec or DEFAULT_CODEC)
+        self._tmp = f"{path}.tmp-{os.getpid()}"
+        self._file = open(self._tmp, "wb")
+        self.sections = {}
+
+    def _pad(self):
+        gap = -self._file.tell() % ALIGN
+        if gap:
+            self._file.write(b"\0" * gap)
+
+    def put_chunk(self, stored, raw_len, digest):
+        """Append already-encoded chunk bytes; returns the chunk descriptor."""
+        offset = self._file.tell()
+        self._file.write(stored)
+        return [offset, len(stored), raw_len, digest]
+
+    def add_section(self, name, section, chunks):
+        """Append a section from ``(stored, raw_len, digest)`` triples, e.g. copied from another pack."""
+        if section["kind"] == "array":
+            self._pad()
+        section = dict(section, chunks=[self.put_chunk(*chunk) for chunk in chunks])
+        self.sections[name] = section
+
+    def add_array(self, name, array):
+        array = np.ascontiguousarray(array)
+        raw = memoryview(array).cast("B") if array.size else b""
+        chunks = []
+        for start in range(0, len(raw), ARRAY_CHUNK_BYTES):
+            chunk = raw[start:start + ARRAY_CHUNK_BYTES]
+            chunks.append((chunk, len(chunk), _digest(chunk)))
+        self.add_section(name, {"kind": "array", "dtype": array.dtype.str, "shape": list(array.shape)}, chunks)
+
+    def add_json(self, name, obj):
+        raw = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        self.add_section(name, {"kind": "blob"}, [(self.codec.compress(raw), len(raw), _digest(raw))])
+
+    def add_items(self, name, groups):
+        """Compress ``groups`` (lists of bytes) in blocks that never cross a group boundary."""
+        chunks, offsets = [], []
+        for group in groups:
+            for start in range(0, len(group), ITEMS_PER_BLOCK):
+                block = group[start:start + ITEMS_PER_BLOCK]
+                position = 0
+                for item in block:
+                    offsets.append((len(chunks), position, position + len(item)))
+                    position += len(item)
+                raw = b"".join(block)
+                chunks.append((self.codec.compress(raw), len(raw), _digest(raw)))
+        self.add_section(name, {"kind": "items"}, chunks)
+        self.add_array(f"{name}.offsets", np.array(offsets, dtype=np.int64).reshape(-1, 3))
+
+    def add_strings(self, name, strings):
+        """String table readable with ``Pack.strings`` without decoding it up front."""
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        hashes = np.array([_string_hash(e) for e in encoded], dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        self.add_array(name, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        self.add_array(f"{name}.offsets", offsets)
+        self.add_array(f"{name}.hashes", hashes[order])
+        self.add_array(f"{name}.order", order)
+
+    def finish(self, corpus_version, meta=None, expected_version=None, **extra):
+        """Write the index and footer, publish the file atomically and return the index.
+
+        With ``expected_version`` nothing is published unless the new pack has that version.
+        """
+        index = {
+            "format": FORMAT,
+            "codec": self.codec.name,
+            "corpus_version": corpus_version,
+            "created": time.time(),
+            "meta": meta or {},
+            "sections": self.sections,
+            **extra,
+        }
+        index["pack_version"] = _content_version(index)
+        if expected_version is not None and index["pack_version"] != expected_version:
+            raise PackError(f"{self.path}: rebuilt pack {index['pack_version']} does not match {expected_version}")
+        self._write_index(index)
+        return index
+
+    def _write_index(self, index):
+        raw = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        offset = self._file.tell()
+        self._file.write(raw)
+        self._file.write(FOOTER.pack(MAGIC, FORMAT, offset, len(raw)))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+class PackStrings(Sequence):
+    """Lazily decoded string table stored by ``PackWriter.add_strings``."""
+
+    def __init__(self, data, offsets, hashes, order):
+        self._data = data
+        self._offsets = offsets
+        self._hashes = hashes
+        self._order = order
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._data[start:end].tobytes().decode("utf-8")
+
+    def find(self, string):
+        """Position of ``string``, or None."""
+        encoded = string.encode("utf-8")
+        key = np.uint64(_string_hash(encoded))
+        lo = np.searchsorted(self._hashes, key, side="left")
+        hi = np.searchsorted(self._hashes, key, side="right")
+        for i in self._order[lo:hi].tolist():
+            if self._data[self._offsets[i]:self._offsets[i + 1]].tobytes() == encoded:
+                return i
+        return None
+
+
+class Pack:
+    """Read-only, memory-mapped view of a pack file.
+
+    Opening reads only the footer and the JSON index; arrays are views onto
+    the map and item blocks are decompressed on demand (last ``block_cache``
+    blocks kept).
+    """
+
+    def __init__(self, path, block_cache=256):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = _read_index(self._mm, path)
+        if "sections" not in self.index:
+            raise PackError(f"{path}: is a delta, not a pack")
+        self.sections = self.index["sections"]
+        self.codec = _Codec(self.index["codec"])
+        self._block = lru_cache(maxsize=block_cache)(self._read_block)
+        self._titles = None
+
+    @property
+    def version(self):
+        return self.index["pack_version"]
+
+    @property
+    def corpus_version(self):
+        return self.index["corpus_version"]
+
+    @property
+    def meta(self):
+        return self.index["meta"]
+
+    def stored(self, chunk):
+        offset, length = chunk[0], chunk[1]
+        return self._mm[offset:offset + length]
+
+    def _decode(self, section, chunk):
+        data = self.stored(chunk)
+        return data if section["kind"] == "array" else self.codec.decompress(data)
+
+    def array(self, name):
+        section = self.sections[name]
+        dtype = np.dtype(section["dtype"])
+        count = int(np.prod(section["shape"], dtype=np.int64))
+        if not count:
+            return np.empty(section["shape"], dtype=dtype)
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=section["chunks"][0][0]).reshape(section["shape"])
+
+    def json(self, name):
+        section = self.sections[name]
+        return json.loads(b"".join(self._decode(section, chunk) for chunk in section["chunks"]))
+
+    def _read_block(self, name, block):
+        section = self.sections[name]
+        return self._decode(section, section["chunks"][block])
+
+    def item(self, name, i):
+        block, start, end = self.array(f"{name}.offsets")[i].tolist()
+        return self._block(name, block)[start:end]
+
+    def item_count(self, name):
+        return self.sections[f"{name}.offsets"]["shape"][0]
+
+    def strings(self, name):
+        return PackStrings(*(self.array(part) for part in (name, f"{name}.offsets", f"{name}.hashes", f"{name}.order")))
+
+    @property
+    def titles(self):
+        """Document titles in doc-id order, shared by the indexes and ``PackResponses``."""
+        if self._titles is None:
+            self._titles = self.strings("titles")
+        return self._titles
+
+    def bm25(self):
+        """``BM25Index`` whose postings are views onto the pack."""
+        terms = self.json("bm25.terms")
+        return BM25Index(
+            {term: i for i, term in enumerate(terms)},
+            self.array("bm25.indptr"),
+            self.array("bm25.doc_ids"),
+            self.array("bm25.weights"),
+            self.titles,
+            self.array("bm25.doc_len"),
+        )
+
+    def vector_index(self, embedder=None):
+        if "vectors" not in self.sections:
+            return None
+        meta = self.meta["vectors"]
+        if embedder is None:
+            embedder = EMBEDDERS[meta["embedder"]](dim=meta["dim"])
+        return VectorIndex(self.array("vectors"), self.titles, embedder, meta=meta)
+
+    def close(self):
+        self._block.cache_clear()
+        try:
+            self._mm.close()
+        except BufferError:
+            # Arrays handed out still reference the map; it is released with them
+            pass
+
+
+class PackResponses(Mapping):
+    """Title -> response mapping that decodes records from the pack on access."""
+
+    def __init__(self, pack):
+        self._pack = pack
+        self._titles = pack.titles
+
+    def __len__(self):
+        return len(self._titles)
+
+    def __iter__(self):
+        return iter(self._titles)
+
+    def __contains__(self, title):
+        return self._titles.find(title) is not None
+
+    def __getitem__(self, title):
+        i = self._titles.find(title)
+        if i is None:
+            raise KeyError(title)
+        return json.loads(self._pack.item("records", i))
+
+    def index(self, title):
+        return self._titles.find(title)
+
+
+class PackCorpus:
+    """``CorpusStore`` interface backed by a ``Pack``."""
+
+    def __init__(self, pack):
+        self.pack = pack
+        self.version = pack.version
+        self._categories = pack.meta["categories"]
+        self._queries = {}
+        self._responses = PackResponses(pack)
+
+    def categories(self):
+        return list(self._categories)
+
+    def queries(self, category):
+        """Catalog queries for one category, decoded on first use."""
+        queries = self._queries.get(category)
+        if queries is None:
+            queries = self._queries[category] = json.loads(self.pack.item("catalog", self._categories.index(category)))
+        return list(queries)
+
+    def documents(self):
+        for i in range(self.pack.item_count("records")):
+            yield json.loads(self.pack.item("records", i))
+
+    def responses(self):
+        return self._responses
+
+    def response(self, title):
+        return self._responses.get(title)
+
+
+class PackRenderer:
+    """``ResponseRenderer`` interface over the fragments rendered at export time."""
+
+    def __init__(self, corpus):
+        self._pack = corpus.pack
+        self._responses = corpus.responses()
+
+    def __len__(self):
+        return len(self._responses)
+
+    def fragments(self, response):
+        i = self._responses.index(response.get("title"))
+        if i is None:
+            return render_procedure(response), render_references(response)
+        procedure, references = json.loads(self._pack.item("rendered", i))
+        return procedure, references
+
+
+def _indexes(corpus, documents, index_dir, workers, dim):
+    """BM25 index and embedding matrix, reusing a matching ``grid_rag.build`` artifact."""
+    info = read_build_info(index_dir) if index_dir else None
+    if info and info["corpus_version"] == corpus.version:
+        vectors = VectorIndex.load(os.path.join(index_dir, "vectors"))
+        return BM25Index.load(os.path.join(index_dir, "bm25.npz")), vectors.vectors, vectors.embedder.dim
+    index, vector_batches = merge_partials(build_partials(documents, workers, dim))
+    vectors = np.concatenate(vector_batches) if vector_batches else np.empty((0, dim), dtype=np.float32)
+    return index, vectors, dim
+
+
+def export(corpus_dir, out_path, index_dir=None, workers=1, dim=384, dtype="float16", codec=None):
+    """Write ``corpus_dir``, its indexes and rendered fragments as one pack; returns the pack index."""
+    corpus = CorpusStore(corpus_dir)
+    documents = list(corpus.documents())
+    index, vectors, dim = _indexes(corpus, documents, index_dir, workers, dim)
+    renderer = ResponseRenderer({document["title"]: document for document in documents})
+
+    def encode(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    # documents() yields category by category, so grouping keeps doc-id order
+    groups = [list(group) for _, group in groupby(documents, key=lambda d: d["category"])]
+
+    writer = PackWriter(out_path, codec)
+    try:
+        writer.add_items("catalog", [[encode(corpus.queries(name))] for name in corpus.categories()])
+        writer.add_strings("titles", index.keys)
+        writer.add_items("records", [[encode(d) for d in group] for group in groups])
+        writer.add_items("rendered", [[encode(renderer.fragments(d)) for d in group] for group in groups])
+        writer.add_json("bm25.terms", sorted(index.vocab, key=index.vocab.get))
+        for name in ("indptr", "doc_ids", "weights", "doc_len"):
+            writer.add_array(f"bm25.{name}", getattr(index, name))
+        writer.add_array("vectors", np.asarray(vectors).astype(dtype))
+        meta = {
+            "categories": corpus.categories(),
+            "documents": len(documents),
+            "terms": len(index.vocab),
+            "vectors": {"embedder": HashingEmbedder.name, "dim": dim, "dtype": str(np.dtype(dtype)),
+                        "count": len(documents), "n_lists": 0, "fingerprint": corpus.version},
+        }
+        return writer.finish(corpus.version, meta)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def make_delta(base_path, target_path, out_path):
+    """Write the chunks of ``target_path`` missing from ``base_path``; returns the delta index."""
+    base, target = Pack(base_path), Pack(target_path)
+    # Stored bytes differ between raw array chunks and compressed ones with the same content
+    have = {(s["kind"] == "array", c[3]) for s in base.sections.values() for c in s["chunks"]}
+    writer = PackWriter(out_path, target.codec.name)
+    try:
+        # Content-addressed chunks; the target index says how to lay them out
+        missing = {}
+        for section in target.sections.values():
+            packed = section["kind"] == "array"
+            for chunk in section["chunks"]:
+                key = f"{'a' if packed else 'c'}:{chunk[3]}"
+                if (packed, chunk[3]) in have or key in missing:
+                    continue
+                stored = target.stored(chunk)
+                if packed:
+                    # Array chunks are raw in a pack for mmap, but compressed in transit
+                    stored = writer.codec.compress(stored)
+                missing[key] = writer.put_chunk(stored, chunk[2], chunk[3])[:2]
+        index = {
+            "format": FORMAT,
+            "codec": target.codec.name,
+            "base_version": base.version,
+            "pack_version": target.version,
+            "target": {key: value for key, value in target.index.items() if key != "pack_version"},
+            "chunks": missing,
+        }
+        writer._write_index(index)
+        return index
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def apply_delta(base_path, delta_path, out_path):
+    """Rebuild the target pack of ``delta_path`` from ``base_path``; returns the new pack index."""
+    base = Pack(base_path)
+    with open(delta_path, "rb") as f:
+        delta_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    delta = _read_index(delta_map, delta_path)
+    if "base_version" not in delta:
+        raise PackError(f"{delta_path}: not a pack delta")
+    if delta["base_version"] != base.version:
+        raise PackError(f"{delta_path}: made against pack {delta['base_version']}, not {base.version}")
+
+    available = {}
+    for section in base.sections.values():
+        for chunk in section["chunks"]:
+            available.setdefault((section["kind"] == "array", chunk[3]), chunk)
+
+    codec = _Codec(delta["codec"])
+    target = delta["target"]
+    target_codec = codec if target["codec"] == codec.name else _Codec(target["codec"])
+
+    def stored(packed, digest):
+        shipped = delta["chunks"].get(f"{'a' if packed else 'c'}:{digest}")
+        if shipped is None:
+            data = base.stored(available[packed, digest])
+            if packed or base.codec.name == target_codec.name:
+                return data
+            # Chunks are matched on their uncompressed hash, so re-encode ones from a base with another codec
+            return target_codec.compress(base.codec.decompress(data))
+        offset, length = shipped
+        data = delta_map[offset:offset + length]
+        raw = codec.decompress(data)
+        if _digest(raw) != digest:
+            raise PackError(f"{delta_path}: chunk {digest} is corrupt")
+        return raw if packed else data
+
+    writer = PackWriter(out_path, target["codec"])
+    try:
+        for name, section in target["sections"].items():
+            packed = section["kind"] == "array"
+            writer.add_section(name, section, [(stored(packed, c[3]), c[2], c[3]) for c in section["chunks"]])
+        # Checked before the rename, so a bad rebuild never replaces a good pack (out_path is often the base)
+        return writer.finish(
+            target["corpus_version"], target["meta"], expected_version=delta["pack_version"], created=target["created"]
+        )
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        delta_map.close()
+
+
+def summary(index, path):
+    sections = index["sections"]
+    return {
+        "path": path,
+        "bytes": os.path.getsize(path),
+        "pack_version": index["pack_version"],
+        "codec": index["codec"],
+        "documents": index["meta"].get("documents"),
+        "sections": {name: sum(chunk[1] for chunk in section["chunks"]) for name, section in sections.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export, inspect and update offline knowledge packs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="write a pack for a corpus")
+    export_cmd.add_argument("--corpus", default=os.path.join("data", "corpus"))
+    export_cmd.add_argument("--out", default="grid.pack")
+    export_cmd.add_argument("--index", default=os.environ.get("GRID_RAG_INDEX_DIR", ".grid_index"),
+                            help="reuse this grid_rag.build artifact when it matches the corpus")
+    export_cmd.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    export_cmd.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    export_cmd.add_argument("--dtype", default="float16", help="stored embedding dtype")
+    export_cmd.add_argument("--codec", choices=["zstd", "zlib"], default=DEFAULT_CODEC,
+                            help="zstd packs need the zstandard package on every device that opens them")
+
+    info_cmd = commands.add_parser("info", help="print a pack's sections and time opening it")
+    info_cmd.add_argument("pack")
+
+    delta_cmd = commands.add_parser("delta", help="write the chunks NEW adds over BASE")
+    delta_cmd.add_argument("base")
+    delta_cmd.add_argument("new")
+    delta_cmd.add_argument("--out", required=True)
+
+    apply_cmd = commands.add_parser("apply", help="rebuild a new pack from BASE and a delta")
+    apply_cmd.add_argument("base")
+    apply_cmd.add_argument("delta")
+    apply_cmd.add_argument("--out", help="defaults to replacing BASE")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            started = time.perf_counter()
+            index = export(args.corpus, args.out, args.index, args.workers, args.dim, args.dtype, args.codec)
+            print(json.dumps(dict(summary(index, args.out), seconds=round(time.perf_counter() - started, 3))))
+        elif args.command == "info":
+            started = time.perf_counter()
+            pack = Pack(args.pack)
+            corpus = PackCorpus(pack)
+            pack.bm25()
+            pack.vector_index()
+            opened = time.perf_counter() - started
+            print(json.dumps(dict(summary(pack.index, args.pack), categories=len(corpus.categories()),
+                                  open_ms=round(opened * 1000, 2))))
+        elif args.command == "delta":
+            index = make_delta(args.base, args.new, args.out)
+            print(json.dumps({"path": args.out, "bytes": os.path.getsize(args.out),
+                              "chunks": len(index["chunks"]), "target_bytes": os.path.getsize(args.new)}))
+        else:
+            out = args.out or args.base
+            index = apply_delta(args.base, args.delta, out)
+            print(json.dumps(summary(index, out)))
+    except PackError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""HTML fragments for the Streamlit UI, rendered once and reused.
+
+Per-procedure fragments (steps + contacts, references) depend only on the
+corpus, so ``ResponseRenderer`` renders them for every procedure when a corpus
+version is loaded and the app caches the renderer per version. Lists that used
+to be one ``st.markdown`` element per line are emitted as a single element,
+which cuts the websocket deltas per answer from ~25 to ~6. User-supplied text
+is HTML-escaped.
+"""
+
+import html
+import re
+from datetime import datetime
+from functools import lru_cache
+
+APP_CSS = """
+.main > div {
+    background: #0d1117;
+    color: #f0f0f0;
+}
+
+.grok-overlay {
+    position: fixed;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    background: rgba(13, 17, 23, 0.95);
+    backdrop-filter: blur(10px);
+    z-index: 999;
+    display: flex;
+    justify-content: center;
+    align-items: center;
+}
+
+.grok-assistant {
+    background: linear-gradient(135deg, #1e293b 0%, #334155 100%);
+    border: 2px solid #3b82f6;
+    border-radius: 20px;
+    padding: 2rem;
+    max-width: 500px;
+    text-align: center;
+    box-shadow: 0 20px 60px rgba(59, 130, 246, 0.3);
+    animation: pulse-glow 2s infinite alternate;
+}
+
+@keyframes pulse-glow {
+    0% { box-shadow: 0 20px 60px rgba(59, 130, 246, 0.3); }
+    100% { box-shadow: 0 20px 80px rgba(59, 130, 246, 0.5); }
+}
+
+.grok-avatar {
+    width: 80px;
+    height: 80px;
+    background: linear-gradient(135deg, #3b82f6 0%, #1d4ed8 100%);
+    border-radius: 50%;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    margin: 0 auto 1rem auto;
+    font-size: 2rem;
+    animation: float 3s ease-in-out infinite;
+}
+
+@keyframes float {
+    0%, 100% { transform: translateY(0px); }
+    50% { transform: translateY(-10px); }
+}
+
+.grid-header {
+    background: linear-gradient(135deg, #1e293b 0%, #334155 100%);
+    padding: 2rem;
+    border-radius: 15px;
+    margin-bottom: 2rem;
+    border: 1px solid #3b82f6;
+    text-align: center;
+}
+
+.query-card {
+    background: #1e293b;
+    border: 1px solid #374151;
+    border-radius: 10px;
+    padding: 1rem;
+    margin: 0.5rem 0;
+    cursor: pointer;
+    transition: all 0.3s ease;
+}
+
+.query-card:hover {
+    border-color: #3b82f6;
+    background: #374151;
+    transform: translateY(-2px);
+}
+
+.answer-section {
+    background: #0f172a;
+    border: 1px solid #1e293b;
+    border-radius: 15px;
+    padding: 1.5rem;
+    margin: 1rem 0;
+}
+
+.emergency-steps {
+    background: #dc2626;
+    color: white;
+    padding: 1rem;
+    border-radius: 10px;
+    margin: 1rem 0;
+}
+
+.contact-info {
+    background: #059669;
+    color: white;
+    padding: 1rem;
+    border-radius: 10px;
+    margin: 1rem 0;
+}
+
+.confidence-badge {
+    display: inline-block;
+    padding: 0.3rem 0.8rem;
+    border-radius: 20px;
+    font-size: 0.8rem;
+    font-weight: bold;
+    margin: 0.5rem 0;
+}
+
+.confidence-high { background: #059669; color: white; }
+.confidence-medium { background: #d97706; color: white; }
+.confidence-low { background: #dc2626; color: white; }
+"""
+
+RISK_BADGE_CLASS = {"CRITICAL": "confidence-low", "HIGH": "confidence-medium", "MEDIUM": "confidence-high"}
+RISK_COLORS = {"CRITICAL": "#dc2626", "HIGH": "#d97706", "MEDIUM": "#059669"}
+
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+@lru_cache(maxsize=1)
+def style_tag():
+    """Minified ``<style>`` element, built once per process."""
+    return f"<style>{minify_css(APP_CSS)}</style>"
+
+
+def bullets(items):
+    # Hard line breaks keep one bullet per line inside a single markdown element. Items are corpus
+    # text (ingested manuals, versioning puts) shown with unsafe_allow_html, so they are escaped
+    return "  \n".join(f"• {html.escape(str(item))}" for item in items)
+
+
+@lru_cache(maxsize=16)
+def risk_badge(risk_level):
+    css_class = RISK_BADGE_CLASS.get(risk_level, "confidence-medium")
+    return f'<span class="confidence-badge {css_class}">Risk Level: {html.escape(str(risk_level))}</span>'
+
+
+def answer_header(query, risk_level):
+    return (
+        '<div class="answer-section"><h3>🤖 Assistant Response</h3>'
+        f"<p><strong>Query:</strong> {html.escape(query)}</p></div>\n\n"
+        + risk_badge(risk_level)
+    )
+
+
+def render_procedure(response):
+    """Steps and contacts for one procedure as a single markdown string."""
+    return (
+        '<div class="emergency-steps"><h4>🚨 Emergency Response Steps</h4></div>\n\n'
+        + bullets(response["steps"])
+        + '\n\n<div class="contact-info"><h4>📞 Emergency Contacts</h4></div>\n\n'
+        + bullets(response["contacts"])
+    )
+
+
+def render_references(response):
+    return "**📖 Technical References:**  \n" + bullets(response["sources"])
+
+
+class ResponseRenderer:
+    """Pre-rendered per-procedure fragments for one corpus version."""
+
+    def __init__(self, responses):
+        self._fragments = {
+            title: (render_procedure(response), render_references(response))
+            for title, response in responses.items()
+        }
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def updated(self, responses, titles):
+        """Renderer for ``responses``, which differ from this renderer's only in ``titles``."""
+        renderer = ResponseRenderer({})
+        renderer._fragments = dict(self._fragments)
+        for title in titles:
+            response = responses.get(title)
+            if response is None:
+                renderer._fragments.pop(title, None)
+            else:
+                renderer._fragments[title] = (render_procedure(response), render_references(response))
+        return renderer
+
+    def fragments(self, response):
+        """``(procedure, references)`` markdown for a response, rendering it if not pre-rendered."""
+        cached = self._fragments.get(response.get("title"))
+        if cached is None:
+            return render_procedure(response), render_references(response)
+        return cached
+
+
+def related_procedures(hits):
+    return "**🔎 Related Procedures:**  \n" + bullets(
+        f"{hit['title']} (relevance {hit['score']:.2f})" for hit in hits
+    )
+
+
+def history_cards(entries):
+    """All recent-query cards as one HTML block."""
+    cards = []
+    for entry in entries:
+        cards.append(
+            '<div class="query-card">'
+            f'<p><strong>{datetime.fromtimestamp(entry.timestamp).strftime("%H:%M:%S")}</strong>'
+            f" - {html.escape(entry.category or '')}</p>"
+            f"<p>{html.escape(entry.query[:80])}...</p>"
+            f'<span style="color: {RISK_COLORS.get(entry.risk_level, "#6b7280")};">Risk: {html.escape(str(entry.risk_level))}</span>'
+            "</div>"
+        )
+    return "".join(cards)
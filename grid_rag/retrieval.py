@@ -0,0 +1,202 @@
+"""BM25 inverted index over the procedure corpus.
+
+Postings are stored in CSR form (``indptr`` / ``doc_ids`` / ``weights``) with the
+BM25 term weight precomputed per posting, so a query is a handful of NumPy
+scatter-adds followed by a partial sort. Each posting list is impact-ordered
+(highest weight first) and only its head is scanned, which keeps query latency
+bounded as very common terms grow with the corpus.
+"""
+
+from array import array
+from collections import Counter
+from typing import NamedTuple
+
+import numpy as np
+
+from .documents import field_text
+from .text import tokenize
+
+# Title matches matter most; the category label is a weak hint
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "category": 0.5,
+    "answer": 1.0,
+    "steps": 1.0,
+    "sources": 1.0,
+}
+
+
+class Hit(NamedTuple):
+    doc: int
+    key: str
+    score: float
+
+
+# Postings scanned per query term; lists are impact-ordered so this keeps the best
+MAX_POSTINGS_PER_TERM = 4096
+
+
+def document_terms(document, field_weights=FIELD_WEIGHTS):
+    """Return weighted term frequencies for one document."""
+    counts = Counter()
+    for field, weight in field_weights.items():
+        for term in tokenize(field_text(document, field)):
+            counts[term] += weight
+    return counts
+
+
+def collect_postings(documents, key="title", field_weights=FIELD_WEIGHTS, doc_offset=0):
+    """Tokenize documents into raw (term, doc, tf) columns.
+
+    Returns ``(vocab, term_ids, doc_ids, tfs, keys, doc_len)`` where ``vocab``
+    is local to this batch; doc ids start at ``doc_offset`` so batches built
+    separately can be concatenated.
+    """
+    vocab = {}
+    keys = []
+    term_col, doc_col, tf_col, doc_len = array("i"), array("i"), array("f"), array("f")
+    for doc_id, document in enumerate(documents, start=doc_offset):
+        keys.append(document[key])
+        counts = document_terms(document, field_weights)
+        for term, tf in counts.items():
+            term_col.append(vocab.setdefault(term, len(vocab)))
+            doc_col.append(doc_id)
+            tf_col.append(tf)
+        doc_len.append(sum(counts.values()))
+    return (
+        vocab,
+        np.frombuffer(term_col, dtype=np.int32),
+        np.frombuffer(doc_col, dtype=np.int32),
+        np.frombuffer(tf_col, dtype=np.float32),
+        keys,
+        np.frombuffer(doc_len, dtype=np.float32),
+    )
+
+
+class BM25Index:
+    def __init__(self, vocab, indptr, doc_ids, weights, keys, doc_len, max_postings=MAX_POSTINGS_PER_TERM):
+        self.max_postings = max_postings
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.keys = keys
+        self.doc_len = doc_len
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, documents, key="title", k1=1.2, b=0.75, field_weights=FIELD_WEIGHTS):
+        """Index an iterable of documents, keyed by ``document[key]``."""
+        return cls.from_postings(*collect_postings(documents, key, field_weights), k1=k1, b=b)
+
+    @classmethod
+    def from_postings(cls, vocab, term_ids, doc_ids, tfs, keys, doc_len, k1=1.2, b=0.75, collection=None):
+        """Finalize raw (term, doc, tf) triples into a scored CSR index.
+
+        ``collection`` is an optional ``(n_docs, df, avgdl)`` to score with
+        instead of this batch's own statistics (``df`` aligned with ``vocab``).
+        """
+        df = np.bincount(term_ids, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+
+        if collection is None:
+            n_docs = len(keys)
+            avgdl = float(doc_len.mean()) if n_docs else 1.0
+        else:
+            n_docs, df, avgdl = collection
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1.0 - b + b * doc_len[doc_ids] / avgdl)
+        weights = (idf[term_ids] * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32)
+
+        # Group by term, highest impact first within each posting list
+        order = np.lexsort((-weights, term_ids))
+        term_ids, doc_ids, weights = term_ids[order], doc_ids[order], weights[order]
+
+        return cls(vocab, indptr, doc_ids.astype(np.int32), weights, list(keys), np.asarray(doc_len, dtype=np.float32))
+
+    def delta(self, documents, key="title", k1=1.2, b=0.75, field_weights=FIELD_WEIGHTS):
+        """Small index over ``documents`` scored with this index's collection statistics.
+
+        Its scores are comparable with this index's, so hits from both can be
+        merged into one ranking without rebuilding this one.
+        """
+        vocab, term_ids, doc_ids, tfs, keys, doc_len = collect_postings(documents, key, field_weights)
+        base_df = np.diff(self.indptr)
+        df = np.bincount(term_ids, minlength=len(vocab))
+        for term, term_id in vocab.items():
+            base_id = self.vocab.get(term)
+            if base_id is not None:
+                df[term_id] += base_df[base_id]
+        avgdl = float(np.concatenate([self.doc_len, doc_len]).mean()) if len(self.keys) + len(keys) else 1.0
+        collection = (len(self.keys) + len(keys), df, avgdl)
+        return self.from_postings(vocab, term_ids, doc_ids, tfs, keys, doc_len, k1=k1, b=b, collection=collection)
+
+    def term_ids(self, query):
+        seen = set()
+        ids = []
+        for term in tokenize(query):
+            term_id = self.vocab.get(term)
+            if term_id is not None and term_id not in seen:
+                seen.add(term_id)
+                ids.append(term_id)
+        return ids
+
+    def _postings(self, term_id):
+        start = self.indptr[term_id]
+        end = min(self.indptr[term_id + 1], start + self.max_postings)
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def scores(self, query):
+        """Return the dense BM25 score vector for a query."""
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        for term_id in self.term_ids(query):
+            docs, weights = self._postings(term_id)
+            # doc ids are unique within one posting list, so fancy-index add is safe
+            scores[docs] += weights
+        return scores
+
+    def search(self, query, k=5):
+        """Return up to ``k`` hits ranked by BM25 score.
+
+        Work is proportional to the postings scanned, not to corpus size.
+        """
+        postings = [self._postings(term_id) for term_id in self.term_ids(query)]
+        if not postings:
+            return []
+        docs = np.concatenate([docs for docs, _ in postings])
+        weights = np.concatenate([weights for _, weights in postings])
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        top = np.arange(len(candidates))
+        if len(top) > k:
+            top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [Hit(int(candidates[i]), self.keys[candidates[i]], float(scores[i])) for i in top]
+
+    def save(self, path):
+        terms = np.array(sorted(self.vocab, key=self.vocab.get))
+        np.savez(
+            path,
+            terms=terms,
+            indptr=self.indptr,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+            keys=np.array(self.keys),
+            doc_len=self.doc_len,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            vocab = {term: i for i, term in enumerate(data["terms"].tolist())}
+            return cls(
+                vocab,
+                data["indptr"],
+                data["doc_ids"],
+                data["weights"],
+                data["keys"].tolist(),
+                data["doc_len"],
+            )
@@ -0,0 +1,393 @@
+"""Priority scheduling and per-session rate limiting in front of the answer pipeline.
+
+``QueryScheduler`` triages each query before doing any real work: answers
+already in the cache are returned inline, everything else is queued on a heap
+ordered by predicted risk level (CRITICAL first, arrival order within a level)
+and run by a fixed pool of worker threads.
+
+* Each session draws from a token bucket. A session over its limit gets
+  ``RateLimited``; CRITICAL queries drain the bucket but are never refused.
+  A batch reserves the tokens for all of its queries at once and is refused
+  with ``BatchTooLarge`` when it needs more than a full bucket. Queries that
+  are shed, expire or are cancelled before running give their token back.
+* ``reserved`` workers only take CRITICAL queries, so an emergency query waits
+  for at most the CRITICAL queries ahead of it, never for a backlog of
+  lower-priority ones.
+* Load shedding: a query is refused with ``Overloaded`` when the queue already
+  holds ``shed_at[level]`` queries, so lower levels are turned away first. A
+  CRITICAL query arriving at a full queue evicts the newest query of the lowest
+  level instead. Non-critical queries that waited longer than ``max_wait`` are
+  dropped when they reach the front.
+
+Queue depth, running workers, per-level counters and queue wait percentiles
+are exposed through ``stats()`` and ``to_prometheus()``. Worker count and the
+per-session rate come from ``GRID_RAG_QUERY_WORKERS`` and ``GRID_RAG_RATE_LIMIT``
+(queries per second, bursts of four seconds' worth).
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .metrics import QUANTILES, LatencyRecorder
+
+LEVELS = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+PRIORITY = {level: i for i, level in enumerate(LEVELS)}
+DEFAULT_LEVEL = "MEDIUM"
+COUNTERS = ("submitted", "inline", "completed", "failed", "rate_limited", "shed", "expired")
+
+
+class SchedulerError(RuntimeError):
+    pass
+
+
+class RateLimited(SchedulerError):
+    def __init__(self, retry_after):
+        super().__init__(f"rate limit exceeded, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Overloaded(SchedulerError):
+    pass
+
+
+class BatchTooLarge(SchedulerError):
+    def __init__(self, size, burst):
+        super().__init__(f"batch needs {size} rate-limited queries, more than the burst of {burst:g}")
+        self.size = size
+        self.burst = burst
+
+
+def risk_level(level):
+    """``level`` if it is one the scheduler knows, else ``DEFAULT_LEVEL``."""
+    level = (level or "").upper()
+    return level if level in PRIORITY else DEFAULT_LEVEL
+
+
+class RateLimiter:
+    """Token bucket per session: ``rate`` queries per second, bursts of up to ``burst``.
+
+    Buckets of the least recently seen sessions are dropped beyond
+    ``max_sessions``; a dropped session starts again with a full bucket, which
+    is what an idle one would have refilled to anyway.
+    """
+
+    def __init__(self, rate=5.0, burst=20, max_sessions=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def acquire(self, session, count=1, force=False):
+        """Take ``count`` tokens at once; returns 0.0, or the seconds until they are available when refused.
+
+        With ``force`` the queries are admitted even from an empty bucket.
+        """
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(session, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            retry_after = 0.0
+            if tokens >= count or force:
+                tokens = max(tokens - count, 0.0)
+            else:
+                retry_after = (count - tokens) / self.rate
+            self._buckets[session] = (tokens, now)
+            if len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+    def release(self, session, count=1):
+        """Give back ``count`` tokens taken for queries that were never answered."""
+        with self._lock:
+            if session in self._buckets:
+                tokens, updated = self._buckets[session]
+                self._buckets[session] = (min(self.burst, tokens + count), updated)
+
+
+class _Job:
+    __slots__ = ("session", "level", "args", "kwargs", "future", "enqueued")
+
+    def __init__(self, session, level, args, kwargs):
+        self.session = session
+        self.level = level
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = None
+
+
+class QueryScheduler:
+    """Runs ``handler(query, *args, **kwargs)`` on ``workers`` threads in risk order.
+
+    ``triage(query, *args, **kwargs)`` returns ``(level, cached)`` for a query
+    without answering it; cached queries skip the queue and the rate limit.
+    A ``trace`` keyword argument, if the handler takes one, gets the time spent
+    queued as its ``queue`` stage.
+    """
+
+    def __init__(
+        self,
+        handler,
+        triage,
+        workers=4,
+        reserved=1,
+        max_queue=256,
+        shed_at=None,
+        max_wait=5.0,
+        limiter=None,
+        clock=time.monotonic,
+    ):
+        if not 0 <= reserved < workers:
+            raise ValueError("reserved must leave at least one worker for non-critical queries")
+        self.handler = handler
+        self.triage = triage
+        self.workers = workers
+        self.reserved = reserved
+        self.max_queue = max_queue
+        self.shed_at = shed_at or {
+            "CRITICAL": max_queue,
+            "HIGH": max_queue * 3 // 4,
+            "MEDIUM": max_queue // 2,
+            "LOW": max_queue // 4,
+        }
+        self.max_wait = max_wait
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self._clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._ready = threading.Condition()
+        self._closed = False
+        self.running = 0
+        self.depth = dict.fromkeys(LEVELS, 0)
+        self.counts = {name: dict.fromkeys(LEVELS, 0) for name in COUNTERS}
+        self.waits = LatencyRecorder(capacity=16384, stages=LEVELS)
+        self._threads = [
+            threading.Thread(target=self._work, name=f"query-worker-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _count(self, name, level):
+        self.counts[name][level] += 1
+
+    def submit(self, session, query, *args, **kwargs):
+        """Schedule one query for ``session``; returns a ``Future`` for the handler's result.
+
+        Raises ``RateLimited`` or ``Overloaded`` straight away when the query
+        is refused; the future fails with ``Overloaded`` if it expires queued.
+        """
+        return self.submit_batch(session, [query], *args, **kwargs)[0]
+
+    def submit_batch(self, session, queries, *args, **kwargs):
+        """Schedule ``queries`` for ``session`` together; returns one ``Future`` per query.
+
+        The batch is admitted or refused as a whole: its queries are checked
+        against the shedding thresholds and take their rate-limit tokens in one
+        step, so a refused batch costs the session nothing. Raises
+        ``BatchTooLarge`` when no full bucket could ever cover it.
+        """
+        triaged = []
+        for query in queries:
+            level, cached = self.triage(query, *args, **kwargs)
+            triaged.append((query, risk_level(level), cached))
+        jobs = [_Job(session, level, (query,) + args, kwargs) for query, level, cached in triaged if not cached]
+        limited = sum(job.level != LEVELS[0] for job in jobs)
+        if limited > self.limiter.burst:
+            raise BatchTooLarge(limited, self.limiter.burst)
+
+        with self._ready:
+            if jobs and self._closed:
+                raise Overloaded("scheduler is shut down")
+            shed = self._shed(jobs)
+            if shed:
+                for job in jobs:
+                    self._count("shed", job.level)
+                raise Overloaded(f"query queue full, {shed} queries are being shed")
+            retry_after = self.limiter.acquire(session, limited) if limited else 0.0
+            if retry_after:
+                for job in jobs:
+                    if job.level != LEVELS[0]:
+                        self._count("rate_limited", job.level)
+                raise RateLimited(retry_after)
+            if limited < len(jobs):
+                self.limiter.acquire(session, len(jobs) - limited, force=True)
+            for job in jobs:
+                if len(self._heap) >= self.shed_at[job.level]:
+                    self._evict()
+                job.enqueued = self._clock()
+                heapq.heappush(self._heap, (PRIORITY[job.level], next(self._seq), job))
+                self.depth[job.level] += 1
+                self._count("submitted", job.level)
+            if jobs:
+                self._ready.notify_all()
+
+        futures = iter(job.future for job in jobs)
+        results = []
+        for query, level, cached in triaged:
+            if not cached:
+                results.append(next(futures))
+                continue
+            with self._ready:
+                self._count("inline", level)
+            future = Future()
+            try:
+                future.set_result(self.handler(query, *args, **kwargs))
+            except Exception as exc:
+                future.set_exception(exc)
+            results.append(future)
+        return results
+
+    def run(self, session, query, *args, timeout=None, **kwargs):
+        """``submit`` and wait for the result."""
+        return self.submit(session, query, *args, **kwargs).result(timeout)
+
+    def _shed(self, jobs):
+        """Level of the first of ``jobs`` the queue has no room for, or None if all of them fit.
+
+        Called with the lock held, before anything is queued. A CRITICAL job
+        at a full queue fits if there is a lower-level query left to evict.
+        """
+        depth = len(self._heap)
+        evictable = sum(1 for priority, _, _ in self._heap if priority)
+        for job in jobs:
+            if depth < self.shed_at[job.level]:
+                depth += 1
+            elif job.level == LEVELS[0] and evictable:
+                evictable -= 1
+            else:
+                return job.level
+        return None
+
+    def _evict(self):
+        """Drop the newest queued query of the lowest level below CRITICAL; False if there is none."""
+        victims = [i for i, (priority, _, _) in enumerate(self._heap) if priority]
+        if not victims:
+            return False
+        i = max(victims, key=lambda i: self._heap[i][:2])
+        _, _, job = self._heap[i]
+        self._heap[i] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        self.depth[job.level] -= 1
+        self._count("shed", job.level)
+        self._refund(job)
+        job.future.set_exception(Overloaded(f"{job.level} query shed for a CRITICAL one"))
+        return True
+
+    def _refund(self, job):
+        # CRITICAL queries may have been forced through an empty bucket, so only the others give tokens back
+        if job.level != LEVELS[0]:
+            self.limiter.release(job.session)
+
+    def _runnable(self):
+        # The reserved workers are only ever handed CRITICAL queries
+        return self._heap and (self._heap[0][0] == 0 or self.running < self.workers - self.reserved)
+
+    def _work(self):
+        while True:
+            with self._ready:
+                while not self._runnable():
+                    if self._closed and not self._heap:
+                        return
+                    self._ready.wait()
+                _, _, job = heapq.heappop(self._heap)
+                self.depth[job.level] -= 1
+                waited = self._clock() - job.enqueued
+                if job.level != LEVELS[0] and waited > self.max_wait:
+                    self._count("expired", job.level)
+                    self._refund(job)
+                    job.future.set_exception(Overloaded(f"{job.level} query expired after {waited:.1f}s in the queue"))
+                    continue
+                if not job.future.set_running_or_notify_cancel():
+                    self._refund(job)
+                    continue
+                self.running += 1
+
+            self.waits.record(job.level, waited)
+            trace = job.kwargs.get("trace")
+            if trace is not None:
+                trace.add("queue", waited)
+            try:
+                job.future.set_result(self.handler(*job.args, **job.kwargs))
+                outcome = "completed"
+            except Exception as exc:
+                job.future.set_exception(exc)
+                outcome = "failed"
+            with self._ready:
+                self.running -= 1
+                self._count(outcome, job.level)
+                self._ready.notify_all()
+
+    def close(self, wait=True):
+        """Stop accepting queries; workers exit once the queue is drained."""
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def stats(self):
+        with self._ready:
+            stats = {
+                "workers": self.workers,
+                "reserved": self.reserved,
+                "running": self.running,
+                "queued": len(self._heap),
+                "depth": dict(self.depth),
+                "sessions": len(self.limiter),
+            }
+            stats.update({name: dict(counts) for name, counts in self.counts.items()})
+        stats["wait_p99_ms"] = {}
+        for level in LEVELS:
+            p99 = self.waits.summary(level)["p99"]
+            stats["wait_p99_ms"][level] = None if p99 is None else round(p99 * 1000, 2)
+        return stats
+
+    def to_prometheus(self):
+        stats = self.stats()
+        lines = [
+            "# TYPE grid_rag_scheduler_running gauge",
+            f"grid_rag_scheduler_running {stats['running']}",
+            "# TYPE grid_rag_scheduler_queue_depth gauge",
+        ]
+        lines += [f'grid_rag_scheduler_queue_depth{{level="{level}"}} {stats["depth"][level]}' for level in LEVELS]
+        for name in COUNTERS:
+            lines.append(f"# TYPE grid_rag_scheduler_{name}_total counter")
+            lines += [f'grid_rag_scheduler_{name}_total{{level="{level}"}} {stats[name][level]}' for level in LEVELS]
+        lines.append("# TYPE grid_rag_scheduler_wait_seconds summary")
+        for level in LEVELS:
+            summary = self.waits.summary(level)
+            for q in QUANTILES:
+                value = summary[f"p{q}"]
+                lines.append(
+                    f'grid_rag_scheduler_wait_seconds{{level="{level}",quantile="{q / 100}"}} '
+                    f'{"NaN" if value is None else f"{value:.6f}"}'
+                )
+            count, total = self.waits.totals(level)
+            lines.append(f'grid_rag_scheduler_wait_seconds_sum{{level="{level}"}} {total:.6f}')
+            lines.append(f'grid_rag_scheduler_wait_seconds_count{{level="{level}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def service_scheduler(get_service, workers=None, rate=None):
+    """``QueryScheduler`` that triages and answers with whichever ``AnswerService`` ``get_service()`` returns."""
+    workers = workers or int(os.environ.get("GRID_RAG_QUERY_WORKERS", 4))
+    rate = rate or float(os.environ.get("GRID_RAG_RATE_LIMIT", 5.0))
+    return QueryScheduler(
+        lambda *args, **kwargs: get_service().answer(*args, **kwargs),
+        lambda *args, **kwargs: get_service().triage(*args, **kwargs),
+        workers=workers,
+        reserved=1 if workers > 1 else 0,
+        limiter=RateLimiter(rate=rate, burst=max(4 * rate, 1.0)),
+    )
@@ -0,0 +1,150 @@
+"""Query answering core shared by the Streamlit app and the HTTP API.
+
+``AnswerService`` owns the corpus, the retrieval indexes and the answer cache
+and turns a query into a JSON-ready result: the ranked hits plus the best
+matching procedure. It has no Streamlit dependency, so any number of API
+workers can import it.
+"""
+
+import os
+import time
+
+from .build import read_build_info
+from .cache import QueryCache
+from .corpus import CorpusStore
+from .fleet import applies_to, apply_assessment
+from .hybrid import HybridRetriever
+from .metrics import QueryTrace
+from .pack import PackCorpus
+from .retrieval import BM25Index
+from .suggest import CatalogSuggester
+from .vector_index import VectorIndex
+
+
+def load_retriever(corpus, index_dir=None):
+    """BM25 index for ``corpus``, preferring the ``grid_rag.build`` artifact when it matches."""
+    if isinstance(corpus, PackCorpus):
+        return corpus.pack.bm25()
+    if index_dir:
+        info = read_build_info(index_dir)
+        if info and info["corpus_version"] == corpus.version:
+            return BM25Index.load(os.path.join(index_dir, "bm25.npz"))
+    return BM25Index.build(corpus.documents())
+
+
+def load_vector_index(corpus, index_dir):
+    if isinstance(corpus, PackCorpus):
+        return corpus.pack.vector_index()
+    if not index_dir:
+        return None
+    directory = os.path.join(index_dir, "vectors")
+    if VectorIndex.exists(directory):
+        index = VectorIndex.load(directory)
+        if index.meta.get("fingerprint") == corpus.version:
+            return index
+    os.makedirs(index_dir, exist_ok=True)
+    return VectorIndex.build(corpus.documents(), directory, fingerprint=corpus.version)
+
+
+class AnswerService:
+    def __init__(self, corpus, index_dir=None, cache=None, recorder=None, fleet=None, retriever=None, vector_index=None):
+        self.corpus = corpus
+        self.fleet = fleet
+        self.index_dir = index_dir
+        # Prebuilt indexes are passed in by ``grid_rag.versioning`` snapshots
+        self.retriever = retriever if retriever is not None else load_retriever(corpus, index_dir)
+        self.vector_index = vector_index if vector_index is not None else load_vector_index(corpus, index_dir)
+        self.hybrid = HybridRetriever(self.retriever, self.vector_index)
+        self.cache = cache if cache is not None else QueryCache()
+        self.recorder = recorder
+        self.suggester = CatalogSuggester(corpus)
+
+    @classmethod
+    def open(cls, corpus_dir, index_dir=None, **kwargs):
+        return cls(CorpusStore(corpus_dir), index_dir, **kwargs)
+
+    @property
+    def version(self):
+        return self.corpus.version
+
+    def _rank(self, query, k, trace):
+        hits, confidence = self.hybrid.search(query, k=k, trace=trace)
+        if not hits:
+            return {"query": query, "hits": [], "response": None, "confidence": 0.0}
+        return {
+            "query": query,
+            "hits": [{"title": hit.key, "score": hit.score} for hit in hits],
+            # Displayed confidence reflects how well this query matched, not a stored constant
+            "response": dict(self.corpus.response(hits[0].key), confidence=confidence),
+            "confidence": confidence,
+        }
+
+    def answer(self, query, k=3, trace=None, asset=None):
+        """Ranked hits and the top procedure for ``query``.
+
+        Pass a ``QueryTrace`` to have the retrieval and rerank stages added to
+        it; without one the service times the call itself and commits to its
+        recorder.
+        With an ``asset`` id, a DGA procedure's risk level and confidence come
+        from that transformer's fleet assessment.
+        """
+        owned = trace is None
+        trace = trace or QueryTrace()
+        started = time.perf_counter()
+        result = self.cache.get(query, (self.version, k))
+        if result is None:
+            result = self._rank(query, k, trace)
+            self.cache.put(query, (self.version, k), result)
+        else:
+            trace.add("retrieval", time.perf_counter() - started)
+        if asset and self.fleet is not None and result["response"] and applies_to(result["response"]):
+            assessment = self.fleet.assessment(asset)
+            if assessment is not None:
+                result = dict(result, response=apply_assessment(result["response"], assessment), assessment=assessment)
+        if owned and self.recorder is not None:
+            trace.commit(self.recorder)
+        return result
+
+    def triage(self, query, k=3, trace=None, asset=None):
+        """``(risk_level, cached)`` for ``query`` without answering it.
+
+        The level is the cached answer's, or else that of the top BM25 hit
+        (sub-millisecond, no dense search or rerank); the asset's fleet
+        assessment applies as in ``answer``. ``None`` when nothing matches.
+        """
+        result = self.cache.peek(query, (self.version, k))
+        cached = result is not None
+        if cached:
+            response = result["response"]
+        else:
+            hits = self.retriever.search(query, k=1)
+            response = self.corpus.response(hits[0].key) if hits else None
+        if not response:
+            return None, cached
+        if asset and self.fleet is not None and applies_to(response):
+            assessment = self.fleet.assessment(asset)
+            if assessment is not None:
+                return assessment["risk_level"], cached
+        return response.get("risk_level"), cached
+
+    def answer_batch(self, queries, k=3):
+        return [self.answer(query, k) for query in queries]
+
+    def suggest(self, text, k=8):
+        """Type-ahead suggestions for partially typed ``text`` (see ``grid_rag.suggest``)."""
+        return [suggestion._asdict() for suggestion in self.suggester.suggest(text, k)]
+
+    def stats(self):
+        stats = {
+            "corpus_version": self.version,
+            "documents": len(self.corpus.responses()),
+            "terms": len(self.retriever.vocab),
+            "cache": self.cache.stats(),
+        }
+        if self.fleet is not None:
+            stats["fleet"] = self.fleet.risk_counts()
+        stats["hybrid"] = self.hybrid.stats()
+        if self.vector_index is not None:
+            stats["vectors"] = len(self.vector_index)
+            stats["vector_bytes"] = self.vector_index.nbytes
+        return stats
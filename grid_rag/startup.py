@@ -0,0 +1,201 @@
+"""Startup profiling and background warm-up.
+
+``PROFILE`` is a process-wide ``StartupProfile``: the app records import,
+component-init and warm-up timings into it (each name once, on first use),
+logs it to stderr and shows it on the System Status tab when
+``GRID_RAG_PROFILE_STARTUP`` is set. ``Warmup`` runs preload tasks in a
+daemon thread so indexes and caches load after the first page is sent
+instead of before it.
+
+This module only imports the standard library so it can be imported before
+anything it measures. For cold timings in fresh interpreters::
+
+    python -m grid_rag.startup --corpus data/corpus --index .grid_index
+"""
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Heavy third-party and app modules, timed one fresh interpreter each
+IMPORTS = (
+    "numpy",
+    "pandas",
+    "streamlit",
+    "fastapi",
+    "grid_rag.service",
+    "grid_rag.pack",
+    "grid_rag.fleet",
+    "grid_rag.analytics",
+    "grid_rag.sensors",
+    "grid_rag.generation",
+)
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = []
+        self._names = set()
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, seconds):
+        with self._lock:
+            if (kind, name) in self._names:
+                return
+            self._names.add((kind, name))
+            self.rows.append({
+                "kind": kind,
+                "name": name,
+                "ms": round(seconds * 1000, 1),
+                "at_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "thread": threading.current_thread().name,
+            })
+
+    def seen(self, kind, name):
+        return (kind, name) in self._names
+
+    @contextmanager
+    def timing(self, kind, name):
+        started = time.perf_counter()
+        yield
+        self.record(kind, name, time.perf_counter() - started)
+
+    def call(self, name, fn, *args):
+        """``fn(*args)``, recording how long the first call took as component ``name``."""
+        if self.seen("init", name):
+            return fn(*args)
+        with self.timing("init", name):
+            return fn(*args)
+
+    def imported(self, module):
+        """Import ``module`` on first use, recording the import time."""
+        if module in sys.modules:
+            return sys.modules[module]
+        with self.timing("import", module):
+            return importlib.import_module(module)
+
+    def report(self):
+        with self._lock:
+            return list(self.rows)
+
+    def log(self, stream=None):
+        stream = stream or sys.stderr
+        for row in self.report():
+            print(f"[startup] {row['at_ms']:>9.1f} ms  {row['kind']:<7} {row['name']:<28} {row['ms']:>8.1f} ms  ({row['thread']})", file=stream)
+
+
+PROFILE = StartupProfile()
+
+
+class Warmup:
+    """Runs ``(name, callable)`` tasks in order on a daemon thread; a failing task does not stop the rest."""
+
+    def __init__(self, tasks, profile=PROFILE, on_done=None):
+        self.tasks = list(tasks)
+        self.profile = profile
+        self.on_done = on_done
+        self.completed = []
+        self.failed = {}
+        self.finished_at = None
+        self._thread = None
+        self._done = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        for name, task in self.tasks:
+            try:
+                with self.profile.timing("warmup", name):
+                    task()
+                self.completed.append(name)
+            except Exception as exc:
+                self.failed[name] = repr(exc)
+        self.finished_at = time.perf_counter()
+        self._done.set()
+        if self.on_done is not None:
+            self.on_done(self)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def status(self):
+        return {
+            "done": self.done,
+            "completed": list(self.completed),
+            "pending": [name for name, _ in self.tasks if name not in self.completed and name not in self.failed],
+            "failed": dict(self.failed),
+            "ready_seconds": round(self.finished_at - self.profile.started, 3) if self.finished_at else None,
+        }
+
+
+def time_import(module):
+    """Cold import time of ``module`` in a fresh interpreter, in milliseconds."""
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return round(float(out.stdout.strip()), 1)
+
+
+def time_components(corpus_dir, index_dir, fleet_path=None, pack_path=None):
+    """Cold init time of each component the app loads, in order, in this process."""
+    from .corpus import CorpusStore
+    from .fleet import FleetScores, load_table
+    from .pack import Pack, PackCorpus, PackRenderer
+    from .render import ResponseRenderer
+    from .service import AnswerService
+
+    profile = StartupProfile()
+    with profile.timing("init", "corpus"):
+        corpus = PackCorpus(Pack(pack_path)) if pack_path else CorpusStore(corpus_dir)
+    fleet = None
+    if fleet_path and os.path.exists(fleet_path):
+        with profile.timing("init", "fleet"):
+            fleet = FleetScores(load_table(fleet_path))
+    with profile.timing("init", "answer service"):
+        service = AnswerService(corpus, index_dir, fleet=fleet)
+    with profile.timing("init", "renderer"):
+        PackRenderer(corpus) if pack_path else ResponseRenderer(corpus.responses())
+    with profile.timing("init", "suggestions"):
+        service.suggester.get()
+    titles = list(corpus.responses())[:256]
+    with profile.timing("init", "first query"):
+        if titles:
+            service.answer(titles[0])
+    with profile.timing("init", f"answer cache ({len(titles)} queries)"):
+        for title in titles:
+            service.answer(title)
+    return profile.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report cold import and component init times.")
+    parser.add_argument("--corpus", default=os.environ.get("GRID_RAG_CORPUS_DIR", os.path.join("data", "corpus")))
+    parser.add_argument("--index", default=os.environ.get("GRID_RAG_INDEX_DIR", ".grid_index"))
+    parser.add_argument("--fleet", default=os.environ.get("GRID_RAG_FLEET", os.path.join("data", "fleet", "transformers.csv")))
+    parser.add_argument("--pack", default=os.environ.get("GRID_RAG_PACK"))
+    parser.add_argument("--imports", nargs="*", default=IMPORTS, help="modules to time in fresh interpreters")
+    args = parser.parse_args(argv)
+
+    for module in args.imports:
+        print(json.dumps({"kind": "import", "name": module, "ms": time_import(module)}))
+    for row in time_components(args.corpus, args.index, args.fleet, args.pack):
+        print(json.dumps({key: row[key] for key in ("kind", "name", "ms")}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Local stand-in for the LLM generation endpoint.
+
+Speaks the same small protocol as ``grid_rag.generation``: ``POST /v1/generate``
+with ``{"prompt": ..., "max_tokens": ...}`` returns a chunked stream of
+newline-delimited JSON objects ``{"token": "..."}`` followed by
+``{"done": true}``. Connections are kept alive between requests.
+
+The "model" simply restates the retrieved context from the prompt, with a
+configurable time-to-first-token and per-token delay so latency behaviour can
+be exercised offline::
+
+    python -m grid_rag.stub_llm --port 8765 --first-token-ms 400 --token-ms 25
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import threading
+
+_CONTEXT_RE = re.compile(r"Context:\s*(.*?)\s*(?:Question:|$)", re.S)
+
+
+def stub_completion(prompt):
+    """Deterministic completion: the prompt's context, or an apology."""
+    match = _CONTEXT_RE.search(prompt)
+    text = match.group(1) if match else ""
+    return text or "I could not find a procedure for that request in the knowledge base."
+
+
+def _tokens(text):
+    # Whitespace-preserving word pieces, roughly how an LLM streams text
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class StubLLMServer:
+    def __init__(self, host="127.0.0.1", port=8765, first_token_ms=400, token_ms=25):
+        self.host = host
+        self.port = port
+        self.first_token_delay = first_token_ms / 1000
+        self.token_delay = token_ms / 1000
+        self.requests = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                if method != "POST" or path != "/v1/generate":
+                    writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+                    await writer.drain()
+                    continue
+                self.requests += 1
+                await self._generate(json.loads(body), writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _generate(self, request, writer):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        tokens = _tokens(stub_completion(request.get("prompt", "")))[: request.get("max_tokens", 256)]
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            self._write_chunk(writer, json.dumps({"token": token}) + "\n")
+            await writer.drain()
+        self._write_chunk(writer, json.dumps({"done": True}) + "\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer, text):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+def start_in_thread(**kwargs):
+    """Run a stub server on a daemon thread; returns the started server."""
+    server = StubLLMServer(**kwargs)
+    started = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="stub-llm", daemon=True).start()
+    started.wait()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline stub LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=25)
+    args = parser.parse_args(argv)
+    server = StubLLMServer(args.host, args.port, args.first_token_ms, args.token_ms)
+    print(f"Stub LLM listening on http://{args.host}:{args.port}/v1/generate")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
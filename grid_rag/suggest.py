@@ -0,0 +1,244 @@
+"""Typo-tolerant type-ahead suggestions over the procedure catalog.
+
+Entries are every catalog query plus the equipment names, ratings and model
+numbers found in them (345kV, SF6, SEL-421, SCADA, ...). Lookups go through
+the sorted vocabulary of distinct words and a character trie over it:
+
+* completed words match exactly, or within ``max_edits`` edits (optimal
+  string alignment, so a swapped pair of letters is one edit, with the first
+  letter as typed) when the word is not in the vocabulary;
+* the word being typed matches as a prefix, and as a prefix within the edit
+  bound when no vocabulary word starts with it.
+
+Matched words add their weight to every entry containing them through CSR
+postings into a dense score array, and the top ``k`` come from one
+``argpartition``. The most frequent ``TERM_BUDGET`` completions are used per
+word, so a one-letter prefix costs the same as a full word.
+"""
+
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from .text import STOPWORDS, words
+
+# Ratings, model numbers and acronyms worth suggesting on their own
+EQUIPMENT_RE = re.compile(
+    r"\b(?:\d+(?:\.\d+)?(?:kV|MVA|kVA|MW|V)|[A-Z]{2,}\d*(?:-\d+[A-Z]*)?|[A-Z][a-z]?\d+[A-Za-z0-9]*(?:-\d+)?)(?![\w-])"
+)
+
+TERM_BUDGET = 64
+EDIT_PENALTY = 0.3
+EQUIPMENT_PRIOR = 0.15
+LENGTH_PRIOR = 0.02
+_END = ""
+
+
+class Suggestion(NamedTuple):
+    text: str
+    kind: str
+    category: str
+    score: float
+
+
+def max_edits(word):
+    """Edit bound by word length: exact below 3 letters, then 1, then 2 from 6 letters."""
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) < 6 else 2
+
+
+def catalog_entries(corpus):
+    """``(text, kind, category)`` for every catalog query and the equipment terms in them."""
+    entries, equipment = [], {}
+    for category in corpus.categories():
+        for query in corpus.queries(category):
+            entries.append((query, "procedure", category))
+            for match in EQUIPMENT_RE.findall(query):
+                equipment.setdefault(match.lower(), (match, "equipment", category))
+    return entries + list(equipment.values())
+
+
+class Suggester:
+    def __init__(self, entries, word_cache=4096):
+        self.entries = list(entries)
+        vocab = {}
+        entry_ids, term_ids = array("i"), array("i")
+        lengths = np.empty(len(self.entries), dtype=np.float32)
+        for i, (text, _, _) in enumerate(self.entries):
+            entry_words = words(text)
+            lengths[i] = len(entry_words)
+            # "SEL-421" is also found as "sel 421"
+            parts = {part for word in entry_words if "-" in word for part in word.split("-") if part}
+            for word in set(entry_words) | parts:
+                entry_ids.append(i)
+                term_ids.append(vocab.setdefault(word, len(vocab)))
+
+        # Term ids follow sorted order so a prefix is one contiguous id range
+        self.terms = sorted(vocab)
+        remap = np.empty(len(vocab), dtype=np.int32)
+        remap[[vocab[term] for term in self.terms]] = np.arange(len(self.terms), dtype=np.int32)
+        term_ids = remap[np.frombuffer(term_ids, dtype=np.int32)]
+        order = np.argsort(term_ids, kind="stable")
+        self._postings = np.frombuffer(entry_ids, dtype=np.int32)[order]
+        self._indptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.terms)), out=self._indptr[1:])
+        self._df = np.diff(self._indptr)
+
+        kinds = np.array([kind == "equipment" for _, kind, _ in self.entries], dtype=bool)
+        self._prior = np.where(kinds, EQUIPMENT_PRIOR, 0.0).astype(np.float32) - LENGTH_PRIOR * lengths
+
+        self._trie = {}
+        for term_id, term in enumerate(self.terms):
+            node = self._trie
+            for char in term:
+                node = node.setdefault(char, {})
+            node[_END] = term_id
+        # Every keystroke re-submits the words before the cursor
+        self._word_terms = lru_cache(maxsize=word_cache)(self._match_word)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        return cls(catalog_entries(corpus))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _prefix_range(self, prefix):
+        return bisect_left(self.terms, prefix), bisect_left(self.terms, prefix + "\uffff")
+
+    def _walk(self, word, bound, prefix):
+        """Trie paths within ``bound`` edits of ``word``: ``{path: edits}``.
+
+        With ``prefix`` the distance is between ``word`` and the path itself
+        (the term may continue); otherwise only whole terms are returned.
+        A path is only kept if it is closer than every path above it. The
+        first letter must match.
+        """
+        found = {}
+        root = self._trie.get(word[0])
+        if root is None:
+            return found
+        # The first letter is taken as typed: it is rarely the mistyped one and anchoring
+        # there confines the walk to one subtree of the trie
+        stack = [(word[0], root, word[0], list(range(len(word) + 1)), None, "", bound + 1)]
+        while stack:
+            char, node, path, above, above2, above_char, best = stack.pop()
+            row = [above[0] + 1]
+            for j in range(1, len(word) + 1):
+                cost = word[j - 1] != char
+                distance = min(row[j - 1] + 1, above[j] + 1, above[j - 1] + cost)
+                if above2 is not None and j > 1 and word[j - 1] == above_char and word[j - 2] == char:
+                    distance = min(distance, above2[j - 2] + 1)
+                row.append(distance)
+            if prefix:
+                if row[-1] < best:
+                    found[path] = best = row[-1]
+            elif _END in node and row[-1] <= bound:
+                found[path] = row[-1]
+            if min(row) <= bound:
+                stack.extend(
+                    (next_char, child, path + next_char, row, above, char, best)
+                    for next_char, child in node.items() if next_char
+                )
+        return found
+
+    def _top_terms(self, lo, hi, limit):
+        if hi - lo <= limit:
+            return range(lo, hi)
+        return (lo + np.argpartition(-self._df[lo:hi], limit)[:limit]).tolist()
+
+    def _match_word(self, word, partial):
+        """``{term_id: weight}`` for one typed word."""
+        terms = {}
+        if partial:
+            lo, hi = self._prefix_range(word)
+            for term_id in self._top_terms(lo, hi, TERM_BUDGET):
+                terms[term_id] = 0.6 + 0.4 * len(word) / len(self.terms[term_id])
+        else:
+            term_id = bisect_left(self.terms, word)
+            if term_id < len(self.terms) and self.terms[term_id] == word:
+                terms[term_id] = 1.0
+        # Typos are only looked for when nothing in the vocabulary matches as typed
+        if terms or not max_edits(word):
+            return terms
+
+        matches = self._walk(word, max_edits(word), partial)
+        for path, edits in sorted(matches.items(), key=lambda item: item[1]):
+            penalty = 1.0 - EDIT_PENALTY * edits
+            if partial:
+                lo, hi = self._prefix_range(path)
+                for term_id in self._top_terms(lo, hi, TERM_BUDGET):
+                    weight = penalty * (0.6 + 0.4 * len(path) / len(self.terms[term_id]))
+                    if weight > terms.get(term_id, 0.0):
+                        terms[term_id] = weight
+            else:
+                term_id = bisect_left(self.terms, path)
+                terms[term_id] = max(terms.get(term_id, 0.0), penalty)
+            if len(terms) >= TERM_BUDGET:
+                break
+        return terms
+
+    def suggest(self, text, k=8):
+        """Top ``k`` suggestions for what has been typed so far, best first."""
+        typed = words(text)
+        if not typed:
+            return []
+        partial = not text[-1].isspace()
+        relevance = np.zeros(len(self.entries), dtype=np.float32)
+        for i, word in enumerate(typed):
+            last = partial and i == len(typed) - 1
+            if word in STOPWORDS and not last:
+                continue
+            terms = self._word_terms(word, last)
+            if len(terms) == 1:
+                (term_id, weight), = terms.items()
+                relevance[self._postings[self._indptr[term_id]:self._indptr[term_id + 1]]] += weight
+                continue
+            # An entry counts a word once, at its best-matching term
+            word_scores = np.zeros(len(self.entries), dtype=np.float32)
+            for term_id, weight in terms.items():
+                ids = self._postings[self._indptr[term_id]:self._indptr[term_id + 1]]
+                word_scores[ids] = np.maximum(word_scores[ids], weight)
+            relevance += word_scores
+
+        candidates = np.flatnonzero(relevance)
+        if not len(candidates):
+            return []
+        scores = relevance[candidates] + self._prior[candidates]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        return [
+            Suggestion(*self.entries[candidates[i]], round(float(scores[i]), 3))
+            for i in order
+        ]
+
+
+class CatalogSuggester:
+    """``Suggester`` for a corpus, built on first use."""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self._suggester = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._suggester is not None
+
+    def get(self):
+        if self._suggester is None:
+            with self._lock:
+                if self._suggester is None:
+                    self._suggester = Suggester.from_corpus(self.corpus)
+        return self._suggester
+
+    def suggest(self, text, k=8):
+        return self.get().suggest(text, k)
@@ -0,0 +1,50 @@
+"""Tokenization shared by the lexical and dense retrieval components."""
+
+import re
+
+# Keep ratings ("345kv"), standards ("c57.104") and model numbers ("sel-421") whole
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+# "345 kV" and "345kV" should index the same way
+_UNIT_RE = re.compile(r"(\d)\s+(kv|mva|kva|mw|kw|ppm|cal)\b")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from how i in is it of on or per the to what when
+where which with during after before into my our this that these those do does
+""".split())
+
+
+def stem(token):
+    """Very light suffix stripping so plurals and -ing/-ed forms match."""
+    if len(token) <= 4 or not token.isalpha():
+        return token
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", "e"), ("s", "")):
+        if token.endswith(suffix) and not token.endswith("ss"):
+            stemmed = token[: -len(suffix)] + replacement
+            if len(stemmed) >= 3:
+                return stemmed
+    return token
+
+
+def tokenize(text):
+    """Split text into normalized search terms."""
+    text = _UNIT_RE.sub(r"\1\2", text.lower())
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        if token in STOPWORDS:
+            continue
+        terms.append(stem(token))
+        if "-" in token:
+            terms.extend(stem(part) for part in token.split("-") if part and part not in STOPWORDS)
+    return terms
+
+
+def words(text):
+    """Lower-cased, unit-folded tokens without stemming or stopword removal (for prefix matching)."""
+    return _TOKEN_RE.findall(_UNIT_RE.sub(r"\1\2", text.lower()))
+
+
+def normalize_query(text):
+    """Canonical form of a query for cache keys: case, spacing and unit spacing folded."""
+    text = _UNIT_RE.sub(r"\1\2", " ".join(text.lower().split()))
+    return text.strip(" ?!.")
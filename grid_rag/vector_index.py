@@ -0,0 +1,319 @@
+"""Dense embedding index stored as memory-mapped ``.npy`` files.
+
+Layout of an index directory::
+
+    meta.json          embedder name/dim, dtype, corpus fingerprint
+    vectors.npy        (n, dim) float32 or float16, L2-normalized rows
+    keys.npy           (n,) document keys
+    ivf_centroids.npy  optional (n_lists, dim) cluster centroids
+    ivf_ids.npy        optional doc ids grouped by cluster
+    ivf_offsets.npy    optional (n_lists + 1,) offsets into ivf_ids
+
+Everything is opened with ``mmap_mode="r"`` so several Streamlit worker
+processes share the same page-cache copy of a large index.
+
+The index directory is a symlink to a versioned sibling
+(``<directory>.v-<pid>-<ns>``). Publishing a new index swaps the symlink
+atomically, and superseded versions are only deleted once they are older than
+``PRUNE_AFTER`` seconds, so workers that are still opening or serving an
+earlier version never have it removed under them.
+"""
+
+import json
+import os
+import shutil
+import time
+import zlib
+from array import array
+
+import numpy as np
+
+from .documents import document_text
+from .retrieval import Hit
+from .text import tokenize
+
+PRUNE_AFTER = 300.0
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder using signed feature hashing.
+
+    Word terms and character trigrams are hashed into ``dim`` buckets, so
+    paraphrases and small typos still land near each other.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim=384, trigram_weight=0.5):
+        self.dim = dim
+        self.trigram_weight = trigram_weight
+
+    def _features(self, text):
+        for term in tokenize(text):
+            yield term, 1.0
+            padded = f"#{term}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], self.trigram_weight
+
+    def embed(self, texts):
+        rows, hashes, weights = array("i"), array("I"), array("f")
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                rows.append(row)
+                hashes.append(zlib.crc32(feature.encode("utf-8")))
+                weights.append(weight)
+        hashes = np.frombuffer(hashes, dtype=np.uint32)
+        signed = np.where(hashes & 0x80000000, 1.0, -1.0) * np.frombuffer(weights, dtype=np.float32)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.frombuffer(rows, dtype=np.int32), hashes % self.dim), signed.astype(np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+# Embedders that can be reconstructed from an index's meta.json
+EMBEDDERS = {HashingEmbedder.name: HashingEmbedder}
+
+
+def register_embedder(name, factory):
+    """Make a custom embedder available to ``VectorIndex.load``."""
+    EMBEDDERS[name] = factory
+
+
+def _publish(version, directory):
+    """Point the ``directory`` symlink at ``version`` and prune superseded versions."""
+    link = f"{directory}.link-{os.getpid()}"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    previous = os.path.realpath(directory) if os.path.islink(directory) else None
+    if os.path.isdir(directory) and previous is None:
+        # An index written before versioned directories; move it aside so it can be pruned like one
+        previous = f"{directory}.v-0-{time.time_ns()}"
+        os.replace(directory, previous)
+    os.replace(link, directory)
+    if previous and os.path.isdir(previous):
+        # Superseded now, so its grace period starts now
+        os.utime(previous)
+    _prune(directory)
+
+
+def _pid_alive(pid):
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _prune(directory, max_age=PRUNE_AFTER):
+    """Delete versions of ``directory`` superseded more than ``max_age`` seconds ago.
+
+    Versions without ``meta.json`` are still being written and are only
+    removed once the process writing them has gone.
+    """
+    parent, name = os.path.split(directory)
+    current = os.path.realpath(directory)
+    cutoff = time.time() - max_age
+    for entry in os.scandir(parent or "."):
+        if not entry.name.startswith(f"{name}.v-") or os.path.realpath(entry.path) == current:
+            continue
+        try:
+            if os.path.exists(os.path.join(entry.path, "meta.json")):
+                expired = entry.stat(follow_symlinks=False).st_mtime < cutoff
+            else:
+                expired = not _pid_alive(int(entry.name[len(name) + 3:].split("-")[0]))
+        except (OSError, ValueError):
+            continue
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _top_k(scores, k):
+    """Indices of the ``k`` largest scores along the last axis, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(top, order, axis=-1)
+
+
+def _kmeans(vectors, n_lists, iterations=10, sample_size=50_000, seed=0):
+    """Spherical k-means on a sample of the (normalized) vectors."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = np.sort(rng.choice(n, size=min(n, sample_size), replace=False))
+    data = np.asarray(vectors[sample], dtype=np.float32)
+    centroids = data[rng.choice(len(data), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        np.divide(centroids, norms, out=centroids, where=norms > 0)
+    return centroids
+
+
+class VectorIndex:
+    def __init__(self, vectors, keys, embedder, meta=None, centroids=None, ivf_ids=None, ivf_offsets=None):
+        self.vectors = vectors
+        self.keys = keys
+        self.embedder = embedder
+        self.meta = meta or {}
+        self.centroids = centroids
+        self.ivf_ids = ivf_ids
+        self.ivf_offsets = ivf_offsets
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, "meta.json"))
+
+    @classmethod
+    def build(cls, documents, directory, embedder=None, key="title", dtype="float32",
+              n_lists=0, batch_size=1024, fingerprint=None):
+        """Embed ``documents`` in batches straight into ``directory`` and open it."""
+        embedder = embedder or HashingEmbedder()
+        documents = list(documents)
+
+        def batches():
+            for start in range(0, len(documents), batch_size):
+                batch = documents[start:start + batch_size]
+                yield embedder.embed([document_text(d) for d in batch])
+
+        return cls.write(directory, [d[key] for d in documents], batches(), embedder,
+                         dtype=dtype, n_lists=n_lists, fingerprint=fingerprint)
+
+    @classmethod
+    def from_documents(cls, documents, embedder=None, key="title"):
+        """Unpersisted index over a handful of documents (e.g. a change segment), searched exactly."""
+        embedder = embedder or HashingEmbedder()
+        documents = list(documents)
+        return cls(embedder.embed([document_text(d) for d in documents]), np.array([d[key] for d in documents]), embedder)
+
+    @classmethod
+    def write(cls, directory, keys, batches, embedder, dtype="float32", n_lists=0, fingerprint=None):
+        """Write precomputed vector ``batches`` (in key order) as an index and open it.
+
+        The index is written to a new version directory and published by
+        swapping the ``directory`` symlink, so concurrent builders never expose
+        a half-written index nor delete one another process is using.
+        """
+        directory = os.path.abspath(directory)
+        staging = f"{directory}.v-{os.getpid()}-{time.time_ns()}"
+        os.makedirs(staging)
+
+        vectors = np.lib.format.open_memmap(
+            os.path.join(staging, "vectors.npy"), mode="w+", dtype=dtype, shape=(len(keys), embedder.dim)
+        )
+        start = 0
+        for batch in batches:
+            vectors[start:start + len(batch)] = batch
+            start += len(batch)
+        vectors.flush()
+        np.save(os.path.join(staging, "keys.npy"), np.array(keys))
+
+        n_lists = min(n_lists, len(keys))
+        if n_lists > 1:
+            centroids = _kmeans(vectors, n_lists)
+            assign = np.concatenate([
+                np.argmax(np.asarray(vectors[s:s + 65536], dtype=np.float32) @ centroids.T, axis=1)
+                for s in range(0, len(keys), 65536)
+            ])
+            ivf_ids = np.argsort(assign, kind="stable").astype(np.int64)
+            ivf_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assign, minlength=n_lists), out=ivf_offsets[1:])
+            np.save(os.path.join(staging, "ivf_centroids.npy"), centroids)
+            np.save(os.path.join(staging, "ivf_ids.npy"), ivf_ids)
+            np.save(os.path.join(staging, "ivf_offsets.npy"), ivf_offsets)
+        del vectors
+
+        meta = {
+            "embedder": embedder.name,
+            "dim": embedder.dim,
+            "dtype": str(np.dtype(dtype)),
+            "count": len(keys),
+            "n_lists": n_lists if n_lists > 1 else 0,
+            "fingerprint": fingerprint,
+        }
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        _publish(staging, directory)
+        return cls.load(staging, embedder=embedder)
+
+    @classmethod
+    def load(cls, directory, embedder=None, mmap=True):
+        # Resolve the symlink once so every file comes from the same published version
+        directory = os.path.realpath(directory)
+        mode = "r" if mmap else None
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if embedder is None:
+            embedder = EMBEDDERS[meta["embedder"]](dim=meta["dim"])
+        ivf = {}
+        if meta.get("n_lists"):
+            ivf = {
+                "centroids": np.load(os.path.join(directory, "ivf_centroids.npy")),
+                "ivf_ids": np.load(os.path.join(directory, "ivf_ids.npy"), mmap_mode=mode),
+                "ivf_offsets": np.load(os.path.join(directory, "ivf_offsets.npy")),
+            }
+        return cls(
+            np.load(os.path.join(directory, "vectors.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, "keys.npy"), mmap_mode=mode),
+            embedder,
+            meta=meta,
+            **ivf,
+        )
+
+    def _hits(self, ids, scores):
+        return [Hit(int(i), str(self.keys[i]), float(s)) for i, s in zip(ids, scores)]
+
+    def search(self, query, k=5, nprobe=None):
+        return self.search_batch([query], k=k, nprobe=nprobe)[0]
+
+    def search_batch(self, queries, k=5, nprobe=None, block_rows=65536):
+        """Cosine top-k for a batch of query strings.
+
+        Uses the IVF lists when the index has them and ``nprobe`` is not 0,
+        otherwise a blocked exact matrix product over all vectors.
+        """
+        q = self.embedder.embed(list(queries))
+        if self.centroids is not None and nprobe != 0:
+            return [self._search_ivf(row, k, nprobe or 8) for row in q]
+
+        best_ids = np.empty((len(q), 0), dtype=np.int64)
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        for start in range(0, len(self.keys), block_rows):
+            block = np.asarray(self.vectors[start:start + block_rows], dtype=np.float32)
+            scores = q @ block.T
+            top = _top_k(scores, k)
+            best_ids = np.concatenate([best_ids, top + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            keep = _top_k(best_scores, k)
+            best_ids = np.take_along_axis(best_ids, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        return [self._hits(ids, scores) for ids, scores in zip(best_ids, best_scores)]
+
+    def _search_ivf(self, q, k, nprobe):
+        lists = _top_k(self.centroids @ q, nprobe)
+        ids = np.concatenate([self.ivf_ids[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in lists])
+        if not len(ids):
+            return []
+        ids.sort()  # sequential reads from the memory map
+        scores = np.asarray(self.vectors[ids], dtype=np.float32) @ q
+        top = _top_k(scores, k)
+        return self._hits(ids[top], scores[top])
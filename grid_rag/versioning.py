@@ -0,0 +1,626 @@
+"""Versioned corpus updates: append-only change segments over the base corpus.
+
+Usage::
+
+    python -m grid_rag.versioning put --corpus data/corpus --category "🚨 Emergency Procedures" revised.json
+    python -m grid_rag.versioning delete --corpus data/corpus "Obsolete procedure title"
+    python -m grid_rag.versioning status --corpus data/corpus
+    python -m grid_rag.versioning compact --corpus data/corpus --index .grid_index
+
+A change ``put``s a procedure record (replacing any record with the same
+``query`` title, in any category) or ``delete``s one by title. Each batch of
+changes is written as the next numbered JSONL segment under ``_changes/`` in
+the corpus directory, via a temporary file that is hard-linked into place, so
+readers see whole segments or none. The category files are not touched.
+
+``ServingSnapshots`` serves a corpus directory as a series of immutable
+``AnswerService`` snapshots. A new snapshot reuses the base indexes, masks the
+titles the changes touch and adds a delta segment over just the changed
+records (BM25 scored with the base collection statistics, plus their
+embeddings), so segments go live within a poll interval without a rebuild.
+The snapshot is swapped in with one reference assignment; queries already
+running finish on the snapshot they started with. Snapshot versions are
+``<base version>@<sequence>``, and the answer cache is keyed on them.
+
+Once the changes reach ``merge_threshold`` records a background merge folds
+the segments into the category files and rebuilds the index artifact; the
+next poll then opens the merged base. ``compact`` does the same on demand.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+from .analytics import RISK_LEVELS
+from .corpus import CorpusStore, corpus_version, entry_files, load_manifest, read_records, record_document
+from .service import AnswerService
+from .vector_index import VectorIndex
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+CHANGES_DIR = "_changes"
+COMPACTED = "compacted"
+UPDATES_SHARD = "_updates.jsonl"
+# Extra base hits fetched per query to make up for masked titles
+MASK_OVERFETCH = 256
+# Fields every answerable record needs, and their types; the renderer and the app index them directly
+RESPONSE_FIELDS = {
+    "answer": str,
+    "risk_level": str,
+    "steps": list,
+    "contacts": list,
+    "completion_time": str,
+    "personnel": str,
+    "confidence": (int, float),
+    "sources": list,
+}
+
+
+class ChangeLogError(RuntimeError):
+    pass
+
+
+def validate(change):
+    """Raise ``ValueError`` unless ``change`` is a well-formed put or delete."""
+    op = change.get("op")
+    if op == "put":
+        record = change.get("record")
+        if not isinstance(record, dict) or not isinstance(record.get("query"), str) or not record["query"].strip():
+            raise ValueError("put needs a record with a non-empty 'query' title")
+        if not isinstance(change.get("category"), str) or not change["category"]:
+            raise ValueError(f"put of {record['query']!r} needs a category")
+        if "answer" in record:
+            validate_response(record)
+    elif op == "delete":
+        if not isinstance(change.get("query"), str) or not change["query"]:
+            raise ValueError("delete needs the 'query' title to remove")
+    else:
+        raise ValueError(f"unknown change op {op!r}")
+    return change
+
+
+def validate_response(record):
+    """Raise ``ValueError`` unless an answerable record has every response field, correctly typed.
+
+    Records without an ``answer`` are catalog entries and only need a title.
+    """
+    title = record["query"]
+    for field, kind in RESPONSE_FIELDS.items():
+        value = record.get(field)
+        if not isinstance(value, kind) or isinstance(value, bool):
+            raise ValueError(f"{title!r}: {field!r} is missing or not a {getattr(kind, '__name__', 'number')}")
+        if kind is list and not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{title!r}: {field!r} must be a list of strings")
+    if not record["answer"].strip():
+        raise ValueError(f"{title!r}: 'answer' is empty")
+    if record["risk_level"] not in RISK_LEVELS:
+        raise ValueError(f"{title!r}: risk_level must be one of {', '.join(RISK_LEVELS)}")
+
+
+def title_of(change):
+    return change["record"]["query"] if change["op"] == "put" else change["query"]
+
+
+class ChangeLog:
+    def __init__(self, corpus_dir):
+        self.corpus_dir = corpus_dir
+        self.directory = os.path.join(corpus_dir, CHANGES_DIR)
+
+    def sequences(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-6]) for name in names if name.endswith(".jsonl") and name[:-6].isdigit())
+
+    def compacted(self):
+        """Sequence number the category files already include."""
+        try:
+            with open(os.path.join(self.directory, COMPACTED)) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def head(self):
+        sequences = self.sequences()
+        return max(sequences[-1] if sequences else 0, self.compacted())
+
+    def _path(self, seq):
+        return os.path.join(self.directory, f"{seq:010d}.jsonl")
+
+    def append(self, changes):
+        """Write ``changes`` as the next segment; returns its sequence number."""
+        changes = [validate(change) for change in changes]
+        if not changes:
+            raise ValueError("no changes to append")
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".segment.tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for change in changes:
+                f.write(json.dumps(change, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            seq = self.head() + 1
+            while True:
+                try:
+                    # Linking fails if another writer took this number, so no lock is needed
+                    os.link(tmp_path, self._path(seq))
+                    return seq
+                except FileExistsError:
+                    seq += 1
+        finally:
+            os.remove(tmp_path)
+
+    def read(self, after=0, through=None):
+        """``(seq, changes)`` for each segment after ``after``, in order.
+
+        Raises ``ChangeLogError`` if segments in the range were compacted away
+        meanwhile; the caller should reopen the base corpus first.
+        """
+        segments = []
+        expected = after + 1
+        for seq in self.sequences():
+            if seq <= after or (through is not None and seq > through):
+                continue
+            if seq != expected:
+                raise ChangeLogError(f"change segments {expected}..{seq - 1} were compacted")
+            try:
+                segments.append((seq, read_records(self._path(seq))))
+            except FileNotFoundError:
+                raise ChangeLogError(f"change segment {seq} was compacted") from None
+            expected += 1
+        return segments
+
+    @contextmanager
+    def locked(self):
+        """Hold the compaction lock if no other process does; yields whether it was acquired."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as f:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def mark_compacted(self, through):
+        tmp_path = os.path.join(self.directory, f".{COMPACTED}.tmp-{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            f.write(str(through))
+        os.replace(tmp_path, os.path.join(self.directory, COMPACTED))
+        for seq in self.sequences():
+            if seq <= through:
+                os.remove(self._path(seq))
+
+
+def fold(segments, overlay=None):
+    """Latest change per title across ``segments``: ``{title: change}``, later segments winning."""
+    overlay = dict(overlay or {})
+    for _, changes in segments:
+        for change in changes:
+            title = title_of(change)
+            # Re-inserting keeps the dict in the order titles last changed
+            overlay.pop(title, None)
+            overlay[title] = change
+    return overlay
+
+
+class LayeredResponses(Mapping):
+    """Base responses with changed titles replaced or removed, without copying the base."""
+
+    def __init__(self, base, puts, changed):
+        self._base = base
+        self._puts = puts
+        self._changed = changed
+        self._len = None
+
+    def __getitem__(self, title):
+        if title in self._changed:
+            return self._puts[title]
+        return self._base[title]
+
+    def __iter__(self):
+        for title in self._base:
+            if title not in self._changed:
+                yield title
+        yield from self._puts
+
+    def __len__(self):
+        if self._len is None:
+            self._len = len(self._base) - sum(1 for title in self._changed if title in self._base) + len(self._puts)
+        return self._len
+
+
+class LayeredCorpus:
+    """A corpus (``CorpusStore`` interface) with an overlay of changes applied."""
+
+    def __init__(self, base, overlay, seq):
+        self.base = base
+        self.directory = base.directory
+        self.overlay = overlay
+        self.seq = seq
+        self.version = f"{base.version}@{seq}"
+        self.changed = frozenset(overlay)
+        self._puts = {}
+        for title, change in overlay.items():
+            if change["op"] == "put":
+                self._puts.setdefault(change["category"], []).append(change["record"])
+        self._categories = base.categories() + [c for c in self._puts if c not in base.categories()]
+        self._records = {}
+        self._responses = None
+        self._lock = threading.Lock()
+
+    def categories(self):
+        return list(self._categories)
+
+    def records(self, category):
+        records = self._records.get(category)
+        if records is None:
+            with self._lock:
+                records = self._records.get(category)
+                if records is None:
+                    base = self.base.records(category) if category in self.base.categories() else []
+                    records = [r for r in base if r["query"] not in self.changed] + self._puts.get(category, [])
+                    self._records[category] = records
+        return records
+
+    def queries(self, category):
+        return [record["query"] for record in self.records(category)]
+
+    def delta_documents(self):
+        """Search documents for the answerable records the changes put."""
+        for category, records in self._puts.items():
+            for record in records:
+                if record.get("answer"):
+                    yield record_document(record, category)
+
+    def documents(self):
+        for category in self._categories:
+            for record in self.records(category):
+                if record.get("answer"):
+                    yield record_document(record, category)
+
+    def responses(self):
+        if self._responses is None:
+            puts = {document["title"]: document for document in self.delta_documents()}
+            self._responses = LayeredResponses(self.base.responses(), puts, self.changed)
+        return self._responses
+
+    def response(self, title):
+        return self.responses().get(title)
+
+
+class LayeredIndex:
+    """A base index with ``masked`` keys hidden plus a delta index, searched as one ranking."""
+
+    def __init__(self, base, delta, masked, size):
+        self.base = base
+        self.delta = delta
+        self.masked = masked
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def vocab(self):
+        return self.base.vocab
+
+    @property
+    def nbytes(self):
+        return self.base.nbytes + self.delta.nbytes
+
+    def search(self, query, k=5):
+        hits = self.base.search(query, k + min(len(self.masked), MASK_OVERFETCH))
+        hits = [hit for hit in hits if hit.key not in self.masked] + self.delta.search(query, k)
+        hits.sort(key=lambda hit: -hit.score)
+        return hits[:k]
+
+
+def layered_service(base, overlay, seq, previous=None):
+    """Snapshot of ``base`` (an ``AnswerService`` over the category files) with ``overlay`` applied.
+
+    ``previous`` is the snapshot being replaced; its type-ahead index is kept
+    when the catalog titles did not change.
+    """
+    corpus = LayeredCorpus(base.corpus, overlay, seq)
+    documents = list(corpus.delta_documents())
+    size = len(corpus.responses())
+    retriever = LayeredIndex(base.retriever, base.retriever.delta(documents), corpus.changed, size)
+    vector_index = None
+    if base.vector_index is not None:
+        delta = VectorIndex.from_documents(documents, base.vector_index.embedder)
+        vector_index = LayeredIndex(base.vector_index, delta, corpus.changed, size)
+    service = AnswerService(
+        corpus,
+        base.index_dir,
+        cache=base.cache,
+        recorder=base.recorder,
+        fleet=base.fleet,
+        retriever=retriever,
+        vector_index=vector_index,
+    )
+    if previous is not None and _same_catalog(previous.corpus, overlay, getattr(previous.corpus, "overlay", {})):
+        service.suggester = previous.suggester
+    return service
+
+
+def _same_catalog(corpus, overlay, previous_overlay):
+    """True when every change since ``previous_overlay`` rewrote an answerable title in place."""
+    for title, change in overlay.items():
+        if previous_overlay.get(title) is change:
+            continue
+        if change["op"] != "put":
+            return False
+        response = corpus.response(title)
+        if response is None or response["category"] != change["category"]:
+            return False
+    return True
+
+
+def layered_corpus(corpus_dir):
+    """The corpus directory with its pending change segments applied (no indexes)."""
+    log = ChangeLog(corpus_dir)
+    for attempt in range(3):
+        base = CorpusStore(corpus_dir)
+        try:
+            segments = log.read(after=log.compacted())
+            break
+        except ChangeLogError:
+            # Compacted while we read: the category files now hold those changes
+            if attempt == 2:
+                raise
+    if not segments:
+        return base
+    return LayeredCorpus(base, fold(segments), segments[-1][0])
+
+
+class ServingSnapshots:
+    """Current ``AnswerService`` snapshot of a corpus directory, kept up to date in the background.
+
+    Extra keyword arguments (``cache``, ``recorder``, ``fleet``) are passed to
+    every ``AnswerService``. ``merge_threshold=0`` leaves compaction to the CLI.
+    """
+
+    def __init__(self, corpus_dir, index_dir=None, merge_threshold=1000, **service_kwargs):
+        self.corpus_dir = corpus_dir
+        self.index_dir = index_dir
+        self.merge_threshold = merge_threshold
+        self.service_kwargs = service_kwargs
+        self.log = ChangeLog(corpus_dir)
+        # Last segment known to be folded into the category files the base was opened from
+        self.base_seq = self.log.compacted()
+        self.base = AnswerService.open(corpus_dir, index_dir, **service_kwargs)
+        self.current = self.base
+        self.seq = self.base_seq
+        self.overlay = {}
+        self.merges = 0
+        self.errors = 0
+        self.last_error = None
+        self._merging = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.refresh()
+
+    def get(self):
+        return self.current
+
+    def refresh(self):
+        """Pick up a new base or new change segments; returns the serving snapshot."""
+        with self._lock:
+            # Read before the version check: a merge rewrites the category files before marking them compacted
+            compacted = self.log.compacted()
+            seq, overlay, current = self.seq, self.overlay, self.current
+            if corpus_version(self.corpus_dir) != self.base.version:
+                # Category files changed (a merge or an edit): reopen, then replay what is not folded in
+                self.base = AnswerService.open(self.corpus_dir, self.index_dir, **self.service_kwargs)
+                self.base_seq = compacted
+                seq, overlay, current = compacted, {}, self.base
+            elif compacted > self.base_seq:
+                # The base was opened mid-merge and already holds these segments; drop them from the overlay
+                self.base_seq = compacted
+                seq, overlay, current = compacted, {}, self.base
+            try:
+                segments = self.log.read(after=seq)
+            except ChangeLogError:
+                # A merge is rewriting the category files; the next refresh reopens the base
+                segments = []
+            if segments:
+                overlay = fold(segments, overlay)
+                seq = segments[-1][0]
+                current = layered_service(self.base, overlay, seq, previous=current)
+            self.seq, self.overlay, self.current = seq, overlay, current
+            if self.merge_threshold and len(self.overlay) >= self.merge_threshold and self._merging is None:
+                self._merging = threading.Thread(target=self._merge, name="corpus-merge", daemon=True)
+                self._merging.start()
+            return self.current
+
+    def _failed(self, exc):
+        self.errors += 1
+        self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def _merge(self):
+        through = None
+        try:
+            # One process: forking a pool from this thread of a multithreaded server is not safe
+            through = compact(self.corpus_dir, self.index_dir, workers=1)
+        except Exception as exc:
+            self._failed(exc)
+        finally:
+            self._merging = None
+        # None: another process is compacting, and its merge shows up as a new base on a later poll
+        if through is not None:
+            self.merges += 1
+            self.refresh()
+
+    def start(self, interval=1.0):
+        """Refresh every ``interval`` seconds on a daemon thread; returns self."""
+        def poll():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as exc:
+                    # A half-written category file or a bad change record; keep serving and try again next interval
+                    self._failed(exc)
+
+        threading.Thread(target=poll, name="corpus-snapshots", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "version": self.current.version,
+            "base_version": self.base.version,
+            "sequence": self.seq,
+            "pending_changes": len(self.overlay),
+            "merging": self._merging is not None,
+            "merges": self.merges,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+def _write_records(path, records):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def compact(corpus_dir, index_dir=None, workers=None):
+    """Fold every change segment into the category files, then rebuild the index artifact.
+
+    Returns the last sequence number folded in, or None if another process is
+    compacting. Records are removed from whichever file holds them; puts are
+    appended to their category's file (``_updates.jsonl`` for shard
+    directories), and new categories get a file and a manifest entry.
+    """
+    from .build import build
+    from .ingest import slugify
+
+    log = ChangeLog(corpus_dir)
+    with log.locked() as acquired:
+        if not acquired:
+            return None
+        after = log.compacted()
+        segments = log.read(after=after)
+        if not segments:
+            return after
+        overlay = fold(segments)
+        puts = {}
+        for change in overlay.values():
+            if change["op"] == "put":
+                puts.setdefault(change["category"], []).append(change["record"])
+
+        manifest = load_manifest(corpus_dir)
+        names = {entry["name"] for entry in manifest["categories"]}
+        for category in puts:
+            if category not in names:
+                name = f"{slugify(category)}.jsonl"
+                _write_records(os.path.join(corpus_dir, name), [])
+                manifest["categories"].append({"name": category, "file": name})
+        for entry in manifest["categories"]:
+            added = puts.get(entry["name"], [])
+            paths = entry_files(corpus_dir, entry)
+            if "dir" in entry and added:
+                updates = os.path.join(corpus_dir, entry["dir"], UPDATES_SHARD)
+                if updates not in paths:
+                    os.makedirs(os.path.dirname(updates), exist_ok=True)
+                    _write_records(updates, [])
+                    paths.append(updates)
+            for path in paths:
+                records = read_records(path)
+                kept = [record for record in records if record["query"] not in overlay]
+                if "file" in entry or path.endswith(UPDATES_SHARD):
+                    kept += added
+                if kept != records:
+                    _write_records(path, kept)
+
+        manifest_path = os.path.join(corpus_dir, "manifest.json")
+        tmp_path = f"{manifest_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+        through = segments[-1][0]
+        log.mark_compacted(through)
+    if index_dir:
+        build(corpus_dir, index_dir, workers)
+    return through
+
+
+def _read_changes(path, category):
+    """Records (one JSON object or JSONL) from ``path`` as put changes."""
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        text = f.read().strip()
+    try:
+        data = json.loads(text)
+        records = data if isinstance(data, list) else [data]
+    except json.JSONDecodeError:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [{"op": "put", "category": record.pop("category", category), "record": record} for record in records]
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--corpus", default=os.environ.get("GRID_RAG_CORPUS_DIR", os.path.join("data", "corpus")))
+    parser = argparse.ArgumentParser(description="Versioned updates to the procedure corpus.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    put = commands.add_parser(
+        "put", parents=[common], help="add or replace procedures (JSON object, list or JSONL; '-' for stdin)"
+    )
+    put.add_argument("records")
+    put.add_argument("--category", help="category for records without a 'category' field")
+    delete = commands.add_parser("delete", parents=[common], help="remove procedures by title")
+    delete.add_argument("titles", nargs="+")
+    commands.add_parser("status", parents=[common], help="show pending change segments")
+    compact_cmd = commands.add_parser("compact", parents=[common], help="fold change segments into the category files")
+    compact_cmd.add_argument("--index", help="also rebuild the index artifact in this directory")
+    compact_cmd.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    log = ChangeLog(args.corpus)
+    if args.command == "put":
+        try:
+            seq = log.append(_read_changes(args.records, args.category))
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(f"Wrote change segment {seq}")
+    elif args.command == "delete":
+        seq = log.append({"op": "delete", "query": title} for title in args.titles)
+        print(f"Wrote change segment {seq}")
+    elif args.command == "status":
+        segments = log.read(after=log.compacted())
+        overlay = fold(segments)
+        print(f"Compacted through segment {log.compacted()}; {len(segments)} pending segment(s), {len(overlay)} changed title(s)")
+        for title, change in overlay.items():
+            print(f"  {change['op']:<6} {title}")
+    else:
+        through = compact(args.corpus, args.index, args.workers)
+        if through is None:
+            print("Another process is compacting", file=sys.stderr)
+            return 1
+        print(f"Compacted through segment {through}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+import json
+import os
+import shutil
+
+import pytest
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "corpus")
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    """Writable copy of the bundled corpus."""
+    path = tmp_path / "corpus"
+    shutil.copytree(CORPUS, path)
+    return str(path)
+
+
+@pytest.fixture
+def procedure():
+    """First answerable procedure record of the bundled corpus."""
+    with open(os.path.join(CORPUS, "emergency_procedures.jsonl"), encoding="utf-8") as f:
+        return json.loads(f.readline())
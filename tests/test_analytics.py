@@ -0,0 +1,80 @@
+import json
+import os
+
+from grid_rag.analytics import AnalyticsService, EventLog
+
+NOW = 1_800_000_000.0
+
+
+def service(path, **kwargs):
+    return AnalyticsService(str(path), clock=lambda: NOW, **kwargs)
+
+
+def record(analytics, n, category="🚨 Emergency Procedures", risk="CRITICAL"):
+    for i in range(n):
+        analytics.record(f"query {i}", category, risk)
+
+
+def test_read_skips_malformed_lines(tmp_path):
+    path = tmp_path / "events.jsonl"
+    path.write_text('{"ts": 1}\nnot json\n{"no": "ts"}\n[1]\n{"ts": 2}\n{"ts": 3')
+    log = EventLog(str(path))
+    events, offset = log.read_from(0)
+    assert [event["ts"] for event in events] == [1, 2]
+    assert log.skipped == 3
+    assert offset == len('{"ts": 1}\nnot json\n{"no": "ts"}\n[1]\n{"ts": 2}\n')
+
+
+def test_rotation_keeps_the_log_bounded_and_the_counts(tmp_path):
+    path = tmp_path / "events.jsonl"
+    analytics = service(path, rotate_bytes=1024)
+    record(analytics, 40)
+    analytics.refresh()
+
+    assert analytics.rotations == 1
+    assert os.path.getsize(path) == 0
+    assert analytics.rollups.total == 40
+
+    record(analytics, 5, category="🔧 Equipment Diagnostics", risk="LOW")
+    assert analytics.category_distribution() == {"🚨 Emergency Procedures": 40, "🔧 Equipment Diagnostics": 5}
+
+
+def test_new_process_starts_from_the_checkpoint(tmp_path):
+    path = tmp_path / "events.jsonl"
+    first = service(path, rotate_bytes=1024)
+    record(first, 40)
+    first.refresh()
+    record(first, 3, risk="HIGH")
+
+    second = service(path, rotate_bytes=1024)
+    assert second.risk_distribution() == {"CRITICAL": 40, "HIGH": 3}
+    # Only the three events appended since the rotation were read from the log
+    assert second._offset == os.path.getsize(path)
+    assert len(path.read_text().splitlines()) == 3
+
+
+def test_other_processes_follow_a_rotation(tmp_path):
+    path = tmp_path / "events.jsonl"
+    tailing = service(path, rotate_bytes=0)
+    rotating = service(path, rotate_bytes=1024)
+    record(rotating, 10)
+    assert tailing.queries_last_hour() == 10
+
+    record(rotating, 30)
+    rotating.refresh()
+    record(rotating, 2)
+
+    assert rotating.rotations == 1
+    assert tailing.queries_last_hour() == 42
+    assert tailing.rotations == 0
+
+
+def test_replaced_log_without_checkpoint_is_read_from_the_start(tmp_path):
+    path = tmp_path / "events.jsonl"
+    analytics = service(path)
+    record(analytics, 4)
+    assert analytics.queries_last_hour() == 4
+
+    os.remove(path)
+    path.write_text(json.dumps({"ts": NOW, "category": "x", "risk_level": "LOW"}) + "\n")
+    assert analytics.queries_last_hour() == 1
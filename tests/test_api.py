@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from grid_rag.api import create_app  # noqa: E402
+
+
+@pytest.fixture
+def client(corpus_dir, tmp_path, monkeypatch):
+    monkeypatch.setenv("GRID_RAG_RATE_LIMIT", "1")  # bursts of four queries
+    app = create_app(corpus_dir, str(tmp_path / "index"), fleet_path=str(tmp_path / "no-fleet.csv"))
+    yield TestClient(app)
+    app.state.services.snapshots.stop()
+    app.state.services.scheduler.close()
+
+
+def test_batch_queries_count_against_the_session_rate_limit(client):
+    response = client.post("/query/batch", json={"queries": ["sf6 leak", "oil sample"], "session": "crew-1"})
+    assert response.status_code == 200
+    assert [result["query"] for result in response.json()["results"]] == ["sf6 leak", "oil sample"]
+
+    queries = ["substation paint", "vegetation survey", "fence repair"]
+    response = client.post("/query/batch", json={"queries": queries, "session": "crew-1"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # The refused batch took none of the two tokens left
+    response = client.post("/query/batch", json={"queries": queries[:2], "session": "crew-1"})
+    assert response.status_code == 200
+    assert client.post("/query", json={"query": "capacitor bank", "session": "crew-1"}).status_code == 429
+    assert client.post("/query", json={"query": "capacitor bank", "session": "crew-2"}).status_code == 200
+
+
+def test_batches_larger_than_the_burst_are_refused_outright(client):
+    queries = ["substation paint", "vegetation survey", "fence repair", "meter reading", "label update"]
+    response = client.post("/query/batch", json={"queries": queries, "session": "crew-1"})
+    assert response.status_code == 413
+    assert client.post("/query/batch", json={"queries": queries[:4], "session": "crew-1"}).status_code == 200
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from grid_rag.fleet import (
+    DUVAL_ZONES,
+    GASES,
+    IEC_FAULTS,
+    FleetScores,
+    applies_to,
+    apply_assessment,
+    duval_zone,
+    gas_condition,
+    iec_ratio_fault,
+)
+
+
+@pytest.mark.parametrize(
+    "ch4,c2h4,c2h2,zone",
+    [
+        (0, 0, 0, "N"),
+        (99, 1, 0, "PD"),
+        (89, 10, 1, "T1"),
+        (69, 30, 1, "T2"),
+        (25, 70, 5, "T3"),
+        (50, 10, 40, "D1"),
+        (25, 45, 30, "D2"),
+        (62, 30, 8, "DT"),
+    ],
+)
+def test_duval_triangle_zones(ch4, c2h4, c2h2, zone):
+    index = duval_zone(np.array([ch4], float), np.array([c2h4], float), np.array([c2h2], float))
+    assert DUVAL_ZONES[index][0] == zone
+
+
+@pytest.mark.parametrize(
+    "h2,ch4,c2h6,c2h4,c2h2,fault",
+    [
+        (1000, 50, 100, 10, 0, "PD"),    # CH4/H2 < 0.1, C2H4/C2H6 < 0.2
+        (100, 30, 10, 20, 40, "D1"),     # C2H2/C2H4 > 1
+        (100, 50, 10, 50, 50, "D2"),     # C2H2/C2H4 0.6-2.5, C2H4/C2H6 > 2
+        (50, 200, 200, 50, 0, "T1"),     # CH4/H2 > 1, C2H4/C2H6 < 1
+        (50, 200, 100, 200, 1, "T2"),    # C2H4/C2H6 1-4
+        (50, 200, 50, 300, 5, "T3"),     # C2H4/C2H6 > 4
+        (100, 30, 30, 30, 0, "ND"),
+    ],
+)
+def test_iec_60599_ratio_faults(h2, ch4, c2h6, c2h4, c2h2, fault):
+    gases = np.array([[h2, ch4, c2h6, c2h4, c2h2, 0, 0]], dtype=np.float64)
+    assert IEC_FAULTS[iec_ratio_fault(gases)][0] == fault
+
+
+def test_ieee_condition_is_worst_gas():
+    gases = np.array([
+        [50, 50, 30, 20, 0, 200, 1000],     # every gas under its condition 1 limit
+        [800, 50, 30, 20, 0, 200, 1000],    # H2 between the condition 2 and 3 limits
+        [50, 50, 30, 20, 40, 200, 1000],    # C2H2 above the condition 3 limit
+    ], dtype=np.float64)
+    assert gas_condition(gases).tolist() == [1, 3, 4]
+
+
+def fleet(rows):
+    table = {gas: np.array([row[i + 1] for row in rows], dtype=np.float64) for i, gas in enumerate(GASES)}
+    table["asset"] = np.array([row[0] for row in rows])
+    return FleetScores(table)
+
+
+def test_assessment_ranks_arcing_above_healthy_assets():
+    scores = fleet([
+        ("T-healthy", 20, 10, 10, 5, 0, 150, 1500),
+        ("T-arcing", 900, 150, 40, 160, 120, 300, 2000),
+    ])
+    healthy, arcing = scores.assessment("T-healthy"), scores.assessment("T-arcing")
+    assert healthy["risk_level"] == "MEDIUM"
+    assert arcing["risk_level"] == "CRITICAL"
+    assert arcing["duval"] in ("D1", "D2")
+    assert scores.assessment("unknown") is None
+
+
+def test_assessment_applies_to_dga_procedures_only():
+    assert applies_to({"title": "Dissolved gas analysis interpretation", "answer": ""})
+    assert applies_to({"title": "Monthly DGA sampling", "answer": ""})
+    assert not applies_to({"title": "Transformer fire response", "answer": "Isolate the transformer."})
+
+
+def test_assessment_never_lowers_stored_risk():
+    critical = {"risk_level": "CRITICAL", "confidence": 90}
+    updated = apply_assessment(critical, {"risk_level": "MEDIUM", "confidence": 71.26})
+    assert updated["risk_level"] == "CRITICAL"
+    assert updated["confidence"] == 71.3
+    assert apply_assessment({"risk_level": "HIGH"}, {"risk_level": "CRITICAL", "confidence": 80})["risk_level"] == "CRITICAL"
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+from grid_rag.generation import GenerationClient, GenerationError
+from grid_rag.stub_llm import StubLLMServer
+
+
+def chunk(event):
+    data = (json.dumps(event) + "\n").encode("utf-8")
+    return f"{len(data):x}\r\n".encode() + data + b"\r\n"
+
+
+async def serve(respond):
+    """One-off server that reads a request and writes whatever ``respond`` returns."""
+
+    async def handle(reader, writer):
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        writer.write(respond())
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+HEAD = b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n"
+
+
+def generate(respond):
+    async def run():
+        server, port = await serve(respond)
+        client = GenerationClient(f"http://127.0.0.1:{port}", timeout=5)
+        try:
+            return await client.generate("prompt"), len(client._idle)
+        finally:
+            server.close()
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_stream_from_stub_server():
+    async def run():
+        server = await StubLLMServer(port=0, first_token_ms=0, token_ms=0).start()
+        client = GenerationClient(f"http://127.0.0.1:{server.port}", timeout=5)
+        try:
+            return await client.generate("Context: Isolate the breaker.\nQuestion: what now?")
+        finally:
+            await client.aclose()
+            await server.close()
+
+    assert asyncio.run(run()) == "Isolate the breaker."
+
+
+def test_connection_dropped_mid_stream_is_an_error():
+    with pytest.raises(GenerationError, match="middle of the token stream"):
+        generate(lambda: HEAD + chunk({"token": "Hello "}))
+
+
+def test_stream_without_done_event_is_an_error():
+    with pytest.raises(GenerationError, match="done event"):
+        generate(lambda: HEAD + chunk({"token": "Hello "}) + b"0\r\n\r\n")
+
+
+def test_complete_stream_is_returned_and_connection_pooled():
+    answer, idle = generate(lambda: HEAD + chunk({"token": "Hello"}) + chunk({"done": True}) + b"0\r\n\r\n")
+    assert (answer, idle) == ("Hello", 1)
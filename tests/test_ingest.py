@@ -0,0 +1,57 @@
+import os
+
+from grid_rag.corpus import CorpusStore, load_manifest
+from grid_rag.ingest import DEFAULT_CATEGORY, run
+
+SCOPE = """# Scope
+This manual covers {equipment} inspection and testing at distribution substations.
+- Isolate the {equipment} before removing any covers.
+- Record the nameplate rating and serial number in the inspection log.
+"""
+
+SHARED = """# Handling
+Insulating oil samples are drawn from the bottom drain valve into clean glass bottles,
+labelled with the asset number, sealed against moisture and shipped to the laboratory
+within two days for dissolved gas and moisture analysis.
+"""
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def titles(corpus_dir):
+    return sorted(CorpusStore(corpus_dir).responses())
+
+
+def test_same_heading_in_two_files_keeps_both_records(corpus_dir, tmp_path):
+    manuals = tmp_path / "manuals"
+    write(str(manuals / "breakers.md"), SCOPE.format(equipment="breaker"))
+    write(str(manuals / "relays" / "scope.md"), SCOPE.format(equipment="relay"))
+
+    run(str(manuals), corpus_dir)
+
+    ingested = [title for title in titles(corpus_dir) if title.startswith("Scope")]
+    assert ingested == ["Scope (breakers.md)", f"Scope ({os.path.join('relays', 'scope.md')})"]
+
+
+def test_duplicate_is_restored_when_its_owner_changes(corpus_dir, tmp_path):
+    manuals = tmp_path / "manuals"
+    write(str(manuals / "a.md"), SHARED)
+    write(str(manuals / "b.md"), SHARED)
+
+    stats = run(str(manuals), corpus_dir)
+    assert (stats["chunks"], stats["duplicates"]) == (1, 1)
+    assert [title for title in titles(corpus_dir) if title.startswith("Handling")] == ["Handling (a.md)"]
+
+    # b.md deferred to a.md's copy; once a.md no longer has it, b.md must be ingested again
+    write(str(manuals / "a.md"), SCOPE.format(equipment="breaker"))
+    stats = run(str(manuals), corpus_dir)
+    assert (stats["changed"], stats["rechecked"]) == (2, 1)
+    assert [title for title in titles(corpus_dir) if title.startswith("Handling")] == ["Handling (b.md)"]
+
+    stats = run(str(manuals), corpus_dir)
+    assert (stats["changed"], stats["unchanged"]) == (0, 2)
+    assert DEFAULT_CATEGORY in {entry["name"] for entry in load_manifest(corpus_dir)["categories"]}
@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from grid_rag.metrics import LatencyRecorder
+
+
+def test_totals_keep_growing_after_the_ring_wraps():
+    recorder = LatencyRecorder(capacity=4, stages=("total",))
+    for _ in range(10):
+        recorder.record("total", 0.5)
+
+    assert recorder.summary("total")["count"] == 4
+    assert recorder.totals("total") == (10, pytest.approx(5.0))
+    text = recorder.to_prometheus()
+    assert 'grid_rag_stage_latency_seconds_count{stage="total"} 10' in text
+    assert 'grid_rag_stage_latency_seconds_sum{stage="total"} 5.000000' in text
+
+
+def test_totals_add_up_across_recording_threads():
+    recorder = LatencyRecorder(capacity=16, stages=("queue", "total"))
+
+    def work():
+        for _ in range(1000):
+            recorder.record("queue", 0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    count, total = recorder.totals("queue")
+    assert count == 4000
+    assert total == pytest.approx(4.0)
+    assert recorder.totals("total") == (0, 0.0)
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+from grid_rag import pack
+from grid_rag.pack import Pack, PackCorpus, PackError, apply_delta, export, make_delta
+
+
+def revise(corpus_dir, procedure, contacts):
+    path = os.path.join(corpus_dir, "emergency_procedures.jsonl")
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    lines[0] = json.dumps(dict(procedure, contacts=contacts), ensure_ascii=False)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def export_pair(corpus_dir, procedure, tmp_path, base_codec, target_codec):
+    base = str(tmp_path / "base.pack")
+    target = str(tmp_path / "target.pack")
+    export(corpus_dir, base, dim=32, codec=base_codec)
+    revise(corpus_dir, procedure, ["Storm desk"])
+    export(corpus_dir, target, dim=32, codec=target_codec)
+    return base, target
+
+
+def codecs():
+    pairs = [("zlib", "zlib")]
+    if pack.zstandard is not None:
+        pairs += [("zstd", "zstd"), ("zlib", "zstd"), ("zstd", "zlib")]
+    return pairs
+
+
+@pytest.mark.parametrize("base_codec,target_codec", codecs())
+def test_delta_round_trip(corpus_dir, procedure, tmp_path, base_codec, target_codec):
+    base, target = export_pair(corpus_dir, procedure, tmp_path, base_codec, target_codec)
+    delta = str(tmp_path / "update.delta")
+    index = make_delta(base, target, delta)
+    assert 0 < len(index["chunks"]) < sum(len(s["chunks"]) for s in Pack(target).sections.values())
+    assert os.path.getsize(delta) < os.path.getsize(target)
+
+    rebuilt = apply_delta(base, delta, base)
+
+    assert rebuilt["pack_version"] == Pack(target).version
+    assert rebuilt["codec"] == target_codec
+    corpus, expected = PackCorpus(Pack(base)), PackCorpus(Pack(target))
+    assert corpus.response(procedure["query"])["contacts"] == ["Storm desk"]
+    assert {title: corpus.response(title) for title in corpus.responses()} == {
+        title: expected.response(title) for title in expected.responses()
+    }
+    assert Pack(base).bm25().search("lightning storm shutdown", k=1)[0].key == procedure["query"]
+
+
+def test_apply_rejects_delta_for_another_base(corpus_dir, procedure, tmp_path):
+    base, target = export_pair(corpus_dir, procedure, tmp_path, "zlib", "zlib")
+    delta = str(tmp_path / "update.delta")
+    make_delta(base, target, delta)
+    with pytest.raises(PackError, match="made against"):
+        apply_delta(target, delta, str(tmp_path / "out.pack"))
+
+
+def test_version_mismatch_leaves_base_untouched(corpus_dir, procedure, tmp_path, monkeypatch):
+    base, target = export_pair(corpus_dir, procedure, tmp_path, "zlib", "zlib")
+    delta = str(tmp_path / "update.delta")
+    make_delta(base, target, delta)
+    with open(base, "rb") as f:
+        original = f.read()
+
+    monkeypatch.setattr(pack, "_content_version", lambda index: "0" * 16)
+    with pytest.raises(PackError, match="does not match"):
+        apply_delta(base, delta, base)
+
+    with open(base, "rb") as f:
+        assert f.read() == original
+    assert [name for name in os.listdir(tmp_path) if ".tmp-" in name] == []
+
+
+def test_packs_default_to_zlib_so_any_device_can_open_them(corpus_dir, tmp_path, monkeypatch):
+    out = str(tmp_path / "grid.pack")
+    export(corpus_dir, out, dim=32)
+    monkeypatch.setattr(pack, "zstandard", None)
+    assert Pack(out).codec.name == "zlib"
+    assert PackCorpus(Pack(out)).responses()
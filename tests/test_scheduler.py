@@ -0,0 +1,223 @@
+import threading
+
+import pytest
+
+from grid_rag.scheduler import BatchTooLarge, Overloaded, QueryScheduler, RateLimited, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Gate:
+    """Handler whose calls block until released, recording the order queries ran in."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.ran = []
+
+    def __call__(self, query):
+        self.ran.append(query)
+        self.started.release()
+        self.release.wait(5)
+        return query.upper()
+
+
+def levels(mapping):
+    return lambda query: (mapping.get(query, "MEDIUM"), query.startswith("cached"))
+
+
+@pytest.fixture
+def gate():
+    gate = Gate()
+    yield gate
+    gate.release.set()
+
+
+def scheduler(gate, triage, **kwargs):
+    kwargs.setdefault("limiter", RateLimiter(rate=1000, burst=1000))
+    return QueryScheduler(gate, triage, **kwargs)
+
+
+def occupy(sched, gate, queries):
+    """Submit ``queries`` and wait until each is running on a worker."""
+    futures = [sched.submit("busy", query) for query in queries]
+    for _ in queries:
+        assert gate.started.acquire(timeout=5)
+    return futures
+
+
+def test_rate_limiter_refills_and_forces():
+    clock = Clock()
+    limiter = RateLimiter(rate=2.0, burst=3, clock=clock)
+    assert [limiter.acquire("crew") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("crew") == pytest.approx(0.5)
+    assert limiter.acquire("other") == 0.0
+    assert limiter.acquire("crew", force=True) == 0.0
+    clock.now = 1.0  # two tokens refilled
+    assert [limiter.acquire("crew") for _ in range(2)] == [0.0, 0.0]
+    assert limiter.acquire("crew") == pytest.approx(0.5)
+
+
+def test_rate_limiter_forgets_least_recent_sessions():
+    limiter = RateLimiter(rate=1.0, burst=1, max_sessions=2, clock=Clock())
+    for session in ("a", "b", "c"):
+        limiter.acquire(session)
+    assert len(limiter) == 2
+    assert limiter.acquire("a") == 0.0
+
+
+def test_rate_limited_sessions_are_refused_but_critical_and_cached_pass(gate):
+    gate.release.set()
+    sched = scheduler(gate, levels({"fire": "CRITICAL"}), limiter=RateLimiter(rate=0.001, burst=1))
+    try:
+        assert sched.run("crew", "first") == "FIRST"
+        with pytest.raises(RateLimited) as refused:
+            sched.submit("crew", "second")
+        assert refused.value.retry_after > 0
+        assert sched.run("crew", "fire") == "FIRE"
+        assert sched.run("crew", "cached answer") == "CACHED ANSWER"
+        stats = sched.stats()
+        assert stats["rate_limited"]["MEDIUM"] == 1
+        assert stats["inline"]["MEDIUM"] == 1
+    finally:
+        sched.close()
+
+
+def test_rate_limiter_takes_and_releases_several_tokens():
+    clock = Clock()
+    limiter = RateLimiter(rate=1.0, burst=4, clock=clock)
+    assert limiter.acquire("crew", 3) == 0.0
+    assert limiter.acquire("crew", 2) == pytest.approx(1.0)
+    limiter.release("crew", 2)
+    assert limiter.acquire("crew", 3) == 0.0
+    limiter.release("crew", 10)
+    assert limiter.acquire("crew", 5) == pytest.approx(1.0)  # released tokens never exceed the burst
+
+
+def test_batches_are_admitted_or_refused_whole(gate):
+    gate.release.set()
+    sched = scheduler(gate, levels({"fire": "CRITICAL"}), limiter=RateLimiter(rate=0.001, burst=4))
+    try:
+        with pytest.raises(BatchTooLarge):
+            sched.submit_batch("crew", ["a", "b", "c", "d", "e"])
+        futures = sched.submit_batch("crew", ["a", "fire", "cached b", "c"])
+        assert [future.result(5) for future in futures] == ["A", "FIRE", "CACHED B", "C"]
+        with pytest.raises(RateLimited):
+            sched.submit_batch("crew", ["d", "e"])
+        assert sched.stats()["rate_limited"]["MEDIUM"] == 2
+        assert sched.run("crew", "d") == "D"  # the refused batch took no tokens
+    finally:
+        sched.close()
+
+
+def test_shed_and_expired_queries_give_their_token_back(gate):
+    clock = Clock()
+    limiter = RateLimiter(rate=0.001, burst=4, clock=clock)
+    sched = scheduler(gate, levels({}), workers=2, reserved=1, max_queue=6, max_wait=5.0, limiter=limiter, clock=clock)
+    try:
+        occupy(sched, gate, ["busy"])
+        with pytest.raises(Overloaded):
+            sched.submit_batch("crew", ["a", "b", "c", "d"])  # MEDIUM sheds at half the queue
+        stale = sched.submit_batch("crew", ["a", "b"])
+        clock.now = 10.0
+        gate.release.set()
+        for future in stale:
+            with pytest.raises(Overloaded, match="expired"):
+                future.result(5)
+        assert [future.result(5) for future in sched.submit_batch("crew", ["x", "y", "z"])] == ["X", "Y", "Z"]
+    finally:
+        sched.close()
+
+
+def test_critical_queries_run_first(gate):
+    sched = scheduler(gate, levels({"fire": "CRITICAL", "relay": "HIGH", "paint": "LOW"}), workers=2, reserved=1)
+    try:
+        occupy(sched, gate, ["busy"])
+        futures = [sched.submit("crew", query) for query in ("paint", "mowing", "relay", "fire")]
+        # The reserved worker only takes the CRITICAL query
+        assert gate.started.acquire(timeout=5)
+        assert gate.ran[-1] == "fire"
+        gate.release.set()
+        assert [future.result(5) for future in futures] == ["PAINT", "MOWING", "RELAY", "FIRE"]
+        assert gate.ran[2:] == ["relay", "mowing", "paint"]
+    finally:
+        sched.close()
+
+
+def test_lower_levels_are_shed_first(gate):
+    sched = scheduler(
+        gate,
+        levels({"fire": "CRITICAL", "relay": "HIGH", "paint": "LOW"}),
+        workers=2,
+        reserved=1,
+        max_queue=4,
+    )
+    try:
+        occupy(sched, gate, ["busy"])
+        sched.submit("crew", "relay")
+        with pytest.raises(Overloaded):
+            sched.submit("crew", "paint")  # LOW sheds at a quarter of the queue
+        sched.submit("crew", "mowing")
+        with pytest.raises(Overloaded):
+            sched.submit("crew", "mowing again")  # MEDIUM sheds at half
+        assert sched.stats()["shed"] == {"CRITICAL": 0, "HIGH": 0, "MEDIUM": 1, "LOW": 1}
+    finally:
+        gate.release.set()
+        sched.close()
+
+
+def test_critical_query_evicts_newest_lowest_level_from_full_queue(gate):
+    sched = scheduler(
+        gate,
+        levels({"relay": "HIGH", "fire": "CRITICAL"}),
+        workers=2,
+        reserved=1,
+        max_queue=2,
+        shed_at={"CRITICAL": 2, "HIGH": 2, "MEDIUM": 2, "LOW": 2},
+    )
+    try:
+        occupy(sched, gate, ["busy"])
+        relay = sched.submit("crew", "relay")
+        mowing = sched.submit("crew", "mowing")
+        fire = sched.submit("crew", "fire")
+        with pytest.raises(Overloaded):
+            mowing.result(5)
+        gate.release.set()
+        assert fire.result(5) == "FIRE"
+        assert relay.result(5) == "RELAY"
+        assert sched.stats()["shed"]["MEDIUM"] == 1
+    finally:
+        sched.close()
+
+
+def test_non_critical_queries_expire_in_the_queue(gate):
+    clock = Clock()
+    sched = scheduler(gate, levels({}), workers=2, reserved=1, max_wait=5.0, clock=clock)
+    try:
+        occupy(sched, gate, ["busy"])
+        stale = sched.submit("crew", "stale")
+        clock.now = 10.0
+        gate.release.set()
+        with pytest.raises(Overloaded, match="expired"):
+            stale.result(5)
+        assert sched.stats()["expired"]["MEDIUM"] == 1
+    finally:
+        sched.close()
+
+
+def test_prometheus_export_covers_every_level(gate):
+    gate.release.set()
+    sched = scheduler(gate, levels({}))
+    try:
+        sched.run("crew", "query")
+        text = sched.to_prometheus()
+        assert 'grid_rag_scheduler_completed_total{level="MEDIUM"} 1' in text
+        assert 'grid_rag_scheduler_queue_depth{level="CRITICAL"} 0' in text
+    finally:
+        sched.close()
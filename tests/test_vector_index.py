@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+
+from grid_rag import vector_index
+from grid_rag.vector_index import HashingEmbedder, VectorIndex
+
+DOCUMENTS = [
+    {"title": "SF6 leak", "answer": "Evacuate the switchgear room and ventilate before re-entry."},
+    {"title": "Relay test", "answer": "Inject secondary current and record the trip time."},
+]
+
+
+def versions(directory):
+    parent, name = os.path.split(directory)
+    return sorted(entry for entry in os.listdir(parent) if entry.startswith(f"{name}.v-"))
+
+
+def test_publishing_swaps_a_symlink_and_keeps_the_previous_version(tmp_path):
+    directory = str(tmp_path / "vectors")
+    embedder = HashingEmbedder(dim=32)
+    first = VectorIndex.build(DOCUMENTS, directory, embedder=embedder, fingerprint="one")
+    second = VectorIndex.build(DOCUMENTS[:1], directory, embedder=embedder, fingerprint="two")
+
+    assert os.path.islink(directory)
+    assert VectorIndex.load(directory).meta["fingerprint"] == "two"
+    # A worker still serving the first version keeps working, and its files stay on disk for the grace period
+    assert len(versions(directory)) == 2
+    assert first.search("relay trip time", k=1)[0].key == "Relay test"
+    assert len(second) == 1
+
+    vector_index._prune(directory, max_age=-1)
+    assert versions(directory) == [os.path.basename(os.path.realpath(directory))]
+    assert VectorIndex.load(directory).meta["fingerprint"] == "two"
+
+
+def test_index_written_before_versioning_is_replaced(tmp_path):
+    directory = tmp_path / "vectors"
+    directory.mkdir()
+    np.save(directory / "vectors.npy", np.zeros((0, 32), dtype=np.float32))
+
+    VectorIndex.build(DOCUMENTS, str(directory), embedder=HashingEmbedder(dim=32), fingerprint="new")
+
+    assert os.path.islink(directory)
+    assert VectorIndex.load(str(directory)).meta["fingerprint"] == "new"
+
+
+def test_versions_still_being_written_are_not_pruned(tmp_path):
+    directory = str(tmp_path / "vectors")
+    VectorIndex.build(DOCUMENTS, directory, embedder=HashingEmbedder(dim=32))
+    building = tmp_path / f"vectors.v-{os.getpid()}-1"
+    building.mkdir()
+
+    vector_index._prune(directory, max_age=-1)
+
+    assert building.exists()
@@ -0,0 +1,195 @@
+import json
+import os
+import time
+
+import pytest
+
+from grid_rag import versioning
+from grid_rag.corpus import CorpusStore
+from grid_rag.versioning import ChangeLog, ChangeLogError, ServingSnapshots, compact, fold, validate
+
+CATEGORY = "🚨 Emergency Procedures"
+
+
+def put(record, category=CATEGORY):
+    return {"op": "put", "category": category, "record": record}
+
+
+def delete(title):
+    return {"op": "delete", "query": title}
+
+
+def test_validate_accepts_full_and_catalog_only_records(procedure):
+    validate(put(procedure))
+    validate(put({"query": "Catalog-only entry"}))
+    validate(delete(procedure["query"]))
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"steps": "one step"},
+        {"contacts": [1]},
+        {"sources": None},
+        {"risk_level": "SEVERE"},
+        {"confidence": True},
+        {"personnel": 3},
+        {"answer": "  "},
+    ],
+)
+def test_validate_rejects_malformed_responses(procedure, change):
+    with pytest.raises(ValueError):
+        validate(put(dict(procedure, **change)))
+
+
+def test_validate_rejects_missing_response_fields(procedure):
+    # Without an answer the record is a catalog entry, which only needs its title
+    for field in set(versioning.RESPONSE_FIELDS) - {"answer"}:
+        record = {key: value for key, value in procedure.items() if key != field}
+        with pytest.raises(ValueError, match=field):
+            validate(put(record))
+
+
+def test_validate_rejects_unknown_ops_and_missing_titles(procedure):
+    for change in ({"op": "patch"}, put({"answer": "x"}), {"op": "put", "record": procedure}, {"op": "delete"}):
+        with pytest.raises(ValueError):
+            validate(change)
+
+
+def test_fold_keeps_latest_change_per_title(procedure):
+    first = put(dict(procedure, contacts=["old"]))
+    second = put(dict(procedure, contacts=["new"]))
+    other = put({"query": "Other"})
+    overlay = fold([(1, [first, other]), (2, [second])])
+    assert overlay[procedure["query"]] is second
+    assert list(overlay) == ["Other", procedure["query"]]
+    assert fold([(3, [delete("Other")])], overlay)["Other"]["op"] == "delete"
+
+
+def test_append_numbers_segments_and_read_detects_compaction(corpus_dir, procedure):
+    log = ChangeLog(corpus_dir)
+    assert log.append([put(procedure)]) == 1
+    assert log.append([delete("Other")]) == 2
+    assert [seq for seq, _ in log.read()] == [1, 2]
+    assert [seq for seq, _ in log.read(after=1)] == [2]
+    with pytest.raises(ValueError):
+        log.append([put(dict(procedure, steps=None))])
+    log.mark_compacted(1)
+    assert log.sequences() == [2]
+    with pytest.raises(ChangeLogError):
+        log.read(after=0)
+
+
+def test_snapshot_serves_changes_and_keeps_old_snapshots_consistent(corpus_dir, procedure):
+    snapshots = ServingSnapshots(corpus_dir, merge_threshold=0)
+    before = snapshots.get()
+    title = procedure["query"]
+
+    ChangeLog(corpus_dir).append([put(dict(procedure, contacts=["Storm desk"]))])
+    after = snapshots.refresh()
+
+    assert after is snapshots.get() and after is not before
+    assert after.version == f"{before.version}@1"
+    assert after.answer(title)["response"]["contacts"] == ["Storm desk"]
+    assert before.answer(title)["response"]["contacts"] == procedure["contacts"]
+
+    ChangeLog(corpus_dir).append([delete(title)])
+    assert snapshots.refresh().corpus.response(title) is None
+    assert title not in [hit["title"] for hit in snapshots.get().answer(title)["hits"]]
+
+
+def test_compact_folds_changes_into_category_files(corpus_dir, procedure):
+    bulletin = dict(procedure, query="Tornado warning bulletin for Mesa substation")
+    log = ChangeLog(corpus_dir)
+    log.append([put(dict(procedure, contacts=["Storm desk"])), put(bulletin, "🆕 Storm Bulletins")])
+    log.append([delete("Dissolved gas analysis interpretation for 100MVA power transformer")])
+
+    assert compact(corpus_dir) == 2
+    assert log.sequences() == [] and log.compacted() == 2
+
+    corpus = CorpusStore(corpus_dir)
+    assert corpus.categories()[-1] == "🆕 Storm Bulletins"
+    assert corpus.queries("🆕 Storm Bulletins") == [bulletin["query"]]
+    assert corpus.response(procedure["query"])["contacts"] == ["Storm desk"]
+    assert corpus.response("Dissolved gas analysis interpretation for 100MVA power transformer") is None
+    with open(os.path.join(corpus_dir, "manifest.json"), encoding="utf-8") as f:
+        assert "storm_bulletins.jsonl" in {entry.get("file") for entry in json.load(f)["categories"]}
+
+
+def test_refresh_picks_up_compacted_base(corpus_dir, procedure):
+    snapshots = ServingSnapshots(corpus_dir, merge_threshold=0)
+    ChangeLog(corpus_dir).append([put(dict(procedure, contacts=["Storm desk"]))])
+    snapshots.refresh()
+    compact(corpus_dir)
+
+    service = snapshots.refresh()
+    assert isinstance(service.corpus, CorpusStore)
+    assert snapshots.stats()["pending_changes"] == 0
+    assert service.answer(procedure["query"])["response"]["contacts"] == ["Storm desk"]
+
+
+def test_refresh_mid_merge_does_not_merge_again(corpus_dir, procedure, monkeypatch):
+    snapshots = ServingSnapshots(corpus_dir, merge_threshold=1)
+    mark_compacted = ChangeLog.mark_compacted
+    compactions = []
+
+    def reopen_before_marking(log, through):
+        # The base is reopened after the category files were rewritten but before they are marked
+        snapshots.refresh()
+        mark_compacted(log, through)
+
+    def counting_compact(*args, **kwargs):
+        compactions.append(args)
+        return compact(*args, **kwargs)
+
+    monkeypatch.setattr(ChangeLog, "mark_compacted", reopen_before_marking)
+    monkeypatch.setattr(versioning, "compact", counting_compact)
+
+    ChangeLog(corpus_dir).append([put(dict(procedure, contacts=["Storm desk"]))])
+    snapshots.refresh()
+    merge = snapshots._merging
+    if merge is not None:
+        merge.join()
+    snapshots.refresh()
+
+    assert len(compactions) == 1
+    assert snapshots._merging is None
+    assert snapshots.stats()["pending_changes"] == 0
+    assert snapshots.get().corpus.response(procedure["query"])["contacts"] == ["Storm desk"]
+
+
+def test_polling_survives_refresh_errors_and_reports_them(corpus_dir, monkeypatch):
+    snapshots = ServingSnapshots(corpus_dir)
+    refresh = snapshots.refresh
+    calls = []
+
+    def flaky_refresh():
+        calls.append(None)
+        if len(calls) == 1:
+            raise KeyError("query")
+        return refresh()
+
+    monkeypatch.setattr(snapshots, "refresh", flaky_refresh)
+    snapshots.start(interval=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        snapshots.stop()
+    assert len(calls) >= 3
+    stats = snapshots.stats()
+    assert stats["errors"] == 1
+    assert stats["last_error"] == "KeyError: 'query'"
+
+
+def test_background_merge_builds_without_a_process_pool(corpus_dir, procedure, tmp_path, monkeypatch):
+    builds = []
+    monkeypatch.setattr("grid_rag.build.build", lambda corpus_dir, index_dir, workers: builds.append(workers))
+    snapshots = ServingSnapshots(corpus_dir, str(tmp_path / "index"), merge_threshold=1)
+    ChangeLog(corpus_dir).append([put(dict(procedure, contacts=["Storm desk"]))])
+    snapshots.refresh()
+    merge = snapshots._merging
+    if merge is not None:
+        merge.join()
+    assert builds == [1]